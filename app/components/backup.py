@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from . import data_store
+from .journal import write_snapshot
+from .models import intern_record_strings
+
+# "interval": 保存時に前回のバックアップから BACKUP_INTERVAL_SECONDS 以上経っていれば取得する
+# "on_save": 保存のたびに取得する
+# "off": 自動では取得しない(設定画面から手動で取得できる)
+BACKUP_MODE = os.environ.get("WBS_BACKUP_MODE", "interval")
+BACKUP_INTERVAL_SECONDS = int(os.environ.get("WBS_BACKUP_INTERVAL_SECONDS", "600"))
+MAX_SNAPSHOTS = int(os.environ.get("WBS_BACKUP_MAX_SNAPSHOTS", "100"))
+
+# レコードIDのハッシュが割り切れる位置でチャンクを区切る(平均この件数)。
+# 区切りが内容ではなくIDで決まるので、1件の変更・追加・削除は前後のチャンクに波及しない。
+CHUNK_TARGET_RECORDS = 256
+CHUNK_MAX_RECORDS = CHUNK_TARGET_RECORDS * 4
+
+_lock = threading.RLock()
+# バックアップ先ごとの直近のスナップショット (作成時刻, マニフェスト) と、自動バックアップで起きた直近のエラー
+_last_snapshots: Dict[Path, Tuple[float, Dict]] = {}
+last_error: Optional[str] = None
+
+# 自動バックアップは保存(_write_lock の中)から切り離し、1本のワーカーで順に取る。
+# 取得待ちの間に次の保存があればバックアップ先ごとに最新のスナップショットだけを残す
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wbs-backup")
+_pending_lock = threading.Lock()
+_pending: Dict[Path, Tuple[Dict[str, List[Dict]], str]] = {}
+
+
+def backup_dir(project_id: Optional[str] = None) -> Path:
+    """Backup directory of ``project_id`` (プロジェクトの保存先の下に置く)."""
+
+    return data_store.project_dir(project_id) / "backups"
+
+
+def _objects_dir(root: Path) -> Path:
+    return root / "objects"
+
+
+def _snapshots_dir(root: Path) -> Path:
+    return root / "snapshots"
+
+
+def _index_file(root: Path) -> Path:
+    return root / "index.json"
+
+
+def _object_path(root: Path, digest: str) -> Path:
+    return _objects_dir(root) / digest[:2] / digest[2:]
+
+
+def iter_chunks(records: List[Dict]) -> Iterator[bytes]:
+    """Split records into JSON Lines chunks at ID-hash boundaries."""
+
+    lines: List[str] = []
+    for record in records:
+        lines.append(json.dumps(record, ensure_ascii=False, sort_keys=True))
+        boundary = zlib.crc32(str(record.get("id")).encode("utf-8")) % CHUNK_TARGET_RECORDS == 0
+        if boundary or len(lines) >= CHUNK_MAX_RECORDS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _store_object(root: Path, raw: bytes) -> Tuple[str, int]:
+    """Store ``raw`` compressed under its SHA-256; returns (digest, bytes written)."""
+
+    digest = hashlib.sha256(raw).hexdigest()
+    path = _object_path(root, digest)
+    if path.exists():
+        return digest, 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compressed = zlib.compress(raw, 6)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(compressed)
+    os.replace(tmp_path, path)
+    return digest, len(compressed)
+
+
+def _load_object(root: Path, digest: str) -> bytes:
+    raw = zlib.decompress(_object_path(root, digest).read_bytes())
+    if hashlib.sha256(raw).hexdigest() != digest:
+        raise ValueError(f"バックアップのチャンクが破損しています: {digest}")
+    return raw
+
+
+def list_snapshots(project_id: Optional[str] = None) -> List[Dict]:
+    """Return the snapshot index of ``project_id``, newest first, without reading any chunks."""
+
+    return _list_snapshots(backup_dir(project_id))
+
+
+def _list_snapshots(root: Path) -> List[Dict]:
+    try:
+        with _index_file(root).open("r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return []
+    return list(reversed(entries))
+
+
+def _read_manifest(root: Path, snapshot_id: str) -> Dict:
+    with (_snapshots_dir(root) / f"{snapshot_id}.json").open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _latest_manifest(root: Path) -> Optional[Tuple[float, Dict]]:
+    if root not in _last_snapshots:
+        entries = _list_snapshots(root)
+        if not entries:
+            return None
+        _last_snapshots[root] = (entries[0]["timestamp"], _read_manifest(root, entries[0]["id"]))
+    return _last_snapshots[root]
+
+
+def create_snapshot(data: Dict[str, List[Dict]], reason: str = "manual") -> Optional[Dict]:
+    """Back up ``data`` into its project's backups; returns the index entry, or None when nothing changed."""
+
+    root = backup_dir(data_store.project_of(data))
+    with _lock:
+        new_objects = 0
+        new_bytes = 0
+        chunk_lists: Dict[str, List[str]] = {}
+        for kind in ("wbs", "tasks"):
+            digests = []
+            for raw in iter_chunks(data.get(kind, [])):
+                digest, written = _store_object(root, raw)
+                digests.append(digest)
+                if written:
+                    new_objects += 1
+                    new_bytes += written
+            chunk_lists[kind] = digests
+
+        latest = _latest_manifest(root)
+        if latest is not None and all(latest[1][kind] == chunk_lists[kind] for kind in chunk_lists):
+            return None
+
+        now = time.time()
+        snapshot_id = datetime.fromtimestamp(now).strftime("%Y%m%dT%H%M%S%f")
+        manifest = {"id": snapshot_id, **chunk_lists}
+        _snapshots_dir(root).mkdir(parents=True, exist_ok=True)
+        write_snapshot(_snapshots_dir(root) / f"{snapshot_id}.json", manifest)
+
+        entry = {
+            "id": snapshot_id,
+            "timestamp": now,
+            "created_at": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+            "reason": reason,
+            "wbs_count": len(data.get("wbs", [])),
+            "task_count": len(data.get("tasks", [])),
+            "new_objects": new_objects,
+            "new_bytes": new_bytes,
+        }
+        entries = list(reversed(_list_snapshots(root))) + [entry]
+        removed = entries[:-MAX_SNAPSHOTS] if len(entries) > MAX_SNAPSHOTS else []
+        entries = entries[len(removed):]
+        write_snapshot(_index_file(root), entries)
+        _last_snapshots[root] = (now, manifest)
+        if removed:
+            _prune(root, removed, entries)
+        return entry
+
+
+def _prune(root: Path, removed: List[Dict], kept: List[Dict]) -> None:
+    """Delete dropped manifests and the chunks no remaining snapshot references."""
+
+    referenced: Set[str] = set()
+    for entry in kept:
+        manifest = _read_manifest(root, entry["id"])
+        referenced.update(manifest["wbs"])
+        referenced.update(manifest["tasks"])
+    candidates: Set[str] = set()
+    for entry in removed:
+        manifest_path = _snapshots_dir(root) / f"{entry['id']}.json"
+        try:
+            manifest = _read_manifest(root, entry["id"])
+        except FileNotFoundError:
+            continue
+        candidates.update(manifest["wbs"])
+        candidates.update(manifest["tasks"])
+        manifest_path.unlink()
+    for digest in candidates - referenced:
+        _object_path(root, digest).unlink(missing_ok=True)
+
+
+def load_snapshot(snapshot_id: str, project_id: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """Reassemble the data of a snapshot from its chunks."""
+
+    root = backup_dir(project_id)
+    manifest = _read_manifest(root, snapshot_id)
+    data: Dict[str, List[Dict]] = {}
+    for kind in ("wbs", "tasks"):
+        records: List[Dict] = []
+        for digest in manifest[kind]:
+            records.extend(json.loads(line) for line in _load_object(root, digest).decode("utf-8").splitlines())
+        data[kind] = records
+    return intern_record_strings(data)
+
+
+def restore_snapshot(snapshot_id: str, project_id: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """Replace the project's data with a snapshot (the restore itself is saved as a new write)."""
+
+    data = data_store.ProjectData(
+        project_id or data_store.DEFAULT_PROJECT_ID, load_snapshot(snapshot_id, project_id)
+    )
+    data_store.save_data(data)
+    return data
+
+
+def _run_pending(root: Path) -> None:
+    global last_error
+    with _pending_lock:
+        data, reason = _pending.pop(root)
+    try:
+        create_snapshot(data, reason)
+    except OSError as exc:
+        # バックアップの失敗で保存自体を失敗させない
+        last_error = str(exc)
+    else:
+        last_error = None
+
+
+def wait_for_backups(timeout: Optional[float] = None) -> None:
+    """Block until the automatic backups queued so far have been written."""
+
+    _worker.submit(lambda: None).result(timeout)
+
+
+def _on_mutation(
+    previous: Optional[Dict[str, List[Dict]]],
+    data: Dict[str, List[Dict]],
+    records: List[Dict],
+    previous_version: int,
+    version: int,
+) -> None:
+    if BACKUP_MODE == "off":
+        return
+    root = backup_dir(data_store.project_of(data))
+    if BACKUP_MODE == "interval":
+        latest = _latest_manifest(root)
+        if latest is not None and time.time() - latest[0] < BACKUP_INTERVAL_SECONDS:
+            return
+    # 公開済みのスナップショットは書き換えられないので、そのままワーカーへ渡せる
+    with _pending_lock:
+        queued = root in _pending
+        _pending[root] = (data, "on_save" if BACKUP_MODE == "on_save" else "scheduled")
+    if not queued:
+        _worker.submit(_run_pending, root)
+
+
+data_store.register_mutation_listener(_on_mutation)
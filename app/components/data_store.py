@@ -1,49 +1,575 @@
 import json
+import os
+import re
+import threading
 import uuid
+from collections import ChainMap, OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import streamlit as st
 
-from .models import STATUSES, WBSItem
+from . import journal
+from .data_version import VersionedCache, bump_version, current_version
+from .filtering import apply_filters
+from .models import PREDECESSORS_FIELD, STATUSES, WBSItem, intern_record_strings, normalize_predecessors
+from .sqlite_store import SQLiteStore
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 DATA_FILE = DATA_DIR / "wbs_data.json"
+JOURNAL_FILE = DATA_DIR / "wbs_journal.jsonl"
+SQLITE_FILE = DATA_DIR / "wbs_data.sqlite3"
 
+# 既定のプロジェクト(従来の単一データ)はこれまでどおり DATA_DIR 直下に保存し、
+# 追加したプロジェクトは DATA_DIR/projects/<id>/ に同じファイル名で保存する
+DEFAULT_PROJECT_ID = "default"
+PROJECTS_DIRNAME = "projects"
+PROJECT_ID_PATTERN = re.compile(r"^[0-9a-z][0-9a-z_-]{0,63}$")
+# プロセス内に読み込んだまま保持するプロジェクト数(超えたら最も長く使われていないものを手放す)
+MAX_RESIDENT_PROJECTS = int(os.environ.get("WBS_MAX_RESIDENT_PROJECTS", "4"))
 
-def ensure_data_file_exists() -> None:
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not DATA_FILE.exists():
-        DATA_FILE.write_text("{\n  \"wbs\": [],\n  \"tasks\": []\n}\n", encoding="utf-8")
+# "json": 変更のたびに DATA_FILE 全体を書き直す
+# "journal": 変更を JOURNAL_FILE に追記し、一定サイズを超えたらスナップショットへ畳み込む
+# "sqlite": SQLITE_FILE に行単位で保存し、フィルター等をインデックス付きSQLで処理する
+STORAGE_MODE = os.environ.get("WBS_STORAGE_MODE", "json")
+JOURNAL_COMPACT_BYTES = 1024 * 1024
 
+_sqlite_stores: Dict[str, SQLiteStore] = {}
 
-def load_data() -> Dict[str, List[Dict]]:
-    if not DATA_FILE.exists():
-        return {"wbs": [], "tasks": []}
-    with DATA_FILE.open("r", encoding="utf-8") as f:
-        return json.load(f)
+# プロセス内の全セッションで共有する読み込み済みデータ (プロジェクトID -> (ファイル署名, データ))。
+# 最近使った順に並べ、MAX_RESIDENT_PROJECTS を超えた古いものから手放す
+_shared_lock = threading.Lock()
+_resident: "OrderedDict[str, Tuple[Tuple, ProjectData]]" = OrderedDict()
+# 複数セッションからの書き込みを直列化する
+_write_lock = threading.RLock()
 
+_mutation_listeners: List[
+    Callable[[Dict[str, List[Dict]], Dict[str, List[Dict]], List[Dict], int, int], None]
+] = []
 
-def save_data(data: Dict[str, List[Dict]]) -> None:
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with DATA_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# batch() 実行中の変更はスレッド(=セッション)ごとにここへ溜める
+_batch_state = threading.local()
+_position_cache = VersionedCache(maxsize=4)
+_wbs_map_cache = VersionedCache(maxsize=8)
+
+
+class BatchValidationError(ValueError):
+    """Raised when the mutations collected by :func:`batch` are inconsistent."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class _Staging:
+    """Private working copy of a shared snapshot that the mutators change.
+
+    共有スナップショットは他のセッションが読んでいるので書き換えない。一覧は浅い
+    コピーで持ち、レコードは初めて書き換えるときに複製する。保存に成功したら
+    このコピーを新しいスナップショットとして差し替える。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self.base = data
+        self.data = ProjectData(
+            project_of(data),
+            {**data, "wbs": list(data.get("wbs", [])), "tasks": list(data.get("tasks", []))},
+        )
+        self.records: List[Dict] = []
+        # このコピーで追加・複製したレコードのID(その場で書き換えてよい)
+        self._owned: Dict[str, Set[str]] = {"wbs": set(), "tasks": set()}
+        self._positions: Dict[str, Optional[ChainMap]] = {"wbs": None, "tasks": None}
+
+    def _position(self, kind: str, record_id: str) -> Optional[int]:
+        positions = self._positions[kind]
+        if positions is None:
+            # 削除するまでは元の一覧と位置が同じなので、共有スナップショットの索引を使う
+            base = self.base.get(kind, [])
+            shared = _position_cache.get_or_build(
+                base, None, lambda: {record.get("id"): i for i, record in enumerate(base)}
+            )
+            positions = self._positions[kind] = ChainMap({}, shared)
+        return positions.get(record_id)
+
+    def find(self, kind: str, record_id: str) -> Optional[Dict]:
+        position = self._position(kind, record_id)
+        return None if position is None else self.data[kind][position]
+
+    def _writable(self, kind: str, record_id: str) -> Optional[Dict]:
+        position = self._position(kind, record_id)
+        if position is None:
+            return None
+        record = self.data[kind][position]
+        if record_id not in self._owned[kind]:
+            record = self.data[kind][position] = dict(record)
+            self._owned[kind].add(record_id)
+        return record
+
+    def _append(self, kind: str, record: Dict) -> None:
+        record_id = record.get("id")
+        if self._position(kind, record_id) is not None:
+            # 別のセッションの保存に重ね直すときに二重に追加しない
+            return
+        self.data[kind].append(record)
+        self._positions[kind][record_id] = len(self.data[kind]) - 1
+        self._owned[kind].add(record_id)
+
+    def _remove(self, kind: str, ids: Set[str]) -> None:
+        self.data[kind] = RecordList(
+            self.data.project_id, (record for record in self.data[kind] if record.get("id") not in ids)
+        )
+        self._positions[kind] = ChainMap({record.get("id"): i for i, record in enumerate(self.data[kind])})
+
+    def change(self, record: Dict) -> None:
+        """Apply one mutation record to the working copy and remember it for saving."""
+
+        op = record["op"]
+        if op == "add_wbs":
+            self._append("wbs", record["item"])
+        elif op == "add_task":
+            self._append("tasks", record["task"])
+        elif op in ("update_wbs", "update_task"):
+            target = self._writable("wbs" if op == "update_wbs" else "tasks", record["id"])
+            if target is not None:
+                target.update(record["fields"])
+        elif op == "delete_tasks":
+            self._remove("tasks", set(record["ids"]))
+        elif op == "delete_wbs":
+            ids = set(record["ids"])
+            self._remove("wbs", ids)
+            for task in list(self.data["tasks"]):
+                if task.get("wbs_id") in ids:
+                    self._writable("tasks", task.get("id"))["wbs_id"] = None
+        else:
+            raise ValueError(f"unknown mutation: {op!r}")
+        self.records.append(record)
+
+    def rebased(self, data: Dict[str, List[Dict]]) -> "_Staging":
+        """Return a working copy of ``data`` with the same mutations applied."""
+
+        staging = _Staging(data)
+        for record in self.records:
+            staging.change(record)
+        return staging
+
+
+class _Batch:
+    def __init__(self, data: Dict[str, List[Dict]], notify: bool):
+        self.data = data
+        self.notify = notify
+        self.staging = _Staging(data)
+        self.messages: List[str] = []
+
+    @property
+    def records(self) -> List[Dict]:
+        return self.staging.records
+
+
+class RecordList(list):
+    """List of WBS items or tasks tagged with the project it belongs to.
+
+    一覧を受け取るキャッシュ(WBSツリーなど)がプロジェクトごとの版で判定できるようにする。
+    """
+
+    __slots__ = ("project_id",)
+
+    def __init__(self, project_id: str, records: Iterable[Dict] = ()):
+        super().__init__(records)
+        self.project_id = project_id
+
+
+class ProjectData(dict):
+    """``{"wbs": [...], "tasks": [...]}`` of one project.
+
+    書き込み先を決められるよう、読み込み元のプロジェクトIDを属性として持つ
+    (辞書の中身ではないので保存内容には含まれない)。普通の dict を渡された
+    更新関数は既定のプロジェクトへ保存する。"wbs" / "tasks" は同じIDを持つ
+    :class:`RecordList` にそろえる。
+    """
+
+    __slots__ = ("project_id",)
+
+    def __init__(self, project_id: str, data: Dict[str, List[Dict]]):
+        super().__init__(data)
+        self.project_id = project_id
+        for kind in ("wbs", "tasks"):
+            records = self.get(kind)
+            if records is not None and getattr(records, "project_id", None) != project_id:
+                self[kind] = RecordList(project_id, records)
+
+
+def project_of(data: Dict[str, List[Dict]]) -> str:
+    return getattr(data, "project_id", DEFAULT_PROJECT_ID)
+
+
+def project_dir(project_id: Optional[str] = None) -> Path:
+    """Directory holding the storage files of ``project_id``."""
+
+    if project_id is None or project_id == DEFAULT_PROJECT_ID:
+        return DATA_DIR
+    if not PROJECT_ID_PATTERN.match(project_id):
+        raise ValueError(f"invalid project id: {project_id!r}")
+    return DATA_DIR / PROJECTS_DIRNAME / project_id
+
+
+def _project_files(project_id: Optional[str]) -> Tuple[Path, Path, Path]:
+    """Return ``(data_file, journal_file, sqlite_file)`` of ``project_id``."""
+
+    if project_id is None or project_id == DEFAULT_PROJECT_ID:
+        return DATA_FILE, JOURNAL_FILE, SQLITE_FILE
+    directory = project_dir(project_id)
+    return directory / DATA_FILE.name, directory / JOURNAL_FILE.name, directory / SQLITE_FILE.name
+
+
+def get_sqlite_store(project_id: Optional[str] = None) -> Optional[SQLiteStore]:
+    """Return the SQLite store of ``project_id``, or None when another storage mode is active."""
+
+    if STORAGE_MODE != "sqlite":
+        return None
+    project_id = project_id or DEFAULT_PROJECT_ID
+    store = _sqlite_stores.get(project_id)
+    if store is None:
+        store = _sqlite_stores[project_id] = SQLiteStore(_project_files(project_id)[2])
+    return store
+
+
+def ensure_data_file_exists(project_id: Optional[str] = None) -> None:
+    data_file = _project_files(project_id)[0]
+    data_file.parent.mkdir(parents=True, exist_ok=True)
+    if not data_file.exists():
+        data_file.write_text("{\n  \"wbs\": [],\n  \"tasks\": []\n}\n", encoding="utf-8")
+
+
+def load_data(project_id: Optional[str] = None) -> ProjectData:
+    project_id = project_id or DEFAULT_PROJECT_ID
+    data_file, journal_file, _ = _project_files(project_id)
+    store = get_sqlite_store(project_id)
+    if store is not None:
+        if store.is_empty() and data_file.exists():
+            # 既存の JSON データを初回起動時に取り込む
+            with data_file.open("r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            if legacy.get("wbs") or legacy.get("tasks"):
+                store.replace_all(legacy)
+        return ProjectData(project_id, intern_record_strings(store.load()))
+
+    if not data_file.exists():
+        data = {"wbs": [], "tasks": []}
+    else:
+        with data_file.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    if STORAGE_MODE == "journal":
+        data = journal.replay(data, journal_file)
+    return ProjectData(project_id, intern_record_strings(data))
+
+
+def _storage_signature(project_id: str) -> Tuple:
+    """Return (mtime, size) of every file backing ``project_id`` in the active storage mode."""
+
+    data_file, journal_file, sqlite_file = _project_files(project_id)
+    if STORAGE_MODE == "sqlite":
+        # スキーマ作成による更新を署名に含めないよう先にストアを開いておく
+        get_sqlite_store(project_id)
+        paths = [sqlite_file, sqlite_file.with_name(sqlite_file.name + "-wal")]
+    elif STORAGE_MODE == "journal":
+        paths = [data_file, journal_file]
+    else:
+        paths = [data_file]
+
+    signature = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _make_resident(project_id: str, signature: Tuple, data: "ProjectData") -> None:
+    # _shared_lock を取得した状態で呼ぶ
+    _resident[project_id] = (signature, data)
+    _resident.move_to_end(project_id)
+    while len(_resident) > max(1, MAX_RESIDENT_PROJECTS):
+        evicted, _ = _resident.popitem(last=False)
+        # 手放したプロジェクトは次に選ばれたときに読み直す(SQLite の接続も閉じてよい)
+        _sqlite_stores.pop(evicted, None)
+
+
+def get_shared_data(project_id: Optional[str] = None) -> ProjectData:
+    """Return the dataset of ``project_id`` shared by every session of this process.
+
+    読み込むのは選ばれたプロジェクトだけで、ファイルの更新日時とサイズが変わったとき
+    だけ読み直す。共有データは書き換えない(更新関数も作業用のコピーを保存してから
+    新しいスナップショットに差し替える)ので、読み取り中に他のセッションの変更が
+    混ざることはない。
+    """
+
+    project_id = project_id or DEFAULT_PROJECT_ID
+    signature = _storage_signature(project_id)
+    with _shared_lock:
+        entry = _resident.get(project_id)
+        if entry is not None and entry[0] == signature:
+            _resident.move_to_end(project_id)
+            return entry[1]
+        data = load_data(project_id)
+        _make_resident(project_id, signature, data)
+    bump_version(project_id)
+    return data
+
+
+def resident_projects() -> List[str]:
+    """IDs of the projects currently held in memory, least recently used first."""
+
+    with _shared_lock:
+        return list(_resident)
+
+
+def register_mutation_listener(
+    listener: Callable[[Dict[str, List[Dict]], Dict[str, List[Dict]], List[Dict], int, int], None]
+) -> None:
+    """Call ``listener(previous, data, records, previous_version, version)`` after every write.
+
+    インデックスを差分更新したいモジュール向け。``previous`` は変更前の共有スナップショット、
+    ``data`` は ``records`` を反映して差し替えた新しいスナップショット(変更前のものは
+    書き換えないので、差分更新した索引は ``data`` に対して登録し直す)。``save_data`` による
+    全体保存では ``{"op": "replace"}`` のみが渡されるので、受け手は作り直す必要がある。
+    """
+
+    if listener not in _mutation_listeners:
+        _mutation_listeners.append(listener)
+
+
+def _resident_data(project_id: str) -> Optional[ProjectData]:
+    with _shared_lock:
+        entry = _resident.get(project_id)
+    return entry[1] if entry is not None else None
+
+
+def _publish(previous: Optional[Dict[str, List[Dict]]], data: Dict[str, List[Dict]], records: List[Dict]) -> None:
+    """Swap in ``data`` as the shared snapshot after this process wrote it."""
+
+    project_id = project_of(data)
+    with _shared_lock:
+        _make_resident(project_id, _storage_signature(project_id), data)
+    previous_version = current_version(project_id)
+    version = bump_version(project_id)
     st.session_state["data"] = data
+    for listener in list(_mutation_listeners):
+        listener(previous, data, records, previous_version, version)
+
+
+def _write_all(data: Dict[str, List[Dict]]) -> None:
+    project_id = project_of(data)
+    data_file, journal_file, _ = _project_files(project_id)
+    data_file.parent.mkdir(parents=True, exist_ok=True)
+    store = get_sqlite_store(project_id)
+    if store is not None:
+        store.replace_all(data)
+    elif STORAGE_MODE == "journal":
+        journal.compact(data_file, journal_file, data)
+    else:
+        # 他セッションが書き込み途中のファイルを読まないよう置き換えで保存する
+        journal.write_snapshot(data_file, data)
+
+
+def save_data(data: Dict[str, List[Dict]]) -> None:
+    with _write_lock:
+        previous = _resident_data(project_of(data))
+        _write_all(data)
+        _publish(previous, data, [{"op": "replace"}])
+
+
+def _persist(staging: _Staging, validate: bool = False) -> None:
+    """Write the staged mutations, then publish the working copy as the new snapshot.
+
+    作業用コピーを作った後に別のセッションが保存していた場合は、その内容に
+    同じ変更を重ね直してから検証・保存する。
+    """
+
+    with _write_lock:
+        project_id = project_of(staging.data)
+        previous = get_shared_data(project_id)
+        if previous is not staging.base:
+            staging = staging.rebased(previous)
+        data, records = staging.data, staging.records
+        if validate:
+            errors = _validate_records(data, records)
+            if errors:
+                raise BatchValidationError(errors)
+
+        store = get_sqlite_store(project_id)
+        if STORAGE_MODE == "json":
+            _write_all(data)
+        elif store is not None:
+            store.apply(records)
+        else:
+            data_file, journal_file, _ = _project_files(project_id)
+            data_file.parent.mkdir(parents=True, exist_ok=True)
+            journal.append_records(journal_file, records)
+            if journal.journal_size(journal_file) > JOURNAL_COMPACT_BYTES:
+                journal.compact(data_file, journal_file, data)
+        _publish(previous, data, records)
+
+
+def _active_batch(data: Dict[str, List[Dict]]) -> Optional[_Batch]:
+    active = getattr(_batch_state, "batch", None)
+    if active is not None and active.data is data:
+        return active
+    return None
+
+
+@contextmanager
+def _writing(data: Dict[str, List[Dict]]) -> Iterator[_Staging]:
+    """Yield the working copy to change: the open batch's, or one saved on exit."""
+
+    active = _active_batch(data)
+    if active is not None:
+        yield active.staging
+        return
+    staging = _Staging(data)
+    yield staging
+    if staging.records:
+        _persist(staging)
+
+
+def _notify(data: Dict[str, List[Dict]], message: str, icon: Optional[str] = None, toast: bool = True) -> None:
+    active = _active_batch(data)
+    if active is not None:
+        active.messages.append(message)
+    elif toast:
+        st.toast(message, icon=icon)
+    else:
+        st.success(message)
+
+
+def _validate_records(data: Dict[str, List[Dict]], records: List[Dict]) -> List[str]:
+    """Check the WBS/task references touched by ``records`` against ``data``."""
+
+    wbs_by_id = {item.get("id"): item for item in data.get("wbs", [])}
+    tasks_by_id = {task.get("id"): task for task in data.get("tasks", [])}
+    errors: List[str] = []
+
+    for record in records:
+        op = record["op"]
+        if op in ("add_wbs", "add_task", "update_wbs", "update_task"):
+            added = record.get("item") or record.get("task")
+            if PREDECESSORS_FIELD in (added if added is not None else record["fields"]):
+                record_id = added.get("id") if added is not None else record["id"]
+                errors.extend(_dependency_errors(wbs_by_id, tasks_by_id, record_id))
+
+        if op in ("add_wbs", "update_wbs"):
+            wbs_id = record["item"]["id"] if op == "add_wbs" else record["id"]
+            item = wbs_by_id.get(wbs_id)
+            if item is None:
+                continue
+            parent = item.get("parent")
+            if parent is not None and parent not in wbs_by_id:
+                errors.append(f"{item.get('name')} の親WBSが存在しません")
+                continue
+            seen = {wbs_id}
+            while parent is not None:
+                if parent in seen:
+                    errors.append(f"{item.get('name')} は自身または子孫を親にできません")
+                    break
+                seen.add(parent)
+                parent = wbs_by_id.get(parent, {}).get("parent")
+        elif op in ("add_task", "update_task"):
+            task_id = record["task"]["id"] if op == "add_task" else record["id"]
+            task = tasks_by_id.get(task_id)
+            if task is None:
+                continue
+            if task.get("status") not in STATUSES:
+                errors.append(f"不明なステータスです: {task.get('status')}")
+            wbs_id = task.get("wbs_id")
+            if wbs_id and wbs_id not in wbs_by_id:
+                errors.append(f"タスク「{task.get('title')}」の紐づくWBSが存在しません")
+
+    return errors
+
+
+def _dependency_errors(wbs_by_id: Dict[str, Dict], tasks_by_id: Dict[str, Dict], record_id: str) -> List[str]:
+    """Check that the predecessors of ``record_id`` exist and do not form a cycle."""
+
+    record = wbs_by_id.get(record_id) or tasks_by_id.get(record_id)
+    if record is None:
+        return []
+    label = record.get("name") or record.get("title")
+    predecessors = normalize_predecessors(record.get(PREDECESSORS_FIELD))
+    missing = [entry["id"] for entry in predecessors if entry["id"] not in wbs_by_id and entry["id"] not in tasks_by_id]
+    if missing:
+        return [f"{label} の先行項目が存在しません"]
+
+    # 先行項目を遡って自身に戻るなら循環している
+    stack = [entry["id"] for entry in predecessors]
+    seen: Set[str] = set()
+    while stack:
+        current = stack.pop()
+        if current == record_id:
+            return [f"{label} の依存関係が循環しています"]
+        if current in seen:
+            continue
+        seen.add(current)
+        other = wbs_by_id.get(current) or tasks_by_id.get(current) or {}
+        stack.extend(entry["id"] for entry in normalize_predecessors(other.get(PREDECESSORS_FIELD)))
+    return []
+
+
+@contextmanager
+def batch(data: Dict[str, List[Dict]], notify: bool = True) -> Iterator[_Batch]:
+    """Group several mutations into one validated write.
+
+    ブロック内で呼んだ更新関数は ``data`` ではなく作業用のコピーに反映され、
+    ブロックを抜けたときに検証・保存してから新しい共有スナップショットとして
+    差し替える(通知も一度だけ)。例外や検証エラーの場合はコピーを捨てるだけで、
+    ``data`` も保存内容も変わらない。保存後の内容は :func:`get_shared_data` で読む。
+
+    Example::
+
+        with batch(data):
+            for row in rows:
+                add_task(data, row["title"], row["wbs_id"], None, "TODO", "")
+    """
+
+    if _active_batch(data) is not None:
+        # 入れ子の batch は外側にまとめる
+        yield _batch_state.batch
+        return
+
+    pending = _Batch(data, notify)
+    _batch_state.batch = pending
+    try:
+        yield pending
+    finally:
+        _batch_state.batch = None
+
+    if not pending.records:
+        return
+    _persist(pending.staging, validate=True)
+    if pending.notify:
+        if len(pending.messages) == 1:
+            st.toast(pending.messages[0])
+        else:
+            st.toast(f"{len(pending.records)}件の変更を保存しました")
+
+
+def filter_data(data: Dict[str, List[Dict]], filters: Dict) -> Dict[str, List[Dict]]:
+    """Apply the dashboard filters, using indexed SQL when the SQLite store is active."""
+
+    store = get_sqlite_store(project_of(data))
+    if store is not None and filters.get("enabled"):
+        return store.apply_filters(filters)
+    return apply_filters(data, filters)
 
 
 def build_wbs_map(items: List[Dict]) -> Dict[str, WBSItem]:
-    return {
-        item["id"]: WBSItem(
-            id=item["id"],
-            name=item["name"],
-            parent=item.get("parent"),
-            start_date=item.get("start_date"),
-            end_date=item.get("end_date"),
-            actual_start_date=item.get("actual_start_date"),
-            actual_end_date=item.get("actual_end_date"),
-        )
-        for item in items
-    }
+    """Return ``{id: WBSItem}`` for ``items``, built once per data version."""
+
+    return _wbs_map_cache.get_or_build(
+        items, None, lambda: {item["id"]: WBSItem.from_record(item) for item in items}
+    )
 
 
 def add_wbs_item(
@@ -53,19 +579,18 @@ def add_wbs_item(
     start_date,
     end_date,
 ):
-    data["wbs"].append(
-        {
-            "id": str(uuid.uuid4()),
-            "name": name,
-            "parent": parent,
-            "start_date": start_date.isoformat() if start_date else None,
-            "end_date": end_date.isoformat() if end_date else None,
-            "actual_start_date": None,
-            "actual_end_date": None,
-        }
-    )
-    save_data(data)
-    st.success(f"WBS項目を追加しました: {name}")
+    item = {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "parent": parent,
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+        "actual_start_date": None,
+        "actual_end_date": None,
+    }
+    with _writing(data) as staging:
+        staging.change({"op": "add_wbs", "item": item})
+    _notify(data, f"WBS項目を追加しました: {name}", toast=False)
 
 
 def add_task(
@@ -77,62 +602,113 @@ def add_task(
     description: str,
 ):
     due_value = due_date.isoformat() if due_date else None
-    data["tasks"].append(
-        {
-            "id": str(uuid.uuid4()),
-            "title": title,
-            "status": status,
-            "wbs_id": wbs_id,
-            "due": due_value,
-            "description": description,
-        }
-    )
-    save_data(data)
-    st.success(f"タスクを追加しました: {title}")
+    task = {
+        "id": str(uuid.uuid4()),
+        "title": title,
+        "status": status,
+        "wbs_id": wbs_id,
+        "due": due_value,
+        "description": description,
+    }
+    with _writing(data) as staging:
+        staging.change({"op": "add_task", "task": task})
+    _notify(data, f"タスクを追加しました: {title}", toast=False)
+
+
+def add_records(
+    data: Dict[str, List[Dict]],
+    wbs_items: List[Dict],
+    tasks: List[Dict],
+) -> None:
+    """Append already-built WBS/task records in bulk (used by the importer).
+
+    親WBSが先に並んでいる前提で、検証と保存は呼び出し側の batch でまとめて行う。
+    """
+
+    with _writing(data) as staging:
+        for item in wbs_items:
+            staging.change({"op": "add_wbs", "item": item})
+        for task in tasks:
+            staging.change({"op": "add_task", "task": task})
+
+
+def set_predecessors(data: Dict[str, List[Dict]], record_id: str, predecessors: List[Dict]) -> bool:
+    """Replace the predecessors of a WBS item or task. Returns False when nothing changed.
+
+    循環や存在しない先行項目の検証は batch で行うので、batch の中で呼ぶこと。
+    """
+
+    fields = {PREDECESSORS_FIELD: normalize_predecessors(predecessors)}
+    with _writing(data) as staging:
+        is_wbs = staging.find("wbs", record_id) is not None
+    if is_wbs:
+        return update_wbs_item(data, record_id, fields)
+    return update_task(data, record_id, fields)
 
 
 def update_task_status(data: Dict[str, List[Dict]], task_id: str, status: str):
-    for task in data["tasks"]:
-        if task["id"] == task_id:
-            task["status"] = status
-            save_data(data)
-            st.toast("ステータスを更新しました")
-            break
+    with _writing(data) as staging:
+        if staging.find("tasks", task_id) is None:
+            return
+        staging.change({"op": "update_task", "id": task_id, "fields": {"status": status}})
+    _notify(data, "ステータスを更新しました")
+
+
+def update_wbs_item(data: Dict[str, List[Dict]], wbs_id: str, fields: Dict) -> bool:
+    """Update the given fields of a WBS item. Returns False when nothing changed."""
+
+    with _writing(data) as staging:
+        item = staging.find("wbs", wbs_id)
+        if item is None:
+            return False
+        changes = {key: value for key, value in fields.items() if item.get(key) != value}
+        if not changes:
+            return False
+        staging.change({"op": "update_wbs", "id": wbs_id, "fields": changes})
+    return True
+
+
+def update_task(data: Dict[str, List[Dict]], task_id: str, fields: Dict) -> bool:
+    """Update the given fields of a task. Returns False when nothing changed."""
+
+    with _writing(data) as staging:
+        task = staging.find("tasks", task_id)
+        if task is None:
+            return False
+        changes = {key: value for key, value in fields.items() if task.get(key) != value}
+        if not changes:
+            return False
+        staging.change({"op": "update_task", "id": task_id, "fields": changes})
+    return True
 
 
 def delete_task(data: Dict[str, List[Dict]], task_id: str):
-    before = len(data["tasks"])
-    data["tasks"] = [task for task in data["tasks"] if task["id"] != task_id]
-    if len(data["tasks"]) < before:
-        save_data(data)
-        st.toast("タスクを削除しました", icon="⚠️")
+    with _writing(data) as staging:
+        if staging.find("tasks", task_id) is None:
+            return
+        staging.change({"op": "delete_tasks", "ids": [task_id]})
+    _notify(data, "タスクを削除しました", icon="⚠️")
 
 
 def delete_tasks(data: Dict[str, List[Dict]], task_ids: Set[str]) -> int:
-    before = len(data.get("tasks", []))
-    data["tasks"] = [task for task in data.get("tasks", []) if task.get("id") not in task_ids]
-    removed = before - len(data["tasks"])
+    with _writing(data) as staging:
+        removed = sum(1 for task_id in task_ids if staging.find("tasks", task_id) is not None)
+        if removed:
+            staging.change({"op": "delete_tasks", "ids": sorted(task_ids)})
     if removed:
-        save_data(data)
-        st.toast(f"{removed}件のタスクを削除しました", icon="⚠️")
+        _notify(data, f"{removed}件のタスクを削除しました", icon="⚠️")
     return removed
 
 
 def delete_wbs_items(data: Dict[str, List[Dict]], wbs_ids: Set[str]) -> int:
     """削除対象のWBSと紐づくタスクのWBS紐付けを外す."""
 
-    before = len(data["wbs"])
-    data["wbs"] = [item for item in data["wbs"] if item.get("id") not in wbs_ids]
-
-    for task in data.get("tasks", []):
-        if task.get("wbs_id") in wbs_ids:
-            task["wbs_id"] = None
-
-    removed = before - len(data["wbs"])
+    with _writing(data) as staging:
+        removed = sum(1 for wbs_id in wbs_ids if staging.find("wbs", wbs_id) is not None)
+        if removed:
+            staging.change({"op": "delete_wbs", "ids": sorted(wbs_ids)})
     if removed:
-        save_data(data)
-        st.toast(f"{removed}件のWBSを削除しました", icon="⚠️")
-
+        _notify(data, f"{removed}件のWBSを削除しました", icon="⚠️")
     return removed
 
 
@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+_lock = threading.Lock()
+# 全プロジェクト共通の通し番号。プロジェクトごとの版はこの値を割り当てる
+_counter = 0
+# プロジェクトを指定せずに進めたとき(ベンチマークのキャッシュ破棄など)の下限
+_floor = 0
+_versions: Dict[str, int] = {}
+
+
+def current_version(project_id: Optional[str] = None) -> int:
+    """Return the data version of ``project_id`` (the latest of any project when None).
+
+    プロジェクトが分からないデータには、どのプロジェクトの更新でも進む通し番号を使う。
+    """
+
+    if project_id is None:
+        return _counter
+    return max(_versions.get(project_id, 0), _floor)
+
+
+def bump_version(project_id: Optional[str] = None) -> int:
+    """Advance the data version of ``project_id`` after its store has been changed.
+
+    ``project_id`` を省略すると全プロジェクトの版を進める。
+    """
+
+    global _counter, _floor
+    with _lock:
+        _counter += 1
+        if project_id is None:
+            _floor = _counter
+        else:
+            _versions[project_id] = _counter
+        return _counter
+
+
+def version_of(source: Any) -> int:
+    """Return the current version of the project ``source`` was read from."""
+
+    return current_version(getattr(source, "project_id", None))
+
+
+class VersionedCache:
+    """Small LRU cache whose entries are valid for one data version only.
+
+    各エントリは元データの参照も保持し、同じIDの別オブジェクトを誤って
+    ヒットさせないよう ``is`` で同一性を確認する。版は ``source`` の ``project_id``
+    属性のプロジェクトのものを使うので、別プロジェクトの保存では無効にならない。
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, source: Any, key: Hashable, builder: Callable[[], Any]) -> Any:
+        version = version_of(source)
+        cache_key = (id(source), key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] is source and entry[1] == version:
+                self._entries.move_to_end(cache_key)
+                return entry[2]
+
+        value = builder()
+        with self._lock:
+            self._entries[cache_key] = (source, version, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def peek(self, source: Any, key: Hashable = None) -> Optional[Tuple[int, Any]]:
+        """Return ``(version, value)`` cached for ``source`` without rebuilding."""
+
+        with self._lock:
+            entry = self._entries.get((id(source), key))
+        if entry is None or entry[0] is not source:
+            return None
+        return entry[1], entry[2]
+
+    def store(self, source: Any, value: Any, version: int, key: Hashable = None) -> None:
+        """Register ``value`` as valid for ``source`` at ``version`` (incremental updates)."""
+
+        cache_key = (id(source), key)
+        with self._lock:
+            self._entries[cache_key] = (source, version, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RebuildRequired(Exception):
+    """Raised by an index's ``apply`` when a mutation cannot be applied incrementally."""
+
+
+def _apply_each(index: Any, records: Iterable[Dict]) -> None:
+    for record in records:
+        index.apply(record)
+
+
+class IndexCache(VersionedCache):
+    """VersionedCache for an index that is built once and then updated from writes.
+
+    :meth:`on_mutation` を data_store.register_mutation_listener に登録すると、
+    保存のたびに変更前のスナップショットの索引へ変更レコードを ``apply`` で反映し、
+    新しいスナップショットの索引として登録し直す。``apply`` が
+    :class:`RebuildRequired` を送出したときは登録せず、次回参照時に作り直す。
+    ``apply`` を省略した場合はレコードを1件ずつ ``index.apply(record)`` に渡す。
+    """
+
+    def __init__(
+        self,
+        build: Callable[[Any], Any],
+        apply: Optional[Callable[[Any, List[Dict]], None]] = None,
+        maxsize: int = 4,
+    ):
+        super().__init__(maxsize)
+        self._build = build
+        self._apply = apply or _apply_each
+
+    def get(self, data: Any) -> Any:
+        return self.get_or_build(data, None, lambda: self._build(data))
+
+    def on_mutation(
+        self,
+        previous: Optional[Dict[str, List[Dict]]],
+        data: Dict[str, List[Dict]],
+        records: List[Dict],
+        previous_version: int,
+        version: int,
+    ) -> None:
+        cached = self.peek(previous)
+        if cached is None or cached[0] != previous_version:
+            return
+        try:
+            self._apply(cached[1], records)
+        except RebuildRequired:
+            return
+        self.store(data, cached[1], version)
@@ -0,0 +1,23 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+
+def parse_iso_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parse_iso_dates(values: Iterable[Optional[str]]) -> List[Optional[date]]:
+    """Parse a column of ISO strings, converting each distinct value only once."""
+
+    parsed: Dict[Optional[str], Optional[date]] = {}
+    result = []
+    for value in values:
+        if value not in parsed:
+            parsed[value] = parse_iso_date(value)
+        result.append(parsed[value])
+    return result
@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+from .wbs_tree import get_wbs_tree
+
+try:  # Parquet 出力は pyarrow がある場合のみ
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+EXPORT_CHUNK_ROWS = 5000
+
+# インポートでそのまま読み戻せるよう kind / id / name / parent / title / status / wbs_id / due を含める
+EXPORT_COLUMNS = [
+    "kind",
+    "id",
+    "level",
+    "label",
+    "name",
+    "parent",
+    "parent_name",
+    "start_date",
+    "end_date",
+    "actual_start_date",
+    "actual_end_date",
+    "title",
+    "status",
+    "wbs_id",
+    "wbs_name",
+    "due",
+    "description",
+]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def _wbs_row(item: Dict, level: int, names: Dict[str, str]) -> Dict:
+    return {
+        "kind": "wbs",
+        "id": item.get("id"),
+        "level": level,
+        "label": "　" * level + (item.get("name") or ""),
+        "name": item.get("name"),
+        "parent": item.get("parent"),
+        "parent_name": names.get(item.get("parent")),
+        "start_date": item.get("start_date"),
+        "end_date": item.get("end_date"),
+        "actual_start_date": item.get("actual_start_date"),
+        "actual_end_date": item.get("actual_end_date"),
+    }
+
+
+def _task_row(task: Dict, level: int, names: Dict[str, str]) -> Dict:
+    wbs_id = task.get("wbs_id")
+    return {
+        "kind": "task",
+        "id": task.get("id"),
+        "level": level,
+        "label": "　" * level + (task.get("title") or ""),
+        "title": task.get("title"),
+        "status": task.get("status"),
+        "wbs_id": wbs_id,
+        "wbs_name": names.get(wbs_id, "削除済み") if wbs_id else "(未割当)",
+        "due": task.get("due"),
+        "description": task.get("description"),
+    }
+
+
+def iter_export_rows(data: Dict[str, List[Dict]]) -> Iterator[Dict]:
+    """Yield WBS and task rows in hierarchy order.
+
+    各WBSの直後にそのWBSのタスクを1段深いレベルで並べる。親が循環していて
+    ルートから辿れないWBSと、出力済みのWBSに紐づかないタスクは最後にまとめて出力する。
+    """
+
+    wbs_items = data.get("wbs", [])
+    tree = get_wbs_tree(wbs_items)
+    names = {item.get("id"): item.get("name") for item in wbs_items}
+    tasks_by_wbs: Dict[Optional[str], List[Dict]] = {}
+    for task in data.get("tasks", []):
+        tasks_by_wbs.setdefault(task.get("wbs_id"), []).append(task)
+
+    for item, level in tree.iter_with_levels():
+        yield _wbs_row(item, level, names)
+        for task in tasks_by_wbs.pop(item.get("id"), []):
+            yield _task_row(task, level + 1, names)
+
+    for item in wbs_items:
+        if item.get("id") not in tree.position:
+            yield _wbs_row(item, 0, names)
+            for task in tasks_by_wbs.pop(item.get("id"), []):
+                yield _task_row(task, 1, names)
+
+    for tasks in tasks_by_wbs.values():
+        for task in tasks:
+            yield _task_row(task, 0, names)
+
+
+def _chunked(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk: List[Dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv_chunks(rows: Iterator[Dict], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield UTF-8 (BOM 付き) CSV bytes ``chunk_rows`` rows at a time."""
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    prefix = "﻿"
+    for chunk in _chunked(rows, chunk_rows):
+        writer.writerows(chunk)
+        yield (prefix + buffer.getvalue()).encode("utf-8")
+        prefix = ""
+        buffer.seek(0)
+        buffer.truncate()
+    if prefix:
+        # 行が無い場合もヘッダーだけは出力する
+        yield (prefix + buffer.getvalue()).encode("utf-8")
+
+
+def iter_jsonl_chunks(rows: Iterator[Dict], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    for chunk in _chunked(rows, chunk_rows):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only sink that hands written bytes back after each row group."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # pyarrow はフッターのオフセット計算に書き込み済みバイト数を使う
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet_chunks(rows: Iterator[Dict], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield a Parquet file one row group at a time (requires pyarrow)."""
+
+    if pq is None:
+        raise RuntimeError("Parquet 出力には pyarrow が必要です")
+
+    schema = pa.schema(
+        [(name, pa.int32() if name == "level" else pa.string()) for name in EXPORT_COLUMNS]
+    )
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunked(rows, chunk_rows):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_export(data: Dict[str, List[Dict]], file_format: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield the export of ``data`` as ``"csv"``, ``"jsonl"`` or ``"parquet"`` bytes."""
+
+    rows = iter_export_rows(data)
+    if file_format == "csv":
+        return iter_csv_chunks(rows, chunk_rows)
+    if file_format == "jsonl":
+        return iter_jsonl_chunks(rows, chunk_rows)
+    if file_format == "parquet":
+        return iter_parquet_chunks(rows, chunk_rows)
+    raise ValueError(f"unknown export format: {file_format}")
+
+
+def spool_export(data: Dict[str, List[Dict]], file_format: str) -> bytes:
+    """Write the export to a temporary file chunk by chunk and return its bytes.
+
+    行の組み立てと書式変換はチャンク単位で行うが、st.download_button は出力全体を
+    1つの bytes として受け取りメディアストレージに保持するため、完成したファイルは
+    配信している間メモリに載る(出力サイズに比例する)。
+    """
+
+    with tempfile.TemporaryFile() as spool:
+        for chunk in iter_export(data, file_format):
+            spool.write(chunk)
+        spool.seek(0)
+        return spool.read()
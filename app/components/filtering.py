@@ -1,51 +1,92 @@
 from datetime import date
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 
-from .wbs_structure_table import parse_iso_date
+import numpy as np
 
+from .data_version import VersionedCache
+from .dates import parse_iso_dates
+from .interval_index import IntervalIndex
 
-def _is_within_range(target: Optional[date], start: Optional[date], end: Optional[date]) -> bool:
-    if start and target and target < start:
-        return False
-    if end and target and target > end:
-        return False
-    return True
 
+def _date_column(values: List[Optional[str]]) -> np.ndarray:
+    """Parse ISO strings once into a datetime64[D] column (invalid -> NaT)."""
 
-def _wbs_matches(item: Dict, start: Optional[date], end: Optional[date], level_query: Optional[str]) -> bool:
-    start_date = parse_iso_date(item.get("start_date"))
-    end_date = parse_iso_date(item.get("end_date"))
+    return np.array(parse_iso_dates(values), dtype="datetime64[D]")
 
-    if not _is_within_range(start_date or end_date, start, end):
-        return False
 
-    if level_query and level_query not in item.get("name", ""):
-        return False
+class FilterColumns:
+    """Columnar view of a dataset used by :func:`apply_filters`.
 
-    return True
+    日付は予定・実績・期限ごとの区間索引、ステータスはカテゴリコード、タスクの
+    WBS紐付けは WBS ID のコード配列として一度だけ組み立て、データのバージョンごとに使い回す。
+    """
 
+    # タスクの wbs_id が空(未割当)/存在しないWBSを指す場合のコード
+    UNASSIGNED = -1
+    MISSING = -2
 
-def _task_matches(
-    task: Dict,
-    start: Optional[date],
-    end: Optional[date],
-    status: Optional[str],
-    allowed_wbs: Optional[List[str]],
-) -> bool:
-    due_date = parse_iso_date(task.get("due"))
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self.wbs = data.get("wbs", [])
+        self.tasks = data.get("tasks", [])
 
-    if status and task.get("status") != status:
-        return False
+        wbs_dates = {
+            column: _date_column([item.get(column) for item in self.wbs])
+            for column in ("start_date", "end_date", "actual_start_date", "actual_end_date")
+        }
+        self.wbs_planned = IntervalIndex(wbs_dates["start_date"], wbs_dates["end_date"])
+        # 実績終了日の無い(進行中の)WBSは今日まで続いているものとして扱う
+        self.wbs_actual = IntervalIndex(
+            wbs_dates["actual_start_date"], wbs_dates["actual_end_date"], open_ended=True
+        )
+        # 予定・実績とも日付の無いWBSは期間で絞り込まない
+        self.wbs_undated = np.logical_and.reduce([np.isnat(values) for values in wbs_dates.values()])
+        self.wbs_names = [item.get("name", "") for item in self.wbs]
 
-    if not _is_within_range(due_date, start, end):
-        return False
+        wbs_codes: Dict[Optional[str], int] = {}
+        self.wbs_id_codes = np.array(
+            [wbs_codes.setdefault(item.get("id"), len(wbs_codes)) for item in self.wbs],
+            dtype=np.int64,
+        )
+        self.wbs_code_count = len(wbs_codes)
 
-    if allowed_wbs is not None:
-        task_wbs = task.get("wbs_id")
-        if task_wbs and task_wbs not in allowed_wbs:
-            return False
+        task_due = _date_column([task.get("due") for task in self.tasks])
+        self.task_due = IntervalIndex(task_due, task_due)
+        self.task_undated = np.isnat(task_due)
 
-    return True
+        self.status_codes: Dict[Optional[str], int] = {}
+        self.task_status = np.array(
+            [self.status_codes.setdefault(task.get("status"), len(self.status_codes)) for task in self.tasks],
+            dtype=np.int32,
+        )
+
+        self.task_wbs = np.array(
+            [
+                wbs_codes.get(task.get("wbs_id"), self.MISSING) if task.get("wbs_id") else self.UNASSIGNED
+                for task in self.tasks
+            ],
+            dtype=np.int64,
+        )
+
+
+_columns_cache = VersionedCache(maxsize=4)
+
+
+def get_filter_columns(data: Dict[str, List[Dict]]) -> FilterColumns:
+    return _columns_cache.get_or_build(data, None, lambda: FilterColumns(data))
+
+
+def _range_mask(
+    indexes: List[IntervalIndex], undated: np.ndarray, start: Optional[date], end: Optional[date]
+) -> np.ndarray:
+    """Rows with any interval overlapping ``[start, end]``; rows without dates are kept."""
+
+    mask = undated.copy()
+    if start is None and end is None:
+        mask[:] = True
+        return mask
+    for index in indexes:
+        mask |= index.mask(start, end)
+    return mask
 
 
 def apply_filters(data: Dict[str, List[Dict]], filters: Dict) -> Dict[str, List[Dict]]:
@@ -58,19 +99,43 @@ def apply_filters(data: Dict[str, List[Dict]], filters: Dict) -> Dict[str, List[
     end: Optional[date] = filters.get("end")
     status: Optional[str] = filters.get("status")
     level_query: Optional[str] = filters.get("level")
-
-    filtered_wbs = [
-        item
-        for item in data.get("wbs", [])
-        if _wbs_matches(item, start, end, level_query)
-    ]
-
-    allowed_wbs = [item.get("id") for item in filtered_wbs] if level_query else None
-
-    filtered_tasks = [
-        task
-        for task in data.get("tasks", [])
-        if _task_matches(task, start, end, status, allowed_wbs)
-    ]
-
-    return {"wbs": filtered_wbs, "tasks": filtered_tasks}
+    # outline_index.resolve_outline_filter が階層番号("1-2")から求めた部分木のWBS
+    wbs_ids: Optional[Set[str]] = filters.get("wbs_ids")
+
+    columns = get_filter_columns(data)
+
+    # 予定期間・実績期間のどちらかが表示期間と重なるWBSを残す
+    wbs_mask = _range_mask([columns.wbs_planned, columns.wbs_actual], columns.wbs_undated, start, end)
+    if level_query:
+        wbs_mask &= np.fromiter(
+            (level_query in name for name in columns.wbs_names),
+            dtype=bool,
+            count=len(columns.wbs_names),
+        )
+    if wbs_ids is not None:
+        wbs_mask &= np.fromiter(
+            (item.get("id") in wbs_ids for item in columns.wbs),
+            dtype=bool,
+            count=len(columns.wbs),
+        )
+
+    task_mask = _range_mask([columns.task_due], columns.task_undated, start, end)
+    if status:
+        code = columns.status_codes.get(status)
+        if code is None:
+            task_mask[:] = False
+        else:
+            task_mask &= columns.task_status == code
+
+    if level_query or wbs_ids is not None:
+        allowed = np.zeros(columns.wbs_code_count + 2, dtype=bool)
+        allowed[columns.wbs_id_codes[wbs_mask]] = True
+        # 未割当は常に許可し、存在しないWBSを指すタスクは除外する
+        allowed[columns.UNASSIGNED] = True
+        allowed[columns.MISSING] = False
+        task_mask &= allowed[columns.task_wbs]
+
+    return {
+        "wbs": [columns.wbs[i] for i in np.flatnonzero(wbs_mask)],
+        "tasks": [columns.tasks[i] for i in np.flatnonzero(task_mask)],
+    }
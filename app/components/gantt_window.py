@@ -0,0 +1,152 @@
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_version import VersionedCache
+from .interval_index import NAT, IntervalIndex
+
+# NaT を除外して最小値を取るための番兵
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+def _as_day_ints(values: pd.Series) -> np.ndarray:
+    """Convert a date/None column to int64 day numbers (NaT -> int64 min)."""
+
+    return pd.to_datetime(values, errors="coerce").to_numpy(dtype="datetime64[ns]").astype(
+        "datetime64[D]"
+    ).view(np.int64)
+
+
+def _from_day_ints(values: np.ndarray) -> List[Optional[date]]:
+    days = values.view("datetime64[D]")
+    return [None if np.isnat(day) else day.astype(object) for day in days]
+
+
+def collapse_levels(
+    chart_df: pd.DataFrame,
+    levels: Sequence[int],
+    subtree_end: Sequence[int],
+    max_level: int,
+    min_columns: List[str],
+    max_columns: List[str],
+) -> pd.DataFrame:
+    """Fold every subtree below ``max_level`` into its ancestor row.
+
+    ``chart_df`` は WBSTree と同じ行きがけ順に並んでいる前提で、``levels`` /
+    ``subtree_end`` はその位置ごとの階層と部分木の終端を表す。``max_level`` の
+    行は子孫を含めた ``min_columns`` の最小値・``max_columns`` の最大値を持つ
+    集約バーになり、``collapsed_count`` 列に畳んだ子孫の件数が入る。
+    """
+
+    levels = np.asarray(levels)
+    subtree_end = np.asarray(subtree_end)
+    keep = np.flatnonzero(levels <= max_level)
+    result = chart_df.iloc[keep].copy()
+
+    collapsed = keep[(levels[keep] == max_level) & (subtree_end[keep] - keep > 1)]
+    result["collapsed_count"] = 0
+    if not len(collapsed):
+        return result
+
+    # reduceat で [pos, end) の各区間をまとめて集計する(奇数番目の区間は捨てる)
+    bounds = np.empty(len(collapsed) * 2, dtype=np.int64)
+    bounds[0::2] = collapsed
+    bounds[1::2] = subtree_end[collapsed]
+    row_positions = pd.Index(keep).get_indexer(collapsed)
+
+    for column in min_columns + max_columns:
+        values = _as_day_ints(chart_df[column])
+        if column in min_columns:
+            values = np.where(values == np.iinfo(np.int64).min, _INT64_MAX, values)
+            reduced = np.minimum.reduceat(np.append(values, _INT64_MAX), bounds)[0::2]
+            reduced = np.where(reduced == _INT64_MAX, np.iinfo(np.int64).min, reduced)
+        else:
+            reduced = np.maximum.reduceat(np.append(values, np.iinfo(np.int64).min), bounds)[0::2]
+        column_index = result.columns.get_loc(column)
+        for row, value in zip(row_positions, _from_day_ints(reduced)):
+            result.iat[row, column_index] = value
+
+    result.iloc[row_positions, result.columns.get_loc("collapsed_count")] = (
+        subtree_end[collapsed] - collapsed - 1
+    )
+    return result
+
+
+def overlaps_window(
+    starts: pd.Series,
+    ends: pd.Series,
+    window_start: Optional[date],
+    window_end: Optional[date],
+) -> pd.Series:
+    """Return a mask of bars intersecting ``[window_start, window_end]``.
+
+    片側の日付しか無いバーはその日付だけの区間として扱う。
+    """
+
+    bar_start = pd.to_datetime(starts.where(starts.notna(), ends), errors="coerce")
+    bar_end = pd.to_datetime(ends.where(ends.notna(), starts), errors="coerce")
+    # NaT との比較は False になるので日付の無いバーは除外される
+    mask = bar_start.notna()
+    if window_end is not None:
+        mask &= bar_start <= pd.Timestamp(window_end)
+    if window_start is not None:
+        mask &= bar_end >= pd.Timestamp(window_start)
+    return mask
+
+
+class ChartIntervals:
+    """Interval indexes over the planned and actual bars of a chart frame (row positions).
+
+    予定バーは開始・終了予定日の両方がある行、実績バーは実績開始日がある行だけを
+    含め、実績終了日の無い行は今日まで続くバーとして扱う(prepare_chart_frame と同じ)。
+    """
+
+    def __init__(self, chart_df: pd.DataFrame):
+        planned_start = _as_day_ints(chart_df["start_date"])
+        planned_end = _as_day_ints(chart_df["end_date"])
+        has_planned = (planned_start != NAT) & (planned_end != NAT)
+        actual_start = _as_day_ints(chart_df["actual_start_date"])
+        actual_end = _as_day_ints(chart_df["actual_end_date"])
+        actual_end = np.where(actual_start != NAT, actual_end, NAT)
+        self.planned = IntervalIndex(
+            np.where(has_planned, planned_start, NAT).view("datetime64[D]"),
+            np.where(has_planned, planned_end, NAT).view("datetime64[D]"),
+        )
+        self.actual = IntervalIndex(
+            actual_start.view("datetime64[D]"), actual_end.view("datetime64[D]"), open_ended=True
+        )
+
+    def extent(self) -> Optional[Tuple[date, date]]:
+        """Earliest and latest date over every bar; None when there is no bar."""
+
+        extents = [extent for extent in (self.planned.extent(), self.actual.extent()) if extent]
+        if not extents:
+            return None
+        return min(start for start, _ in extents), max(end for _, end in extents)
+
+    def window_mask(self, window_start: Optional[date], window_end: Optional[date]) -> np.ndarray:
+        """Rows with a planned or actual bar intersecting the window (see :func:`overlaps_window`)."""
+
+        return self.planned.mask(window_start, window_end) | self.actual.mask(window_start, window_end)
+
+
+_intervals_cache = VersionedCache(maxsize=8)
+
+
+def get_chart_intervals(wbs_items: List[Dict], chart_df: pd.DataFrame) -> ChartIntervals:
+    """Return the :class:`ChartIntervals` of ``chart_df``, built once per ``wbs_items`` version.
+
+    ``chart_df`` は ``wbs_items`` から作ったフレーム(get_wbs_dataframe の行順)であること。
+    """
+
+    return _intervals_cache.get_or_build(wbs_items, None, lambda: ChartIntervals(chart_df))
+
+
+def page_bounds(total_rows: int, page_size: int, page: int) -> slice:
+    """Return the row slice for a 1-based ``page``."""
+
+    page_count = max(1, -(-total_rows // page_size))
+    page = min(max(page, 1), page_count)
+    return slice((page - 1) * page_size, min(page * page_size, total_rows))
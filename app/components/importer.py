@@ -0,0 +1,242 @@
+import csv
+import io
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set
+
+from .data_store import add_records, batch
+from .models import STATUSES
+from .dates import parse_iso_date
+
+IMPORT_CHUNK_SIZE = 5000
+# 画面に表示するエラーの上限(件数自体はすべて数える)
+MAX_REPORTED_ERRORS = 200
+
+WBS_DATE_FIELDS = ("start_date", "end_date", "actual_start_date", "actual_end_date")
+
+
+@dataclass
+class ImportReport:
+    rows_read: int = 0
+    wbs_added: int = 0
+    tasks_added: int = 0
+    error_count: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def add_error(self, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Dict]:
+    """Yield CSV rows one by one (UTF-8, BOM tolerated)."""
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def iter_jsonl_rows(stream: BinaryIO) -> Iterator[Dict]:
+    """Yield one object per JSON Lines row; broken lines become ``{"_error": ...}``."""
+
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield {"_error": f"{line_no}行目: JSONとして読み込めません"}
+            continue
+        yield row if isinstance(row, dict) else {"_error": f"{line_no}行目: オブジェクトではありません"}
+
+
+def _clean(value) -> Optional[str]:
+    """Treat empty CSV cells as missing values."""
+
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _row_kind(row: Dict) -> str:
+    kind = _clean(row.get("kind"))
+    if kind:
+        return kind.lower()
+    # kind 列が無い場合はタスク固有の列があるかで判定する
+    return "task" if any(_clean(row.get(name)) for name in ("title", "status", "wbs_id")) else "wbs"
+
+
+class _Importer:
+    """Validate rows and resolve parent/WBS references through an ID index.
+
+    親がまだ現れていない行は親IDごとに待たせておき、親が取り込まれた時点で
+    まとめて解決する。最後まで親が現れなかった行はエラーとして報告する。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]], report: ImportReport):
+        self.data = data
+        self.report = report
+        self.wbs_ids = {item.get("id") for item in data.get("wbs", [])}
+        self.task_ids = {task.get("id") for task in data.get("tasks", [])}
+        self.waiting_wbs: Dict[str, List[Dict]] = {}
+        self.waiting_wbs_ids: Set[str] = set()
+        self.waiting_tasks: Dict[str, List[Dict]] = {}
+        self.ready_wbs: List[Dict] = []
+        self.ready_tasks: List[Dict] = []
+
+    def _date(self, row: Dict, name: str, label: str) -> Optional[str]:
+        value = _clean(row.get(name))
+        if value is None:
+            return None
+        parsed = parse_iso_date(value)
+        if parsed is None:
+            raise ValueError(f"{label}: {name} の日付が不正です ({value})")
+        return parsed.isoformat()
+
+    def _new_id(self, row: Dict, known: Set[str], label: str) -> str:
+        record_id = _clean(row.get("id")) or str(uuid.uuid4())
+        if record_id in known:
+            raise ValueError(f"{label}: IDが重複しています ({record_id})")
+        return record_id
+
+    def add_row(self, row: Dict, label: str) -> None:
+        if "_error" in row:
+            self.report.add_error(row["_error"])
+            return
+        try:
+            kind = _row_kind(row)
+            if kind == "wbs":
+                self._add_wbs(row, label)
+            elif kind == "task":
+                self._add_task(row, label)
+            else:
+                raise ValueError(f"{label}: 不明な種別です ({kind})")
+        except ValueError as exc:
+            self.report.add_error(str(exc))
+
+    def _add_wbs(self, row: Dict, label: str) -> None:
+        name = _clean(row.get("name"))
+        if not name:
+            raise ValueError(f"{label}: WBS名が空です")
+        record_id = self._new_id(row, self.wbs_ids, label)
+        if record_id in self.waiting_wbs_ids:
+            raise ValueError(f"{label}: IDが重複しています ({record_id})")
+        item = {"id": record_id, "name": name, "parent": _clean(row.get("parent"))}
+        for field_name in WBS_DATE_FIELDS:
+            item[field_name] = self._date(row, field_name, label)
+
+        if item["parent"] is None or item["parent"] in self.wbs_ids:
+            self._accept_wbs(item)
+        else:
+            self.waiting_wbs.setdefault(item["parent"], []).append(item)
+            self.waiting_wbs_ids.add(record_id)
+
+    def _add_task(self, row: Dict, label: str) -> None:
+        title = _clean(row.get("title"))
+        if not title:
+            raise ValueError(f"{label}: タイトルが空です")
+        status = _clean(row.get("status")) or STATUSES[0]
+        if status not in STATUSES:
+            raise ValueError(f"{label}: 不明なステータスです ({status})")
+        task = {
+            "id": self._new_id(row, self.task_ids, label),
+            "title": title,
+            "status": status,
+            "wbs_id": _clean(row.get("wbs_id")),
+            "due": self._date(row, "due", label),
+            "description": row.get("description") or "",
+        }
+        self.task_ids.add(task["id"])
+
+        if task["wbs_id"] is None or task["wbs_id"] in self.wbs_ids:
+            self.ready_tasks.append(task)
+        else:
+            self.waiting_tasks.setdefault(task["wbs_id"], []).append(task)
+
+    def _accept_wbs(self, item: Dict) -> None:
+        # 取り込んだWBSを親として待っていた行を芋づる式に解決する(再帰は使わない)
+        stack = [item]
+        while stack:
+            current = stack.pop()
+            self.waiting_wbs_ids.discard(current["id"])
+            self.wbs_ids.add(current["id"])
+            self.ready_wbs.append(current)
+            self.ready_tasks.extend(self.waiting_tasks.pop(current["id"], []))
+            stack.extend(reversed(self.waiting_wbs.pop(current["id"], [])))
+
+    def flush(self) -> None:
+        if self.ready_wbs or self.ready_tasks:
+            add_records(self.data, self.ready_wbs, self.ready_tasks)
+            self.report.wbs_added += len(self.ready_wbs)
+            self.report.tasks_added += len(self.ready_tasks)
+            self.ready_wbs = []
+            self.ready_tasks = []
+
+    def finish(self) -> None:
+        self.flush()
+        for parent_id, items in self.waiting_wbs.items():
+            for item in items:
+                self.report.add_error(f"WBS「{item['name']}」の親WBSが見つかりません ({parent_id})")
+        for wbs_id, tasks in self.waiting_tasks.items():
+            for task in tasks:
+                self.report.add_error(f"タスク「{task['title']}」の紐づくWBSが見つかりません ({wbs_id})")
+
+
+def import_rows(
+    data: Dict[str, List[Dict]],
+    rows: Iterator[Dict],
+    progress: Optional[Callable[[ImportReport], None]] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> ImportReport:
+    """Stream ``rows`` into ``data`` in chunks and persist them as one batch.
+
+    不正な行は取り込まずにエラーとして数える。保存は最後に一度だけ行われ、
+    途中で例外が起きた場合は batch により何も保存されない。
+    """
+
+    report = ImportReport()
+    importer = _Importer(data, report)
+    with batch(data, notify=False):
+        for row in rows:
+            report.rows_read += 1
+            importer.add_row(row, f"{report.rows_read}行目")
+            if report.rows_read % chunk_size == 0:
+                importer.flush()
+                if progress is not None:
+                    progress(report)
+        importer.finish()
+    if progress is not None:
+        progress(report)
+    return report
+
+
+def import_stream(
+    data: Dict[str, List[Dict]],
+    stream: BinaryIO,
+    file_format: str,
+    total_bytes: Optional[int] = None,
+    progress: Optional[Callable[[ImportReport, Optional[float]], None]] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> ImportReport:
+    """Import a CSV (``"csv"``) or JSON Lines (``"jsonl"``) binary stream.
+
+    ``progress`` にはチャンクごとに読み込み済みバイト数から求めた進捗率(0〜1)を渡す。
+    """
+
+    reader = iter_csv_rows if file_format == "csv" else iter_jsonl_rows
+
+    def report_progress(report: ImportReport) -> None:
+        if progress is None:
+            return
+        fraction = None
+        if total_bytes:
+            fraction = min(stream.tell() / total_bytes, 1.0)
+        progress(report, fraction)
+
+    return import_rows(data, reader(stream), report_progress, chunk_size)
@@ -0,0 +1,143 @@
+from datetime import date
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# datetime64[D] を int64 として見たときの NaT
+NAT = np.iinfo(np.int64).min
+
+
+def day_number(value: Optional[date]) -> Optional[int]:
+    """Return the datetime64[D] day number of ``value`` (None stays None)."""
+
+    return None if value is None else int(np.datetime64(value, "D").astype(np.int64))
+
+
+def _to_date(day: int) -> date:
+    return np.datetime64(day, "D").astype(object)
+
+
+class _Bucket:
+    """Intervals of one length class (or the open-ended ones), sorted by start."""
+
+    __slots__ = ("starts", "ends", "positions", "max_length")
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, positions: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self.positions = positions
+        self.max_length = int((ends - starts).max()) if len(starts) else 0
+
+
+class IntervalIndex:
+    """Static index of closed day intervals for overlap and extent queries.
+
+    区間を長さの桁(0, 1, 2〜3, 4〜7, ... 日)ごとの組に分け、組ごとに開始日順に並べる。
+    長さが L 以下の組で [a, b] と重なる区間は開始日が [a - L, b] にあるので、
+    二分探索で切り出した範囲の終了日だけを確かめればよい(組の中の長さは 2 倍以内に
+    揃うため、確かめて捨てる件数も重なる件数と同程度に収まる)。
+    ``open_ended`` のとき終了日の無い区間(進行中の実績)は別の組に入れ、今日まで
+    続いているものとして扱う(ガントチャートで今日までのバーを描くのと同じ)。
+
+    ``starts`` / ``ends`` は行ごとの datetime64[D] 配列で、結果は行の位置で返す。
+    片側だけ日付のある行はその日だけの区間、両方無い行は索引に含めない。
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, open_ended: bool = False):
+        starts = np.asarray(starts, dtype="datetime64[D]").view(np.int64)
+        ends = np.asarray(ends, dtype="datetime64[D]").view(np.int64)
+        has_start = starts != NAT
+        has_end = ends != NAT
+        self.size = len(starts)
+
+        in_open = np.zeros(self.size, dtype=bool)
+        if open_ended:
+            # 開始日だけの行は終わりの無い区間
+            in_open = has_start & ~has_end
+        open_rows = np.flatnonzero(in_open)
+        order = np.argsort(starts[open_rows], kind="stable")
+        self.open = _Bucket(starts[open_rows][order], starts[open_rows][order], open_rows[order])
+
+        rows = np.flatnonzero((has_start | has_end) & ~in_open)
+        lo = np.where(has_start[rows], starts[rows], ends[rows])
+        hi = np.where(has_end[rows], ends[rows], starts[rows])
+        # 終了日が開始日より前の行は日付を入れ替えて扱う
+        lo, hi = np.minimum(lo, hi), np.maximum(lo, hi)
+
+        # 長さ L の桁: 0 -> 0, 1 -> 1, 2〜3 -> 2, 4〜7 -> 3, ...
+        classes = np.ceil(np.log2(hi - lo + 1)).astype(np.int64)
+        order = np.lexsort((lo, classes))
+        classes = classes[order]
+        bounds = np.flatnonzero(np.diff(classes)) + 1
+        self.buckets: List[_Bucket] = [
+            _Bucket(lo[order][part], hi[order][part], rows[order][part])
+            for part in np.split(np.arange(len(order)), bounds)
+            if len(part)
+        ]
+
+        self._min_start = min((int(bucket.starts[0]) for bucket in self._all_buckets()), default=None)
+        self._max_end = max((int(bucket.ends.max()) for bucket in self.buckets), default=None)
+
+    def _all_buckets(self) -> List[_Bucket]:
+        return self.buckets + [self.open] if len(self.open.starts) else self.buckets
+
+    def __len__(self) -> int:
+        return sum(len(bucket.starts) for bucket in self._all_buckets())
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+    def overlapping(
+        self, window_start: Optional[date], window_end: Optional[date], today: Optional[date] = None
+    ) -> np.ndarray:
+        """Return the sorted row positions whose interval intersects the window.
+
+        窓の片側が None ならその側は制限しない。終わりの無い区間は ``today``
+        (省略時は今日) まで続くものとして判定する。
+        """
+
+        found = self._positions(window_start, window_end, today)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+    def mask(
+        self, window_start: Optional[date], window_end: Optional[date], today: Optional[date] = None
+    ) -> np.ndarray:
+        """Boolean row mask of :meth:`overlapping` (rows without dates are False)."""
+
+        result = np.zeros(self.size, dtype=bool)
+        for positions in self._positions(window_start, window_end, today):
+            result[positions] = True
+        return result
+
+    def _positions(
+        self, window_start: Optional[date], window_end: Optional[date], today: Optional[date]
+    ) -> List[np.ndarray]:
+        start = day_number(window_start)
+        end = day_number(window_end)
+        found = []
+        for bucket in self.buckets:
+            lo = 0 if start is None else int(np.searchsorted(bucket.starts, start - bucket.max_length, side="left"))
+            hi = len(bucket.starts) if end is None else int(np.searchsorted(bucket.starts, end, side="right"))
+            if lo < hi:
+                positions = bucket.positions[lo:hi]
+                found.append(positions if start is None else positions[bucket.ends[lo:hi] >= start])
+        if len(self.open.starts) and (start is None or day_number(today or date.today()) >= start):
+            hi = len(self.open.starts) if end is None else int(np.searchsorted(self.open.starts, end, side="right"))
+            found.append(self.open.positions[:hi])
+        return found
+
+    def extent(self, today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+        """Return ``(earliest start, latest end)``; None when no row has a date.
+
+        終わりの無い区間は ``today`` (省略時は今日) まで続くものとして扱う。
+        """
+
+        if self._min_start is None:
+            return None
+        latest = self._max_end
+        if len(self.open.starts):
+            today_number = day_number(today or date.today())
+            latest = today_number if latest is None else max(latest, today_number)
+        return _to_date(self._min_start), _to_date(latest)
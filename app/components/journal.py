@@ -0,0 +1,142 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+
+class _Replayer:
+    """Apply journal records to a dataset using ID indexes.
+
+    再生が二重に行われても結果が変わらないよう、すべての操作を冪等にしている
+    (スナップショット書き込み後・ジャーナル切り詰め前に落ちた場合の対策)。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self.data = data
+        self.wbs_index = {item.get("id"): item for item in data["wbs"]}
+        self.task_index = {task.get("id"): task for task in data["tasks"]}
+        self.deleted_wbs: Set[str] = set()
+        self.deleted_tasks: Set[str] = set()
+
+    def apply(self, record: Dict) -> None:
+        op = record.get("op")
+        if op == "add_wbs":
+            item = record["item"]
+            if item.get("id") not in self.wbs_index:
+                item = dict(item)
+                self.data["wbs"].append(item)
+                self.wbs_index[item.get("id")] = item
+        elif op == "add_task":
+            task = record["task"]
+            if task.get("id") not in self.task_index:
+                task = dict(task)
+                self.data["tasks"].append(task)
+                self.task_index[task.get("id")] = task
+        elif op == "update_wbs":
+            item = self.wbs_index.get(record["id"])
+            if item is not None:
+                item.update(record["fields"])
+        elif op == "update_task":
+            task = self.task_index.get(record["id"])
+            if task is not None:
+                task.update(record["fields"])
+        elif op == "delete_tasks":
+            for task_id in record["ids"]:
+                if self.task_index.pop(task_id, None) is not None:
+                    self.deleted_tasks.add(task_id)
+        elif op == "delete_wbs":
+            ids = set(record["ids"])
+            for wbs_id in ids:
+                if self.wbs_index.pop(wbs_id, None) is not None:
+                    self.deleted_wbs.add(wbs_id)
+            for task in self.task_index.values():
+                if task.get("wbs_id") in ids:
+                    task["wbs_id"] = None
+        else:
+            raise ValueError(f"unknown journal operation: {op!r}")
+
+    def finish(self) -> Dict[str, List[Dict]]:
+        if self.deleted_wbs:
+            self.data["wbs"] = [
+                item for item in self.data["wbs"] if item.get("id") not in self.deleted_wbs
+            ]
+        if self.deleted_tasks:
+            self.data["tasks"] = [
+                task for task in self.data["tasks"] if task.get("id") not in self.deleted_tasks
+            ]
+        return self.data
+
+
+def apply_records(data: Dict[str, List[Dict]], records: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Apply mutation records to ``data`` in place and return it."""
+
+    data.setdefault("wbs", [])
+    data.setdefault("tasks", [])
+    replayer = _Replayer(data)
+    for record in records:
+        replayer.apply(record)
+    return replayer.finish()
+
+
+def read_records(journal_file: Path) -> Iterable[Dict]:
+    """Yield journal records, skipping lines torn by an interrupted write."""
+
+    if not journal_file.exists():
+        return
+    with journal_file.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # 書き込み途中で終了した行は読み飛ばす
+                continue
+
+
+def replay(data: Dict[str, List[Dict]], journal_file: Path) -> Dict[str, List[Dict]]:
+    return apply_records(data, read_records(journal_file))
+
+
+def append_records(journal_file: Path, records: List[Dict]) -> None:
+    if not records:
+        return
+    payload = "".join(
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for record in records
+    )
+    with journal_file.open("a+b") as f:
+        # 前回の書き込みが途中で切れていた場合は改行で区切ってから追記する
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                payload = "\n" + payload
+        f.write(payload.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def journal_size(journal_file: Path) -> int:
+    try:
+        return journal_file.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def write_snapshot(data_file: Path, data: Dict[str, List[Dict]]) -> None:
+    """Atomically replace the snapshot file with ``data``."""
+
+    tmp_file = data_file.with_suffix(data_file.suffix + ".tmp")
+    with tmp_file.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, data_file)
+
+
+def compact(data_file: Path, journal_file: Path, data: Dict[str, List[Dict]]) -> None:
+    """Fold the journal into a fresh snapshot and truncate it."""
+
+    write_snapshot(data_file, data)
+    journal_file.write_text("", encoding="utf-8")
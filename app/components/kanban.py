@@ -2,27 +2,21 @@ from typing import Dict, List, Optional
 
 from .models import STATUSES, WBSItem
 
+UNASSIGNED_LABEL = "(未割当)"
+DELETED_LABEL = "削除済み"
+
 
 def format_wbs_label(wbs_map: Dict[str, WBSItem], wbs_id: Optional[str]) -> str:
     """Return a human-friendly WBS label for task cards.
 
     - 未割当の場合はプレースホルダーを返す
-    - 削除済みの可能性があるIDはダミーのWBSItemを作成して対応する
+    - 実在しないIDは「削除済み」として扱う
     """
     if wbs_id is None:
-        return "(未割当)"
-
-    # 実在しないIDは「削除済み」として扱う
-    deleted_placeholder = WBSItem(
-        id="-",
-        name="削除済み",
-        parent=None,
-        start_date=None,
-        end_date=None,
-        actual_start_date=None,
-        actual_end_date=None,
-    )
-    return wbs_map.get(wbs_id, deleted_placeholder).name
+        return UNASSIGNED_LABEL
+
+    item = wbs_map.get(wbs_id)
+    return item.name if item is not None else DELETED_LABEL
 
 
 def filter_tasks_by_wbs(tasks: List[Dict], wbs_filter: Optional[str]) -> List[Dict]:
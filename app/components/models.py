@@ -1,11 +1,30 @@
+import sys
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Optional
 
 STATUSES = ["TODO", "DOING", "DONE", "IGNORE"]
 
+# 読み込んだレコードは保存形式と同じ dict のまま保持する(ジャーナル・SQLite・フィルター・
+# 集約索引・data_editor がこの形を前提にしている)。WBSItem / Task は build_wbs_map と
+# カンバンの表示用で、レコードの置き換えではない。レコードを列指向の配列などに置き換えて
+# タスクあたりのメモリを数分の一にする件は別の要望として扱う。
+#
+# 読み込み時にインターンする項目。WBS ID はタスクの wbs_id や子の parent から
+# 繰り返し参照され、日付やステータスも取りうる値が少ないため同じ文字列を共有できる。
+WBS_INTERNED_FIELDS = ("id", "parent", "start_date", "end_date", "actual_start_date", "actual_end_date")
+TASK_INTERNED_FIELDS = ("status", "wbs_id", "due")
+
+# WBS・タスクの先行項目 [{"id": 先行ID, "type": "FS" / "SS", "lag": 日数}, ...]
+# FS: 先行の終了後に開始 / SS: 先行の開始後に開始
+PREDECESSORS_FIELD = "predecessors"
+DEPENDENCY_TYPES = {"FS": "終了→開始", "SS": "開始→開始"}
+
 
 @dataclass
 class WBSItem:
+    # dataclass(slots=True) は 3.10 以降のため __slots__ を直接書く(フィールドに既定値は置けない)
+    __slots__ = ("id", "name", "parent", "start_date", "end_date", "actual_start_date", "actual_end_date")
+
     id: str
     name: str
     parent: Optional[str]
@@ -14,12 +33,66 @@ class WBSItem:
     actual_start_date: Optional[str]
     actual_end_date: Optional[str]
 
+    @classmethod
+    def from_record(cls, record: Dict) -> "WBSItem":
+        return cls(
+            id=record["id"],
+            name=record["name"],
+            parent=record.get("parent"),
+            start_date=record.get("start_date"),
+            end_date=record.get("end_date"),
+            actual_start_date=record.get("actual_start_date"),
+            actual_end_date=record.get("actual_end_date"),
+        )
+
 
 @dataclass
 class Task:
+    __slots__ = ("id", "title", "status", "wbs_id", "due", "description")
+
     id: str
     title: str
     status: str
     wbs_id: Optional[str]
     due: Optional[str]
     description: str
+
+
+def normalize_predecessors(value) -> List[Dict]:
+    """Return ``[{"id", "type", "lag"}, ...]`` with unknown types/lags coerced to FS/0."""
+
+    if not value:
+        return []
+    result = []
+    seen = set()
+    for entry in value or []:
+        pred_id = entry.get("id") if isinstance(entry, dict) else entry
+        if not pred_id or pred_id in seen:
+            continue
+        seen.add(pred_id)
+        dep_type = entry.get("type") if isinstance(entry, dict) else None
+        try:
+            lag = int(entry.get("lag") or 0) if isinstance(entry, dict) else 0
+        except (TypeError, ValueError):
+            lag = 0
+        result.append({"id": pred_id, "type": dep_type if dep_type in DEPENDENCY_TYPES else "FS", "lag": lag})
+    return result
+
+
+def _intern_fields(records: List[Dict], fields) -> None:
+    for record in records:
+        for field in fields:
+            value = record.get(field)
+            if type(value) is str:
+                record[field] = sys.intern(value)
+
+
+def intern_record_strings(data: Dict[str, List[Dict]]) -> Dict[str, List[Dict]]:
+    """Share repeated ID/date/status strings across records (in place).
+
+    保存形式から読み込んだ直後に呼び、同じ値ごとに別々に確保された文字列を1つにまとめる。
+    """
+
+    _intern_fields(data.get("wbs", []), WBS_INTERNED_FIELDS)
+    _intern_fields(data.get("tasks", []), TASK_INTERNED_FIELDS)
+    return data
@@ -0,0 +1,217 @@
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from .data_store import register_mutation_listener
+from .data_version import IndexCache, RebuildRequired
+
+# "1", "1-2", "3-1-4" のような階層番号(アウトライン番号)
+OUTLINE_CODE_PATTERN = re.compile(r"^\d+(-\d+)*$")
+
+Code = Tuple[int, ...]
+
+
+def parse_outline_code(text: Optional[str]) -> Optional[Code]:
+    """Return ``(1, 2)`` for ``"1-2"``; None when ``text`` is not an outline code."""
+
+    text = (text or "").strip()
+    if not OUTLINE_CODE_PATTERN.match(text):
+        return None
+    return tuple(int(part) for part in text.split("-"))
+
+
+def format_outline_code(code: Code) -> str:
+    return "-".join(map(str, code))
+
+
+def _next_sibling(code: Code) -> Code:
+    # code で始まる番号はすべて code 以上・次の兄弟の番号未満に並ぶ
+    return code[:-1] + (code[-1] + 1,)
+
+
+class OutlineIndex:
+    """Outline codes (1, 1-1, 1-2, 2, ...) of every WBS item, kept in a sorted list.
+
+    番号は兄弟の中での順番(一覧での並び順)を 1 から数えたもので、タプルの辞書順が
+    ツリーの行きがけ順と一致する。そのため「1-2 とその配下」は二分探索で求めた
+    範囲の切り出しになり、ツリーを辿らずに得られる。
+    ルートから辿れない(孤立した)項目には番号を付けない。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self._lock = threading.Lock()
+        # 兄弟の並び順を決める通し番号(一覧での位置。追加された項目は末尾)
+        self.seq: Dict[str, int] = {}
+        self._next_seq = 0
+        self.parents: Dict[str, Optional[str]] = {}
+        self.children: Dict[Optional[str], List[str]] = {}
+        self.codes: Dict[str, Code] = {}
+        # codes を番号順に並べたもの(keys[i] が ids[i] の番号)
+        self.keys: List[Code] = []
+        self.ids: List[str] = []
+
+        for item in data.get("wbs", []):
+            wbs_id = item.get("id")
+            if wbs_id is None or wbs_id in self.seq:
+                continue
+            self.seq[wbs_id] = self._next_seq
+            self._next_seq += 1
+            self.parents[wbs_id] = item.get("parent")
+            self.children.setdefault(item.get("parent"), []).append(wbs_id)
+        self._renumber(None, 0)
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _renumber(self, parent: Optional[str], start: int) -> None:
+        """Recode the subtrees of ``parent``'s children from index ``start`` on.
+
+        対象の部分木は keys の連続した範囲に並んでいるので、その範囲だけを作り直す。
+        """
+
+        if parent is None:
+            prefix: Code = ()
+            end = len(self.keys)
+        else:
+            prefix = self.codes[parent]
+            end = bisect_left(self.keys, _next_sibling(prefix))
+        begin = bisect_left(self.keys, prefix + (start + 1,))
+        for wbs_id in self.ids[begin:end]:
+            del self.codes[wbs_id]
+
+        new_keys: List[Code] = []
+        new_ids: List[str] = []
+        # 再帰を使わず、明示的なスタックで行きがけ順に番号を振る
+        siblings = self.children.get(parent, [])
+        stack = [(prefix + (number,), wbs_id) for number, wbs_id in enumerate(siblings, start=1)][start:]
+        stack.reverse()
+        while stack:
+            code, wbs_id = stack.pop()
+            if wbs_id in self.codes:
+                # 循環している項目はそれ以上辿らない
+                continue
+            self.codes[wbs_id] = code
+            new_keys.append(code)
+            new_ids.append(wbs_id)
+            children = self.children.get(wbs_id, [])
+            stack.extend((code + (number,), child) for number, child in reversed(list(enumerate(children, start=1))))
+        self.keys[begin:end] = new_keys
+        self.ids[begin:end] = new_ids
+
+    def _is_numbered(self, parent: Optional[str]) -> bool:
+        return parent is None or parent in self.codes
+
+    def _attach(self, wbs_id: str, parent: Optional[str]) -> None:
+        self.parents[wbs_id] = parent
+        siblings = self.children.setdefault(parent, [])
+        # insort(key=) は 3.10 以降なので挿入位置を自前で二分探索する
+        seq = self.seq[wbs_id]
+        low, high = 0, len(siblings)
+        while low < high:
+            middle = (low + high) // 2
+            if self.seq[siblings[middle]] <= seq:
+                low = middle + 1
+            else:
+                high = middle
+        siblings.insert(low, wbs_id)
+        if self._is_numbered(parent):
+            self._renumber(parent, low)
+
+    def _detach(self, wbs_id: str) -> Tuple[Optional[str], int]:
+        parent = self.parents.pop(wbs_id)
+        siblings = self.children[parent]
+        position = siblings.index(wbs_id)
+        del siblings[position]
+        if not siblings:
+            del self.children[parent]
+        return parent, position
+
+    # ------------------------------------------------------------------
+    # 差分更新
+    # ------------------------------------------------------------------
+    def apply(self, record: Dict) -> None:
+        op = record.get("op")
+        with self._lock:
+            if op == "add_wbs":
+                item = record["item"]
+                wbs_id = item.get("id")
+                if wbs_id is None or wbs_id in self.seq:
+                    raise RebuildRequired()
+                self.seq[wbs_id] = self._next_seq
+                self._next_seq += 1
+                # 先に追加されていた子(孤立していた項目)があれば一緒に番号が付く
+                self._attach(wbs_id, item.get("parent"))
+            elif op == "update_wbs":
+                fields = record["fields"]
+                wbs_id = record["id"]
+                if "parent" not in fields or wbs_id not in self.parents:
+                    return
+                new_parent = fields["parent"]
+                if new_parent == self.parents[wbs_id]:
+                    return
+                if new_parent == wbs_id or (
+                    wbs_id in self.codes
+                    and new_parent in self.codes
+                    and self.codes[new_parent][: len(self.codes[wbs_id])] == self.codes[wbs_id]
+                ):
+                    # 自身の配下への付け替え(循環)は batch の検証で弾かれる想定だが念のため作り直す
+                    raise RebuildRequired()
+                old_parent, position = self._detach(wbs_id)
+                if self._is_numbered(old_parent):
+                    self._renumber(old_parent, position)
+                self._attach(wbs_id, new_parent)
+            elif op == "delete_wbs":
+                first_changed: Dict[Optional[str], int] = {}
+                for wbs_id in record["ids"]:
+                    if wbs_id not in self.parents:
+                        continue
+                    parent, position = self._detach(wbs_id)
+                    del self.seq[wbs_id]
+                    first_changed[parent] = min(position, first_changed.get(parent, position))
+                deleted = set(record["ids"])
+                for parent, position in first_changed.items():
+                    # 削除された項目の配下は、削除された祖先の親を番号付けし直すときに消える
+                    if parent not in deleted and self._is_numbered(parent):
+                        self._renumber(parent, position)
+            elif op in ("add_task", "update_task", "delete_tasks"):
+                return
+            else:
+                raise RebuildRequired()
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+    def code_of(self, wbs_id: Optional[str]) -> Optional[str]:
+        code = self.codes.get(wbs_id)
+        return None if code is None else format_outline_code(code)
+
+    def subtree_ids(self, code: Code) -> List[str]:
+        """Return the item numbered ``code`` and all of its descendants (preorder)."""
+
+        with self._lock:
+            begin = bisect_left(self.keys, code)
+            end = bisect_left(self.keys, _next_sibling(code))
+            return self.ids[begin:end]
+
+
+_outline_cache = IndexCache(OutlineIndex)
+register_mutation_listener(_outline_cache.on_mutation)
+
+
+def get_outline_index(data: Dict[str, List[Dict]]) -> OutlineIndex:
+    """Return the outline numbering of ``data``."""
+
+    return _outline_cache.get(data)
+
+
+def resolve_outline_filter(data: Dict[str, List[Dict]], filters: Dict) -> Dict:
+    """Turn an outline-code ``level`` ("1-2") into a ``wbs_ids`` filter on that subtree.
+
+    番号の形でない入力は従来どおりWBS名の部分一致として扱う。
+    """
+
+    code = parse_outline_code(filters.get("level"))
+    if code is None:
+        return filters
+    return {**filters, "level": None, "wbs_ids": set(get_outline_index(data).subtree_ids(code))}
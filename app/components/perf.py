@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+# WBS_PERF=1 で全セッション、URL に ?perf=1 を付けるとそのセッションだけ計測する
+PERF_ENV_ENABLED = os.environ.get("WBS_PERF") == "1"
+PERF_HISTORY_KEY = "perf_history"
+PERF_HISTORY_SIZE = 20
+
+logger = logging.getLogger("wbs.perf")
+
+# 再実行中の計測結果。スクリプトはセッションごとのスレッドで実行されるのでスレッド単位に持つ
+_state = threading.local()
+
+
+class _NullStage:
+    """Stage handle returned while instrumentation is off (does nothing).
+
+    ``rows`` への代入は受け付けるが読まれることはない。
+    """
+
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Rerun:
+    __slots__ = ("page", "started", "stages", "counters", "depth")
+
+    def __init__(self, page: str):
+        self.page = page
+        self.started = time.perf_counter()
+        self.stages: List[Dict] = []
+        self.counters: Dict[str, int] = {}
+        self.depth = 0
+
+
+class _Stage:
+    __slots__ = ("rerun", "name", "rows", "started", "index")
+
+    def __init__(self, rerun: _Rerun, name: str, rows: Optional[int]):
+        self.rerun = rerun
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        # 入れ子の段階も開始順に並ぶよう、先に枠を確保しておく
+        self.index = len(self.rerun.stages)
+        self.rerun.stages.append(None)
+        self.rerun.depth += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        self.rerun.depth -= 1
+        self.rerun.stages[self.index] = {
+            "stage": self.name,
+            "ms": round(elapsed, 3),
+            "rows": self.rows,
+            "depth": self.rerun.depth,
+        }
+        return False
+
+
+def _active() -> Optional[_Rerun]:
+    return getattr(_state, "rerun", None)
+
+
+def requested() -> bool:
+    if PERF_ENV_ENABLED:
+        return True
+    try:
+        return st.query_params.get("perf") == "1"
+    except Exception:  # スクリプト実行外(ベンチマーク等)では常に無効
+        return False
+
+
+def begin_rerun(page: str) -> None:
+    """Start collecting stages for this rerun when instrumentation is requested."""
+
+    _state.rerun = _Rerun(page) if requested() else None
+
+
+def stage(name: str, rows: Optional[int] = None):
+    """Time a block: ``with perf.stage("apply_filters") as s: ...; s.rows = n``.
+
+    無効時は共有の何もしないハンドルを返すだけなので、計測箇所に置いたままでよい。
+    """
+
+    rerun = _active()
+    if rerun is None:
+        return _NULL_STAGE
+    return _Stage(rerun, name, rows)
+
+
+def count(name: str, amount: int = 1) -> None:
+    rerun = _active()
+    if rerun is not None:
+        rerun.counters[name] = rerun.counters.get(name, 0) + amount
+
+
+def finish_rerun() -> Optional[Dict]:
+    """Close the rerun, log it as one JSON line and keep it in the session history."""
+
+    rerun = _active()
+    if rerun is None:
+        return None
+    _state.rerun = None
+    summary = {
+        "ts": round(time.time(), 3),
+        "page": rerun.page,
+        "total_ms": round((time.perf_counter() - rerun.started) * 1000, 3),
+        "stages": [entry for entry in rerun.stages if entry is not None],
+        "counters": rerun.counters,
+    }
+    logger.info(json.dumps(summary, ensure_ascii=False))
+    history = st.session_state.setdefault(PERF_HISTORY_KEY, [])
+    history.append(summary)
+    del history[:-PERF_HISTORY_SIZE]
+    return summary
+
+
+def render_debug_panel() -> None:
+    """Sidebar panel with the last rerun's stages and recent rerun totals."""
+
+    history = st.session_state.get(PERF_HISTORY_KEY)
+    if not requested() or not history:
+        return
+    last = history[-1]
+    with st.sidebar.expander("パフォーマンス計測", expanded=True):
+        st.caption(f"前回の再実行: {last['total_ms']:.1f} ms ({last['page']})")
+        st.dataframe(
+            {
+                "段階": ["　" * entry["depth"] + entry["stage"] for entry in last["stages"]],
+                "ms": [entry["ms"] for entry in last["stages"]],
+                "行数": [entry["rows"] for entry in last["stages"]],
+            },
+            hide_index=True,
+        )
+        if last["counters"]:
+            st.write(" / ".join(f"{name}: {value:,}" for name, value in last["counters"].items()))
+        st.line_chart({"再実行 (ms)": [entry["total_ms"] for entry in history]}, height=120)
+        st.download_button(
+            "ログ (JSON Lines)",
+            data="".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in history),
+            file_name="wbs_perf.jsonl",
+            mime="application/x-ndjson",
+            key="perf_log_download",
+        )
@@ -0,0 +1,85 @@
+import json
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from . import data_store
+from .journal import write_snapshot
+
+CATALOG_FILENAME = "projects.json"
+DEFAULT_PROJECT_NAME = "既定のプロジェクト"
+# セッションで選択中のプロジェクトID
+ACTIVE_PROJECT_KEY = "project_id"
+
+_lock = threading.RLock()
+# 一覧ファイルの署名 (mtime, size) と読み込んだ内容
+_cached: Optional[Tuple[Path, Tuple[int, int], List[Dict]]] = None
+
+
+def catalog_file() -> Path:
+    return data_store.DATA_DIR / CATALOG_FILENAME
+
+
+def _default_entry() -> Dict:
+    return {"id": data_store.DEFAULT_PROJECT_ID, "name": DEFAULT_PROJECT_NAME, "created_at": None}
+
+
+def list_projects() -> List[Dict]:
+    """Return ``[{"id", "name", "created_at"}]`` without loading any project data.
+
+    一覧は DATA_DIR/projects.json に ID と名前だけを持つ。既定のプロジェクトは常に先頭に含める。
+    """
+
+    global _cached
+    path = catalog_file()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return [_default_entry()]
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _cached is not None and _cached[0] == path and _cached[1] == signature:
+            return list(_cached[2])
+        with path.open("r", encoding="utf-8") as f:
+            projects = json.load(f).get("projects", [])
+        if not any(entry["id"] == data_store.DEFAULT_PROJECT_ID for entry in projects):
+            projects.insert(0, _default_entry())
+        _cached = (path, signature, projects)
+    return list(projects)
+
+
+def project_name(project_id: str) -> str:
+    return next((entry["name"] for entry in list_projects() if entry["id"] == project_id), project_id)
+
+
+def create_project(name: str) -> Dict:
+    """Add a project with an empty store and return its catalog entry."""
+
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("プロジェクト名を入力してください")
+    with _lock:
+        projects = list_projects()
+        if any(entry["name"] == name for entry in projects):
+            raise ValueError(f"同じ名前のプロジェクトがあります: {name}")
+        entry = {
+            "id": uuid.uuid4().hex[:12],
+            "name": name,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        data_store.ensure_data_file_exists(entry["id"])
+        write_snapshot(catalog_file(), {"projects": projects + [entry]})
+    return entry
+
+
+def active_project_id() -> str:
+    """Project selected in this session (未選択・一覧に無い場合は既定のプロジェクト)."""
+
+    project_id = st.session_state.get(ACTIVE_PROJECT_KEY)
+    if project_id is None or not any(entry["id"] == project_id for entry in list_projects()):
+        return data_store.DEFAULT_PROJECT_ID
+    return project_id
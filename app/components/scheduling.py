@@ -0,0 +1,385 @@
+import heapq
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .data_store import register_mutation_listener
+from .data_version import IndexCache, RebuildRequired
+from .dates import parse_iso_date
+from .models import PREDECESSORS_FIELD, normalize_predecessors
+
+# 日程に関わる項目(これ以外の変更では再計算しない)
+WBS_SCHEDULE_FIELDS = ("start_date", "end_date", PREDECESSORS_FIELD)
+TASK_SCHEDULE_FIELDS = ("due", PREDECESSORS_FIELD)
+
+
+def _ordinal(value: Optional[str]) -> Optional[int]:
+    parsed = parse_iso_date(value)
+    return parsed.toordinal() if parsed else None
+
+
+class _Node:
+    __slots__ = ("kind", "record", "label", "start", "duration", "preds", "succs", "es", "ls")
+
+    def __init__(self, kind: str, record: Dict):
+        self.kind = kind
+        # 日程の入力元のレコード(更新レコードの内容を重ねたものを読み直す)
+        self.record = record
+        # 後続ID -> (種類, ラグ)
+        self.succs: Dict[str, Tuple[str, int]] = {}
+        self.es: Optional[int] = None
+        self.ls: Optional[int] = None
+        self.read_inputs()
+
+    def read_inputs(self) -> None:
+        """Read label, planned start, duration and predecessors from the record.
+
+        WBSは予定開始日を「これより前には始めない」制約、予定期間を所要日数とする。
+        タスクは期日を開始日とする所要0日の項目として扱う。
+        """
+
+        record = self.record
+        if self.kind == "wbs":
+            self.label = record.get("name") or ""
+            start = _ordinal(record.get("start_date"))
+            end = _ordinal(record.get("end_date"))
+            if start is None:
+                start = end
+            self.start = start
+            self.duration = max(0, end - start) if start is not None and end is not None else 0
+        else:
+            self.label = record.get("title") or ""
+            self.start = _ordinal(record.get("due"))
+            self.duration = 0
+        self.preds: List[Tuple[str, str, int]] = [
+            (entry["id"], entry["type"], entry["lag"])
+            for entry in normalize_predecessors(record.get(PREDECESSORS_FIELD))
+        ]
+
+    @property
+    def ef(self) -> Optional[int]:
+        return None if self.es is None else self.es + self.duration
+
+
+class ScheduleIndex:
+    """Critical-path schedule over WBS items and tasks linked by ``predecessors``.
+
+    トポロジカル順の前進計算で最早開始/終了、後退計算で最遅開始/終了を求める
+    (いずれも O(V+E))。日付や依存関係が変わったときは、前進計算は変更点から
+    下流だけ、後退計算は上流だけを、値が変わらなくなった所で打ち切りながら
+    計算し直す。プロジェクト全体の終了日が動いたときだけ後退計算を全体でやり直す。
+    循環している項目は日程を計算しない。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, _Node] = {}
+        # 存在しない先行ID -> それを参照している項目
+        self.dangling: Dict[str, Set[str]] = {}
+        for item in data.get("wbs", []):
+            if item.get("id") is not None:
+                self.nodes[item["id"]] = _Node("wbs", item)
+        for task in data.get("tasks", []):
+            if task.get("id") is not None:
+                self.nodes[task["id"]] = _Node("task", task)
+        for node_id, node in self.nodes.items():
+            self._link(node_id, node)
+
+        self.rank: Dict[str, int] = {}
+        self._next_rank = 0
+        self.cyclic: Set[str] = set()
+        self._sort()
+        self.finish: Optional[int] = None
+        self._finish_dirty = False
+        for node_id in self._topological():
+            self._forward(node_id)
+        self._backward_all()
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _link(self, node_id: str, node: _Node) -> None:
+        for pred_id, dep_type, lag in node.preds:
+            pred = self.nodes.get(pred_id)
+            if pred is not None:
+                pred.succs[node_id] = (dep_type, lag)
+            else:
+                # 存在しない(削除された)項目への依存は無視するが、同じIDが追加されたときのために覚えておく
+                self.dangling.setdefault(pred_id, set()).add(node_id)
+
+    def _unlink(self, node_id: str, node: _Node) -> None:
+        for pred_id, _, _ in node.preds:
+            pred = self.nodes.get(pred_id)
+            if pred is not None:
+                pred.succs.pop(node_id, None)
+            elif pred_id in self.dangling:
+                self.dangling[pred_id].discard(node_id)
+                if not self.dangling[pred_id]:
+                    del self.dangling[pred_id]
+
+    def _sort(self) -> None:
+        """Kahn's algorithm; nodes left over belong to (or follow) a cycle."""
+
+        indegree = {
+            node_id: sum(1 for pred_id, _, _ in node.preds if pred_id in self.nodes)
+            for node_id, node in self.nodes.items()
+        }
+        queue = [node_id for node_id, count in indegree.items() if count == 0]
+        order: List[str] = []
+        while queue:
+            node_id = queue.pop()
+            order.append(node_id)
+            for succ_id in self.nodes[node_id].succs:
+                indegree[succ_id] -= 1
+                if indegree[succ_id] == 0:
+                    queue.append(succ_id)
+        self.rank = {node_id: position for position, node_id in enumerate(order)}
+        self._next_rank = len(order)
+        self.cyclic = set(self.nodes) - set(self.rank)
+        for node_id in self.cyclic:
+            self.nodes[node_id].es = self.nodes[node_id].ls = None
+
+    def _topological(self) -> List[str]:
+        return sorted(self.rank, key=self.rank.__getitem__)
+
+    def _forward(self, node_id: str) -> bool:
+        """Recompute the early start of ``node_id``; returns True when it changed."""
+
+        node = self.nodes[node_id]
+        es = node.start
+        for pred_id, dep_type, lag in node.preds:
+            pred = self.nodes.get(pred_id)
+            if pred is None or pred.es is None:
+                continue
+            candidate = pred.es + lag if dep_type == "SS" else pred.ef + 1 + lag
+            es = candidate if es is None else max(es, candidate)
+        if node_id in self.cyclic:
+            es = None
+        changed = es != node.es
+        node.es = es
+        return changed
+
+    def _backward(self, node_id: str) -> bool:
+        """Recompute the late start of ``node_id``; returns True when it changed."""
+
+        node = self.nodes[node_id]
+        ls = None
+        if node.es is not None and self.finish is not None:
+            ls = self.finish - node.duration
+            for succ_id, (dep_type, lag) in node.succs.items():
+                succ = self.nodes[succ_id]
+                if succ.ls is None:
+                    continue
+                if dep_type == "SS":
+                    ls = min(ls, succ.ls - lag)
+                else:
+                    ls = min(ls, succ.ls - 1 - lag - node.duration)
+        changed = ls != node.ls
+        node.ls = ls
+        return changed
+
+    def _compute_finish(self) -> Optional[int]:
+        return max((node.ef for node in self.nodes.values() if node.es is not None), default=None)
+
+    def _backward_all(self) -> None:
+        self.finish = self._compute_finish()
+        for node_id in reversed(self._topological()):
+            self._backward(node_id)
+
+    def _propagate(self, forward_seeds: Set[str], backward_seeds: Set[str]) -> None:
+        """Re-run the forward pass downstream of ``forward_seeds`` and the backward pass upstream."""
+
+        heap = [(self.rank[node_id], node_id) for node_id in forward_seeds if node_id in self.rank]
+        heapq.heapify(heap)
+        queued = {node_id for _, node_id in heap}
+        finish = self.finish
+        while heap:
+            _, node_id = heapq.heappop(heap)
+            node = self.nodes[node_id]
+            old_ef = node.ef
+            if self._forward(node_id) or node_id in forward_seeds:
+                if (old_ef is None) != (node.es is None):
+                    backward_seeds.add(node_id)
+                if old_ef is not None and old_ef == self.finish and node.ef != old_ef:
+                    # 終了日を決めていた項目が動いたときは全体の最大値を取り直す
+                    self._finish_dirty = True
+                if node.ef is not None and (finish is None or node.ef > finish):
+                    finish = node.ef
+                for succ_id in self.nodes[node_id].succs:
+                    if succ_id not in queued and succ_id in self.rank:
+                        queued.add(succ_id)
+                        heapq.heappush(heap, (self.rank[succ_id], succ_id))
+
+        if self._finish_dirty:
+            finish = self._compute_finish()
+            self._finish_dirty = False
+        if finish != self.finish:
+            # 全体の終了日が動くとすべての最遅日がずれる
+            self._backward_all()
+            return
+
+        heap = [(-self.rank[node_id], node_id) for node_id in backward_seeds if node_id in self.rank]
+        heapq.heapify(heap)
+        queued = {node_id for _, node_id in heap}
+        while heap:
+            _, node_id = heapq.heappop(heap)
+            if self._backward(node_id) or node_id in backward_seeds:
+                for pred_id, _, _ in self.nodes[node_id].preds:
+                    if pred_id not in queued and pred_id in self.rank:
+                        queued.add(pred_id)
+                        heapq.heappush(heap, (-self.rank[pred_id], pred_id))
+
+    def _reread(self, node_id: str, forward: Set[str], backward: Set[str]) -> None:
+        if node_id in self.cyclic:
+            raise RebuildRequired()
+        node = self.nodes[node_id]
+        old_preds = {pred_id for pred_id, _, _ in node.preds}
+        if node.ef is not None and node.ef == self.finish:
+            # 読み直すと所要日数が変わり、_propagate では変更前の終了日が分からない
+            self._finish_dirty = True
+        self._unlink(node_id, node)
+        node.read_inputs()
+        self._link(node_id, node)
+        for pred_id, _, _ in node.preds:
+            if pred_id in self.cyclic or (
+                pred_id in self.rank and self.rank[pred_id] >= self.rank.get(node_id, -1)
+            ):
+                # 新しい辺がトポロジカル順に逆らう(または循環に繋がる)
+                raise RebuildRequired()
+        forward.add(node_id)
+        # 所要日数や依存関係の変更は自身と先行項目の最遅日に影響する
+        backward.add(node_id)
+        backward.update(old_preds | {pred_id for pred_id, _, _ in node.preds})
+
+    def _add_node(self, kind: str, record: Dict, forward: Set[str], backward: Set[str]) -> None:
+        node_id = record.get("id")
+        if node_id is None:
+            return
+        if node_id in self.nodes or node_id in self.dangling:
+            # 削除済みIDの復活など、既存の依存関係から参照されている場合は作り直す
+            raise RebuildRequired()
+        node = _Node(kind, record)
+        self.nodes[node_id] = node
+        self._link(node_id, node)
+        if any(pred_id in self.cyclic for pred_id, _, _ in node.preds):
+            raise RebuildRequired()
+        # 新しい項目には後続が無いので、末尾の順位で辺の向きと矛盾しない
+        self.rank[node_id] = self._next_rank
+        self._next_rank += 1
+        forward.add(node_id)
+        backward.add(node_id)
+        backward.update(pred_id for pred_id, _, _ in node.preds)
+
+    def _remove_node(self, node_id: str, forward: Set[str], backward: Set[str]) -> None:
+        if node_id in self.cyclic:
+            # 循環の一部が消えると残りの項目の順序が決まり直す
+            raise RebuildRequired()
+        node = self.nodes.pop(node_id, None)
+        if node is None:
+            return
+        self._unlink(node_id, node)
+        self.rank.pop(node_id, None)
+        self.cyclic.discard(node_id)
+        for succ_id in node.succs:
+            # 後続は依存関係を残したまま、参照先の無い依存として扱う
+            self.dangling.setdefault(node_id, set()).add(succ_id)
+        if node.ef is not None and node.ef == self.finish:
+            self._finish_dirty = True
+        forward.update(node.succs)
+        backward.update(pred_id for pred_id, _, _ in node.preds)
+        forward.discard(node_id)
+        backward.discard(node_id)
+
+    # ------------------------------------------------------------------
+    # 差分更新
+    # ------------------------------------------------------------------
+    def apply(self, records: Iterable[Dict]) -> None:
+        forward: Set[str] = set()
+        backward: Set[str] = set()
+        with self._lock:
+            for record in records:
+                op = record.get("op")
+                if op == "add_wbs":
+                    self._add_node("wbs", record["item"], forward, backward)
+                elif op == "add_task":
+                    self._add_node("task", record["task"], forward, backward)
+                elif op in ("update_wbs", "update_task"):
+                    fields = record["fields"]
+                    watched = WBS_SCHEDULE_FIELDS if op == "update_wbs" else TASK_SCHEDULE_FIELDS
+                    node = self.nodes.get(record["id"])
+                    if node is None:
+                        continue
+                    # 共有スナップショットのレコードは書き換えられず、差し替え後のものは
+                    # 複製なので、手元の写しに変更を重ねておく
+                    node.record = {**node.record, **fields}
+                    if not any(field in fields for field in watched):
+                        continue
+                    self._reread(record["id"], forward, backward)
+                elif op in ("delete_tasks", "delete_wbs"):
+                    for node_id in record["ids"]:
+                        self._remove_node(node_id, forward, backward)
+                else:
+                    raise RebuildRequired()
+            forward &= set(self.nodes)
+            backward &= set(self.nodes)
+            self._propagate(forward, backward)
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+    def get(self, node_id: str) -> Optional[Dict]:
+        """Return early/late dates, total slack and the critical flag of one item."""
+
+        node = self.nodes.get(node_id)
+        if node is None or node.es is None or node.ls is None:
+            return None
+        slack = node.ls - node.es
+        return {
+            "early_start": date.fromordinal(node.es),
+            "early_finish": date.fromordinal(node.ef),
+            "late_start": date.fromordinal(node.ls),
+            "late_finish": date.fromordinal(node.ls + node.duration),
+            "slack": slack,
+            "critical": slack <= 0,
+        }
+
+    def critical_ids(self) -> Set[str]:
+        with self._lock:
+            return {
+                node_id
+                for node_id, node in self.nodes.items()
+                if node.es is not None and node.ls is not None and node.ls <= node.es
+            }
+
+    def slipped(self) -> List[Tuple[str, str, Dict]]:
+        """Return ``(kind, id, fields)`` for items whose planned dates precede the computed start.
+
+        依存関係に合わせて予定日を後ろへずらすための更新内容(所要日数は保つ)。
+        """
+
+        updates = []
+        with self._lock:
+            for node_id, node in self.nodes.items():
+                if node.es is None or node.start is None or node.es <= node.start:
+                    continue
+                if node.kind == "task":
+                    updates.append(("task", node_id, {"due": _iso(node.es)}))
+                else:
+                    updates.append(
+                        ("wbs", node_id, {"start_date": _iso(node.es), "end_date": _iso(node.ef)})
+                    )
+        return updates
+
+
+def _iso(ordinal: Optional[int]) -> Optional[str]:
+    return date.fromordinal(ordinal).isoformat() if ordinal is not None else None
+
+
+_schedule_cache = IndexCache(ScheduleIndex, apply=ScheduleIndex.apply)
+register_mutation_listener(_schedule_cache.on_mutation)
+
+
+def get_schedule(data: Dict[str, List[Dict]]) -> ScheduleIndex:
+    """Return the critical-path schedule of ``data``."""
+
+    return _schedule_cache.get(data)
@@ -0,0 +1,276 @@
+import heapq
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .data_store import register_mutation_listener
+from .data_version import IndexCache, RebuildRequired
+
+# 検索対象の項目と重み。説明文の一致はタイトル・WBS名の一致より低く評価する
+WBS_SEARCH_FIELDS = (("name", 3.0),)
+TASK_SEARCH_FIELDS = (("title", 3.0), ("description", 1.0))
+# 先頭一致の加点(重みに対する倍率)
+PREFIX_BONUS = 0.5
+# 候補がこの件数以下になったら posting の積を打ち切り、本文の部分一致で確かめる
+VERIFY_THRESHOLD = 64
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """NFKC + casefold so that 全角/半角・大文字/小文字・半角カナの違いを吸収する."""
+
+    if not text:
+        return ""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def split_query(query: Optional[str]) -> List[str]:
+    """Split a query on whitespace (全角スペースを含む) into normalized AND terms."""
+
+    return [term for term in normalize_text(query).split() if term]
+
+
+def _grams(text: str) -> Set[str]:
+    # 分かち書きせずに日本語を扱えるよう文字 bigram を使う(1文字の本文は unigram)
+    if len(text) == 1:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+@dataclass
+class SearchHit:
+    __slots__ = ("kind", "id", "label", "score")
+
+    kind: str  # "task" / "wbs"
+    id: str
+    label: str
+    score: float
+
+
+class _Doc:
+    __slots__ = ("kind", "id", "label", "texts", "grams")
+
+    def __init__(self, kind: str, record_id: str, label: str, texts: Tuple[str, ...]):
+        self.kind = kind
+        self.id = record_id
+        self.label = label
+        self.texts = texts
+        self.grams: Set[str] = set()
+        for text in texts:
+            self.grams |= _grams(text)
+
+
+class SearchIndex:
+    """Character n-gram inverted index over task titles/descriptions and WBS names.
+
+    bigram ごとに文書番号の集合を持ち、検索語の bigram の集合の積で候補を絞ってから
+    正規化済みの本文に部分一致するかを確認する。1文字の検索語はその文字を含む
+    bigram の和集合で引く。data_store の変更は該当する文書だけを差し替える。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self._lock = threading.Lock()
+        self.docs: Dict[int, _Doc] = {}
+        self.doc_ids: Dict[Tuple[str, str], int] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        # 文字 -> その文字を含む gram(1文字検索用)
+        self.char_grams: Dict[str, Set[str]] = {}
+        self._next_doc = 0
+
+        for item in data.get("wbs", []):
+            self._add("wbs", item)
+        for task in data.get("tasks", []):
+            self._add("task", task)
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _add(self, kind: str, record: Dict) -> None:
+        record_id = record.get("id")
+        if record_id is None:
+            return
+        fields = WBS_SEARCH_FIELDS if kind == "wbs" else TASK_SEARCH_FIELDS
+        label = record.get(fields[0][0]) or ""
+        doc = _Doc(kind, record_id, label, tuple(normalize_text(record.get(name)) for name, _ in fields))
+        key = (kind, record_id)
+        if key in self.doc_ids:
+            self._remove(kind, record_id)
+        doc_no = self._next_doc
+        self._next_doc += 1
+        self.docs[doc_no] = doc
+        self.doc_ids[key] = doc_no
+        for gram in doc.grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = set()
+                for char in set(gram):
+                    self.char_grams.setdefault(char, set()).add(gram)
+            posting.add(doc_no)
+
+    def _remove(self, kind: str, record_id: str) -> None:
+        doc_no = self.doc_ids.pop((kind, record_id), None)
+        if doc_no is None:
+            return
+        doc = self.docs.pop(doc_no)
+        for gram in doc.grams:
+            posting = self.postings[gram]
+            posting.discard(doc_no)
+            if not posting:
+                del self.postings[gram]
+                for char in set(gram):
+                    grams = self.char_grams[char]
+                    grams.discard(gram)
+                    if not grams:
+                        del self.char_grams[char]
+
+    def _update(self, kind: str, record_id: str, fields: Dict) -> None:
+        doc_no = self.doc_ids.get((kind, record_id))
+        names = WBS_SEARCH_FIELDS if kind == "wbs" else TASK_SEARCH_FIELDS
+        if doc_no is None or not any(name in fields for name, _ in names):
+            return
+        doc = self.docs[doc_no]
+        # 索引には正規化済みの本文しか無いので、表示名は変更が無ければ以前の値を使う
+        record = {"id": record_id, names[0][0]: doc.label}
+        for (name, _), text in zip(names, doc.texts):
+            record.setdefault(name, text)
+        record.update({name: fields[name] for name, _ in names if name in fields})
+        self._add(kind, record)
+
+    def _postings(self, term: str) -> Optional[List[Set[int]]]:
+        """Return the posting sets that every document containing ``term`` is in.
+
+        1文字の検索語はその文字を含む gram の和集合を一つ返す。該当なしは None。
+        """
+
+        if len(term) == 1:
+            result: Set[int] = set()
+            for gram in self.char_grams.get(term, ()):
+                result |= self.postings[gram]
+            return [result] if result else None
+        postings = []
+        for gram in _grams(term):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return None
+            postings.append(posting)
+        return postings
+
+    def _matches(self, terms: List[str]) -> List[int]:
+        postings: List[Set[int]] = []
+        for term in terms:
+            term_postings = self._postings(term)
+            if term_postings is None:
+                return []
+            postings.extend(term_postings)
+        if not postings:
+            return []
+        # 件数の少ない posting から積を取り、候補が十分少なくなったら本文の部分一致で確定する
+        # (よく出る bigram 同士の積は候補を減らさない割に高くつく)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) <= VERIFY_THRESHOLD:
+                break
+            candidates = candidates & posting
+        docs = self.docs
+        return [
+            doc_no
+            for doc_no in candidates
+            if all(any(term in text for text in docs[doc_no].texts) for term in terms)
+        ]
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+    def search(self, query: str, limit: int = 20) -> List[SearchHit]:
+        """Return the ``limit`` best matches for every term of ``query``."""
+
+        terms = split_query(query)
+        with self._lock:
+            scored = ((self._score(doc_no, terms), doc_no) for doc_no in self._matches(terms))
+            # 一致が多いときも上位だけを取り出す(全件の結果オブジェクトは作らない)
+            best = heapq.nsmallest(limit, scored)
+            return [
+                SearchHit(self.docs[doc_no].kind, self.docs[doc_no].id, self.docs[doc_no].label, -key[0])
+                for key, doc_no in best
+            ]
+
+    def _score(self, doc_no: int, terms: List[str]) -> Tuple[float, int, str, str]:
+        """Sort key (smaller is better): 重み付きの一致度の符号反転、同点なら短い表示名を優先."""
+
+        doc = self.docs[doc_no]
+        fields = WBS_SEARCH_FIELDS if doc.kind == "wbs" else TASK_SEARCH_FIELDS
+        score = 0.0
+        for term in terms:
+            for (_, weight), text in zip(fields, doc.texts):
+                if term in text:
+                    # 一致した割合が大きい(短い本文に一致した)ほど、先頭一致ほど高くする
+                    score += weight * (len(term) / len(text) + text.count(term))
+                    if text.startswith(term):
+                        score += weight * PREFIX_BONUS
+        return -score, len(doc.label), doc.label, doc.id
+
+    def matching_ids(self, query: str) -> Tuple[Set[str], Set[str]]:
+        """Return ``(task_ids, wbs_ids)`` matching ``query`` without ranking."""
+
+        terms = split_query(query)
+        task_ids: Set[str] = set()
+        wbs_ids: Set[str] = set()
+        with self._lock:
+            for doc_no in self._matches(terms):
+                doc = self.docs[doc_no]
+                (wbs_ids if doc.kind == "wbs" else task_ids).add(doc.id)
+        return task_ids, wbs_ids
+
+    # ------------------------------------------------------------------
+    # 差分更新
+    # ------------------------------------------------------------------
+    def apply(self, record: Dict) -> None:
+        op = record.get("op")
+        with self._lock:
+            if op == "add_task":
+                self._add("task", record["task"])
+            elif op == "add_wbs":
+                self._add("wbs", record["item"])
+            elif op == "update_task":
+                self._update("task", record["id"], record["fields"])
+            elif op == "update_wbs":
+                self._update("wbs", record["id"], record["fields"])
+            elif op == "delete_tasks":
+                for task_id in record["ids"]:
+                    self._remove("task", task_id)
+            elif op == "delete_wbs":
+                for wbs_id in record["ids"]:
+                    self._remove("wbs", wbs_id)
+            else:
+                raise RebuildRequired()
+
+
+_index_cache = IndexCache(SearchIndex)
+register_mutation_listener(_index_cache.on_mutation)
+
+
+def get_search_index(data: Dict[str, List[Dict]]) -> SearchIndex:
+    """Return the full-text index over ``data``."""
+
+    return _index_cache.get(data)
+
+
+def search_filter(
+    data: Dict[str, List[Dict]], filtered: Dict[str, List[Dict]], query: Optional[str]
+) -> Dict[str, List[Dict]]:
+    """Narrow ``filtered`` (a subset of ``data``) to records matching ``query``.
+
+    一致したタスク、名前が一致したWBSとその配下のタスク、一致したタスクが属するWBSを残す。
+    祖先のWBSは残さないが、WBSTree は親が一覧に無い項目を根として扱うので表示からは落ちない。
+    """
+
+    if not split_query(query):
+        return filtered
+    task_ids, wbs_ids = get_search_index(data).matching_ids(query)
+    tasks = [
+        task for task in filtered.get("tasks", []) if task.get("id") in task_ids or task.get("wbs_id") in wbs_ids
+    ]
+    context_wbs = {task.get("wbs_id") for task in tasks if task.get("id") in task_ids}
+    wbs = [item for item in filtered.get("wbs", []) if item.get("id") in wbs_ids or item.get("id") in context_wbs]
+    return {"wbs": wbs, "tasks": tasks}
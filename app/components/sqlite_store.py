@@ -0,0 +1,371 @@
+import json
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+WBS_COLUMNS = [
+    "id",
+    "name",
+    "parent",
+    "start_date",
+    "end_date",
+    "actual_start_date",
+    "actual_end_date",
+]
+TASK_COLUMNS = ["id", "title", "status", "wbs_id", "due", "description"]
+# ISO 形式 (YYYY-MM-DD) に揃えて保存し、文字列のまま大小比較する列
+DATE_COLUMNS = {"start_date", "end_date", "actual_start_date", "actual_end_date", "due"}
+
+
+def _span(start_column: str, end_column: str) -> Tuple[str, str]:
+    """SQL for the ``(low, high)`` ends of a date pair, mirroring ``IntervalIndex``.
+
+    片側だけの日付はその日だけの区間、前後が逆なら入れ替える。同じ式の索引を
+    作ってあるので、この式との比較は索引の範囲検索になる。
+    """
+
+    start = f"COALESCE({start_column}, {end_column})"
+    end = f"COALESCE({end_column}, {start_column})"
+    return f"min({start}, {end})", f"max({start}, {end})"
+
+
+PLANNED_LOW, PLANNED_HIGH = _span("start_date", "end_date")
+ACTUAL_LOW, ACTUAL_HIGH = _span("actual_start_date", "actual_end_date")
+# 予定・実績とも日付の無いWBSは IS NULL で引く
+ANY_DATE = "COALESCE(start_date, end_date, actual_start_date, actual_end_date)"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS wbs (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT,
+    parent TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    actual_start_date TEXT,
+    actual_end_date TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT,
+    status TEXT,
+    wbs_id TEXT,
+    due TEXT,
+    description TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_wbs_parent ON wbs(parent);
+CREATE INDEX IF NOT EXISTS idx_wbs_position ON wbs(position);
+CREATE INDEX IF NOT EXISTS idx_wbs_planned_low ON wbs({PLANNED_LOW});
+CREATE INDEX IF NOT EXISTS idx_wbs_planned_high ON wbs({PLANNED_HIGH});
+CREATE INDEX IF NOT EXISTS idx_wbs_actual_low ON wbs({ACTUAL_LOW});
+CREATE INDEX IF NOT EXISTS idx_wbs_actual_high ON wbs({ACTUAL_HIGH});
+CREATE INDEX IF NOT EXISTS idx_wbs_any_date ON wbs({ANY_DATE});
+CREATE INDEX IF NOT EXISTS idx_tasks_wbs_id ON tasks(wbs_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks(due);
+CREATE INDEX IF NOT EXISTS idx_tasks_position ON tasks(position);
+"""
+# 1: 日付列を ISO 形式に揃えた
+SCHEMA_VERSION = 1
+
+# SQLite の IN 句に渡すパラメータ数の上限を超えないよう分割する
+_CHUNK_SIZE = 500
+
+
+def _iso_date(value: Optional[str]) -> Optional[str]:
+    """Normalize a stored date the way ``parse_iso_date`` reads it (読めない値は None)."""
+
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        return None
+
+
+def _chunks(values: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(values), _CHUNK_SIZE):
+        yield values[start:start + _CHUNK_SIZE]
+
+
+class SQLiteStore:
+    """SQLite implementation of the data_store persistence API.
+
+    データ構造は JSON と同じ ``{"wbs": [...], "tasks": [...]}`` で読み書きし、
+    一覧の並び順は ``position`` 列で保持する。既知の列以外のキーは ``extra`` に JSON で残す。
+    日付列は索引で比較できるよう ISO 形式に揃えて保存し、日付として読めない値は
+    列を空にして元の文字列を ``extra`` に残す(読み込むと元の値に戻る)。
+    共有データとしては全件を読み込み、索引はフィルターの問い合わせに使う。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with conn:
+                self._normalize_dates(conn, "wbs", WBS_COLUMNS)
+                self._normalize_dates(conn, "tasks", TASK_COLUMNS)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path))
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # 変換
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row, columns: List[str]) -> Dict:
+        record = {column: row[column] for column in columns}
+        if row["extra"]:
+            record.update(json.loads(row["extra"]))
+        return record
+
+    @staticmethod
+    def _record_values(record: Dict, columns: List[str]) -> List:
+        extra = {key: value for key, value in record.items() if key not in columns}
+        values = []
+        for column in columns:
+            value = record.get(column)
+            if column in DATE_COLUMNS:
+                normalized = _iso_date(value)
+                if value is not None and normalized != value:
+                    extra[column] = value
+                value = normalized
+            values.append(value)
+        return values + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+    def _normalize_dates(self, conn: sqlite3.Connection, table: str, columns: List[str]) -> None:
+        """Rewrite rows saved before the date columns were normalized."""
+
+        dates = [column for column in columns if column in DATE_COLUMNS]
+        assignments = ", ".join(f"{column} = ?" for column in columns[1:])
+        for row in conn.execute(f"SELECT * FROM {table}").fetchall():
+            if all(_iso_date(row[column]) == row[column] for column in dates):
+                continue
+            values = self._record_values(self._row_to_dict(row, columns), columns)
+            conn.execute(
+                f"UPDATE {table} SET {assignments}, extra = ? WHERE id = ?", values[1:] + [values[0]]
+            )
+
+    # ------------------------------------------------------------------
+    # 読み込み・書き込み
+    # ------------------------------------------------------------------
+    def is_empty(self) -> bool:
+        conn = self._connection()
+        return (
+            conn.execute("SELECT 1 FROM wbs LIMIT 1").fetchone() is None
+            and conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is None
+        )
+
+    def load(self) -> Dict[str, List[Dict]]:
+        conn = self._connection()
+        wbs = [
+            self._row_to_dict(row, WBS_COLUMNS)
+            for row in conn.execute("SELECT * FROM wbs ORDER BY position")
+        ]
+        tasks = [
+            self._row_to_dict(row, TASK_COLUMNS)
+            for row in conn.execute("SELECT * FROM tasks ORDER BY position")
+        ]
+        return {"wbs": wbs, "tasks": tasks}
+
+    def replace_all(self, data: Dict[str, List[Dict]]) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM wbs")
+            conn.execute("DELETE FROM tasks")
+            self._insert_wbs(conn, data.get("wbs", []), start=0)
+            self._insert_tasks(conn, data.get("tasks", []), start=0)
+
+    def apply(self, records: List[Dict]) -> None:
+        """Apply data_store mutation records in a single transaction."""
+
+        with self._connection() as conn:
+            for record in records:
+                self._apply_record(conn, record)
+
+    def _next_position(self, conn: sqlite3.Connection, table: str) -> int:
+        row = conn.execute(f"SELECT COALESCE(MAX(position), -1) + 1 FROM {table}").fetchone()
+        return row[0]
+
+    def _insert_wbs(self, conn: sqlite3.Connection, items: List[Dict], start: int) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO wbs (position, id, name, parent, start_date, end_date, "
+            "actual_start_date, actual_end_date, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                [start + offset] + self._record_values(item, WBS_COLUMNS)
+                for offset, item in enumerate(items)
+            ),
+        )
+
+    def _insert_tasks(self, conn: sqlite3.Connection, tasks: List[Dict], start: int) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO tasks (position, id, title, status, wbs_id, due, "
+            "description, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                [start + offset] + self._record_values(task, TASK_COLUMNS)
+                for offset, task in enumerate(tasks)
+            ),
+        )
+
+    def _update(self, conn: sqlite3.Connection, table: str, columns: List[str], record: Dict) -> None:
+        fields = record["fields"]
+        known = {key: value for key, value in fields.items() if key in columns and key != "id"}
+        unknown = {key: value for key, value in fields.items() if key not in columns}
+        # 日付列は正規化し、読めない値は extra に移す(読める値になったら extra から外す)
+        cleared: Set[str] = set()
+        for column in DATE_COLUMNS & known.keys():
+            normalized = _iso_date(known[column])
+            if known[column] is not None and normalized != known[column]:
+                unknown[column] = known[column]
+            else:
+                cleared.add(column)
+            known[column] = normalized
+        if known:
+            assignments = ", ".join(f"{column} = ?" for column in known)
+            conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = ?",
+                list(known.values()) + [record["id"]],
+            )
+        if unknown or cleared:
+            row = conn.execute(f"SELECT extra FROM {table} WHERE id = ?", (record["id"],)).fetchone()
+            if row is not None and (unknown or row["extra"]):
+                extra = json.loads(row["extra"]) if row["extra"] else {}
+                for column in cleared:
+                    extra.pop(column, None)
+                extra.update(unknown)
+                conn.execute(
+                    f"UPDATE {table} SET extra = ? WHERE id = ?",
+                    (json.dumps(extra, ensure_ascii=False) if extra else None, record["id"]),
+                )
+
+    def _apply_record(self, conn: sqlite3.Connection, record: Dict) -> None:
+        op = record.get("op")
+        if op == "add_wbs":
+            self._insert_wbs(conn, [record["item"]], self._next_position(conn, "wbs"))
+        elif op == "add_task":
+            self._insert_tasks(conn, [record["task"]], self._next_position(conn, "tasks"))
+        elif op == "update_wbs":
+            self._update(conn, "wbs", WBS_COLUMNS, record)
+        elif op == "update_task":
+            self._update(conn, "tasks", TASK_COLUMNS, record)
+        elif op == "delete_tasks":
+            for chunk in _chunks(list(record["ids"])):
+                placeholders = ", ".join("?" for _ in chunk)
+                conn.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", chunk)
+        elif op == "delete_wbs":
+            for chunk in _chunks(list(record["ids"])):
+                placeholders = ", ".join("?" for _ in chunk)
+                conn.execute(f"DELETE FROM wbs WHERE id IN ({placeholders})", chunk)
+                conn.execute(
+                    f"UPDATE tasks SET wbs_id = NULL WHERE wbs_id IN ({placeholders})", chunk
+                )
+        else:
+            raise ValueError(f"unknown store operation: {op!r}")
+
+    # ------------------------------------------------------------------
+    # インデックスを使う問い合わせ
+    # ------------------------------------------------------------------
+    def apply_filters(self, filters: Dict) -> Dict[str, List[Dict]]:
+        """SQL version of :func:`components.filtering.apply_filters`.
+
+        指定された条件だけから WHERE 句を組み立てる。日付は保存時に揃えた列(と
+        同じ式の索引)をそのまま比較する。フィルター無効時の扱いは呼び出し側で行う。
+        結果は元の並び順を保つ。
+        """
+
+        start: Optional[date] = filters.get("start")
+        end: Optional[date] = filters.get("end")
+        status: Optional[str] = filters.get("status")
+        level_query: Optional[str] = filters.get("level")
+        wbs_ids: Optional[Set[str]] = filters.get("wbs_ids")
+        params: Dict[str, object] = {
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            "status": status,
+            "level": level_query,
+        }
+
+        wbs_conditions: List[str] = []
+        if start or end:
+            wbs_conditions.append(self._wbs_overlap(start, end))
+        if level_query:
+            wbs_conditions.append("instr(COALESCE(name, ''), :level) > 0")
+        conn = self._connection()
+        if wbs_ids is not None:
+            # 件数が多くてもバインド変数の上限に掛からないよう一時テーブル経由で絞り込む
+            with conn:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS filter_wbs_ids (id TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM filter_wbs_ids")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO filter_wbs_ids (id) VALUES (?)", ((wbs_id,) for wbs_id in wbs_ids)
+                )
+            wbs_conditions.append("id IN (SELECT id FROM filter_wbs_ids)")
+        wbs_where = " AND ".join(wbs_conditions)
+
+        task_conditions: List[str] = []
+        if start and end:
+            task_conditions.append("(due IS NULL OR due BETWEEN :start AND :end)")
+        elif start:
+            task_conditions.append("(due IS NULL OR due >= :start)")
+        elif end:
+            task_conditions.append("(due IS NULL OR due <= :end)")
+        if status:
+            task_conditions.append("status = :status")
+        if level_query or wbs_ids is not None:
+            task_conditions.append(
+                f"(wbs_id IS NULL OR wbs_id = '' OR wbs_id IN (SELECT id FROM wbs WHERE {wbs_where}))"
+            )
+
+        # ORDER BY +position: 並び順の索引で全件を走査せず、絞り込み側の索引を使わせる
+        wbs = [
+            self._row_to_dict(row, WBS_COLUMNS)
+            for row in conn.execute(f"SELECT * FROM wbs{_where(wbs_conditions)} ORDER BY +position", params)
+        ]
+        tasks = [
+            self._row_to_dict(row, TASK_COLUMNS)
+            for row in conn.execute(f"SELECT * FROM tasks{_where(task_conditions)} ORDER BY +position", params)
+        ]
+        return {"wbs": wbs, "tasks": tasks}
+
+    @staticmethod
+    def _wbs_overlap(start: Optional[date], end: Optional[date]) -> str:
+        """WBS whose planned or actual period overlaps the window, plus WBS without dates.
+
+        実績終了日の無い(進行中の)WBSは今日まで続いているものとして扱う。今日が
+        表示開始日より前なら進行中の実績は表示期間に掛からないので条件に含めない。
+        """
+
+        planned = [f"{PLANNED_HIGH} >= :start"] if start else []
+        planned += [f"{PLANNED_LOW} <= :end"] if end else []
+        terms = [planned]
+        if start is None:
+            # 進行中の実績の下端は実績開始日なので、終了側だけなら一つの条件で済む
+            terms.append([f"{ACTUAL_LOW} <= :end"])
+        else:
+            closed = ["actual_end_date IS NOT NULL", f"{ACTUAL_HIGH} >= :start"]
+            terms.append(closed + ([f"{ACTUAL_LOW} <= :end"] if end else []))
+            if date.today() >= start:
+                terms.append(
+                    ["actual_end_date IS NULL", f"{ACTUAL_LOW} <= :end" if end else "actual_start_date IS NOT NULL"]
+                )
+        terms.append([f"{ANY_DATE} IS NULL"])
+        return "(" + " OR ".join("(" + " AND ".join(term) + ")" for term in terms) + ")"
+
+
+def _where(conditions: List[str]) -> str:
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
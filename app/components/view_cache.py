@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Tuple
+
+from . import perf
+from .data_store import ProjectData, build_wbs_map, filter_data
+from .data_version import version_of
+from .models import WBSItem
+from .outline_index import resolve_outline_filter
+from .search_index import search_filter, split_query
+
+FILTER_CACHE_SIZE = 16
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+
+def normalize_filters(filters: Dict) -> Tuple:
+    """Reduce the render_filters options to a hashable key.
+
+    フィルター無効時は日付などの入力値に関係なく同じ結果になるため一つのキーにまとめる。
+    検索語はフィルターの有効/無効に関係なく適用する。
+    """
+
+    query = tuple(split_query(filters.get("query")))
+    if not filters.get("enabled"):
+        return ("disabled", query)
+    return (
+        "enabled",
+        filters.get("start"),
+        filters.get("end"),
+        filters.get("status") or None,
+        filters.get("level") or None,
+        query,
+    )
+
+
+def get_filtered_view(
+    data: Dict[str, List[Dict]], filters: Dict
+) -> Tuple[Dict[str, List[Dict]], Dict[str, WBSItem]]:
+    """Return ``(filtered_data, wbs_map)`` memoized by data version and filters.
+
+    data_store の更新でそのプロジェクトの版が進むと、古い版のエントリは次回の
+    登録時にまとめて破棄される。絞り込み結果も元と同じプロジェクトの
+    ProjectData として返すので、後段のキャッシュも別プロジェクトの保存では無効にならない。
+    """
+
+    version = version_of(data)
+    key = (id(data), version, normalize_filters(filters))
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] is data:
+            _entries.move_to_end(key)
+            perf.count("filtered_view_cache_hit")
+            return entry[1], entry[2]
+
+    with perf.stage("apply_filters") as timer:
+        filtered_data = filter_data(data, resolve_outline_filter(data, filters) if filters.get("enabled") else filters)
+        timer.rows = len(filtered_data.get("tasks", []))
+    if split_query(filters.get("query")):
+        with perf.stage("search") as timer:
+            filtered_data = search_filter(data, filtered_data, filters.get("query"))
+            timer.rows = len(filtered_data.get("tasks", []))
+    if isinstance(data, ProjectData):
+        filtered_data = ProjectData(data.project_id, filtered_data)
+    with perf.stage("build_wbs_map") as timer:
+        wbs_map = build_wbs_map(filtered_data.get("wbs", []))
+        timer.rows = len(wbs_map)
+
+    with _lock:
+        for stale_key in [k for k, entry in _entries.items() if k[1] != version_of(entry[0])]:
+            del _entries[stale_key]
+        _entries[key] = (data, filtered_data, wbs_map)
+        while len(_entries) > FILTER_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return filtered_data, wbs_map
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,297 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from .data_store import register_mutation_listener
+from .data_version import IndexCache, RebuildRequired
+from .models import STATUSES
+from .dates import parse_iso_date
+
+START_FIELDS = ("start_date", "actual_start_date")
+END_FIELDS = ("end_date", "actual_end_date")
+
+
+class _Node:
+    __slots__ = (
+        "parent",
+        "children",
+        "dates",
+        "task_ids",
+        "own_counts",
+        "counts",
+        "own_start",
+        "own_end",
+        "start",
+        "end",
+    )
+
+    def __init__(self, parent: Optional[str]):
+        self.parent = parent
+        self.children: Set[str] = set()
+        self.dates: Dict[str, Optional[date]] = {}
+        self.task_ids: Set[str] = set()
+        self.own_counts: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+        self.own_start: Optional[date] = None
+        self.own_end: Optional[date] = None
+        self.start: Optional[date] = None
+        self.end: Optional[date] = None
+
+
+def _set_dates(node: "_Node", values: Dict) -> None:
+    for field in START_FIELDS + END_FIELDS:
+        if field in values:
+            node.dates[field] = parse_iso_date(values.get(field))
+    starts = [node.dates[field] for field in START_FIELDS if node.dates.get(field)]
+    ends = [node.dates[field] for field in END_FIELDS if node.dates.get(field)]
+    node.own_start = min(starts) if starts else None
+    node.own_end = max(ends) if ends else None
+
+
+def _add_counts(target: Dict[str, int], source: Dict[str, int], sign: int = 1) -> None:
+    for status, count in source.items():
+        value = target.get(status, 0) + sign * count
+        if value:
+            target[status] = value
+        else:
+            target.pop(status, None)
+
+
+class WBSRollupIndex:
+    """Per-WBS subtree rollups kept up to date from data_store mutation records.
+
+    各ノードは直下のタスク件数と自身の予定/実績日付を持ち、部分木全体の
+    ステータス別件数・最早開始日・最遅終了日を集約値として保持する。
+    タスクやWBSの追加・移動・削除では、影響を受ける祖先の経路だけを更新する。
+    集約値の辞書はその場で書き換えるので、更新と参照はロックで直列化する
+    (前のスナップショットを読んでいるセッションも同じ索引を参照している)。
+    """
+
+    def __init__(self, data: Dict[str, List[Dict]]):
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, _Node] = {}
+        # task_id -> (wbs_id, status)
+        self.tasks: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+        for item in data.get("wbs", []):
+            wbs_id = item.get("id")
+            if wbs_id is None:
+                continue
+            node = _Node(item.get("parent"))
+            _set_dates(node, item)
+            self.nodes[wbs_id] = node
+        # 存在しない親を指す(孤立した)ノードの親ID
+        self.missing_parents: Set[str] = set()
+        for wbs_id, node in self.nodes.items():
+            parent = self.nodes.get(node.parent)
+            if parent is not None:
+                parent.children.add(wbs_id)
+            elif node.parent is not None:
+                self.missing_parents.add(node.parent)
+
+        for task in data.get("tasks", []):
+            self.tasks[task.get("id")] = (task.get("wbs_id"), task.get("status"))
+            node = self.nodes.get(task.get("wbs_id"))
+            if node is not None:
+                node.task_ids.add(task.get("id"))
+                _add_counts(node.own_counts, {task.get("status"): 1})
+
+        # 子から親へ集約する(葉から順に処理し、再帰は使わない)
+        for wbs_id in self._postorder():
+            self._recompute(wbs_id)
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _postorder(self) -> List[str]:
+        roots = [wbs_id for wbs_id, node in self.nodes.items() if node.parent not in self.nodes]
+        order: List[str] = []
+        visited: Set[str] = set()
+        stack = list(roots)
+        while stack:
+            wbs_id = stack.pop()
+            if wbs_id in visited:
+                continue
+            visited.add(wbs_id)
+            order.append(wbs_id)
+            stack.extend(self.nodes[wbs_id].children)
+        order.reverse()
+        return order
+
+    def _ancestors(self, wbs_id: Optional[str]) -> List[str]:
+        """Return ``wbs_id`` and its ancestors, nearest first."""
+
+        path: List[str] = []
+        seen: Set[str] = set()
+        while wbs_id in self.nodes and wbs_id not in seen:
+            seen.add(wbs_id)
+            path.append(wbs_id)
+            wbs_id = self.nodes[wbs_id].parent
+        return path
+
+    def _recompute(self, wbs_id: str) -> None:
+        node = self.nodes[wbs_id]
+        counts = dict(node.own_counts)
+        starts = [node.own_start] if node.own_start else []
+        ends = [node.own_end] if node.own_end else []
+        for child_id in node.children:
+            child = self.nodes[child_id]
+            _add_counts(counts, child.counts)
+            if child.start:
+                starts.append(child.start)
+            if child.end:
+                ends.append(child.end)
+        node.counts = counts
+        node.start = min(starts) if starts else None
+        node.end = max(ends) if ends else None
+
+    def _refresh_path(self, wbs_id: Optional[str]) -> None:
+        for ancestor_id in self._ancestors(wbs_id):
+            self._recompute(ancestor_id)
+
+    def _shift_counts(self, wbs_id: Optional[str], counts: Dict[str, int], sign: int) -> None:
+        for ancestor_id in self._ancestors(wbs_id):
+            _add_counts(self.nodes[ancestor_id].counts, counts, sign)
+
+    def _add_task(self, task_id: str, wbs_id: Optional[str], status: Optional[str]) -> None:
+        if task_id in self.tasks:
+            # 同じ追加レコードを二度適用しても数え直さない
+            return
+        self.tasks[task_id] = (wbs_id, status)
+        node = self.nodes.get(wbs_id)
+        if node is not None:
+            node.task_ids.add(task_id)
+            _add_counts(node.own_counts, {status: 1})
+            self._shift_counts(wbs_id, {status: 1}, 1)
+
+    def _remove_task(self, task_id: str) -> None:
+        wbs_id, status = self.tasks.pop(task_id, (None, None))
+        node = self.nodes.get(wbs_id)
+        if node is not None:
+            node.task_ids.discard(task_id)
+            _add_counts(node.own_counts, {status: 1}, -1)
+            self._shift_counts(wbs_id, {status: 1}, -1)
+
+    # ------------------------------------------------------------------
+    # 差分更新
+    # ------------------------------------------------------------------
+    def apply(self, record: Dict) -> None:
+        with self._lock:
+            self._apply(record)
+
+    def _apply(self, record: Dict) -> None:
+        op = record.get("op")
+        if op == "add_task":
+            task = record["task"]
+            self._add_task(task.get("id"), task.get("wbs_id"), task.get("status"))
+        elif op == "update_task":
+            fields = record["fields"]
+            if record["id"] in self.tasks and ("status" in fields or "wbs_id" in fields):
+                wbs_id, status = self.tasks[record["id"]]
+                self._remove_task(record["id"])
+                self._add_task(
+                    record["id"], fields.get("wbs_id", wbs_id), fields.get("status", status)
+                )
+        elif op == "delete_tasks":
+            for task_id in record["ids"]:
+                self._remove_task(task_id)
+        elif op == "add_wbs":
+            item = record["item"]
+            wbs_id = item.get("id")
+            if wbs_id in self.nodes or wbs_id in self.missing_parents:
+                # 既存の孤立ノードを子として迎える場合は作り直す
+                raise RebuildRequired()
+            node = _Node(item.get("parent"))
+            _set_dates(node, item)
+            self.nodes[wbs_id] = node
+            parent = self.nodes.get(node.parent)
+            if parent is not None:
+                parent.children.add(wbs_id)
+            elif node.parent is not None:
+                self.missing_parents.add(node.parent)
+            self._recompute(wbs_id)
+            self._refresh_path(node.parent)
+        elif op == "update_wbs":
+            self._update_wbs(record["id"], record["fields"])
+        elif op == "delete_wbs":
+            self._delete_wbs(set(record["ids"]))
+        else:
+            raise RebuildRequired()
+
+    def _update_wbs(self, wbs_id: str, fields: Dict) -> None:
+        node = self.nodes.get(wbs_id)
+        if node is None:
+            return
+        if any(field in fields for field in START_FIELDS + END_FIELDS):
+            _set_dates(node, fields)
+            self._refresh_path(wbs_id)
+        if "parent" in fields and fields["parent"] != node.parent:
+            new_parent = fields["parent"]
+            if new_parent is not None and new_parent not in self.nodes:
+                raise RebuildRequired()
+            if wbs_id in self._ancestors(new_parent):
+                # 循環する付け替えは batch の検証で弾かれる想定だが念のため作り直す
+                raise RebuildRequired()
+            old_parent = node.parent
+            if old_parent in self.nodes:
+                self.nodes[old_parent].children.discard(wbs_id)
+            node.parent = new_parent
+            if new_parent in self.nodes:
+                self.nodes[new_parent].children.add(wbs_id)
+            self._refresh_path(old_parent)
+            self._refresh_path(new_parent)
+
+    def _delete_wbs(self, wbs_ids: Set[str]) -> None:
+        deleted = {wbs_id for wbs_id in wbs_ids if wbs_id in self.nodes}
+        for wbs_id in deleted:
+            # 削除されない子が残ると孤立ノードになり集約の形が変わるため作り直す
+            if self.nodes[wbs_id].children - deleted:
+                raise RebuildRequired()
+
+        parents = set()
+        for wbs_id in deleted:
+            node = self.nodes.pop(wbs_id)
+            # 紐づいていたタスクは未割当になる
+            for task_id in node.task_ids:
+                self.tasks[task_id] = (None, self.tasks[task_id][1])
+            if node.parent not in deleted:
+                parents.add(node.parent)
+                if node.parent in self.nodes:
+                    self.nodes[node.parent].children.discard(wbs_id)
+        for parent_id in parents:
+            self._refresh_path(parent_id)
+
+    # ------------------------------------------------------------------
+    # 参照(O(1))
+    # ------------------------------------------------------------------
+    def get(self, wbs_id: str) -> Optional[Dict]:
+        """Return the subtree rollup for ``wbs_id``.
+
+        ``percent_done`` は IGNORE を除いたタスクに対する DONE の割合(%)。
+        """
+
+        with self._lock:
+            node = self.nodes.get(wbs_id)
+            if node is None:
+                return None
+            counts = {status: node.counts.get(status, 0) for status in STATUSES}
+            total = sum(node.counts.values())
+            start, end = node.start, node.end
+        active = total - counts.get("IGNORE", 0)
+        return {
+            "counts": counts,
+            "total": total,
+            "percent_done": (counts.get("DONE", 0) * 100.0 / active) if active else None,
+            "start": start,
+            "end": end,
+        }
+
+
+_rollup_cache = IndexCache(WBSRollupIndex)
+register_mutation_listener(_rollup_cache.on_mutation)
+
+
+def get_rollup_index(data: Dict[str, List[Dict]]) -> WBSRollupIndex:
+    """Return the rollup index of ``data`` (updated in place by later writes)."""
+
+    return _rollup_cache.get(data)
@@ -1,41 +1,31 @@
 from datetime import date
-from typing import Dict, List, Optional, Set
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 
-import pandas as pd
+from .data_version import VersionedCache
+from .dates import parse_iso_date, parse_iso_dates  # noqa: F401  既存の import 先を維持する
+from .wbs_tree import get_wbs_tree
 
+# pandas は表を組み立てるときに初めて読み込む(ツリーやラベルだけ使う画面の起動を軽くする)
+if TYPE_CHECKING:
+    import pandas as pd
 
-def parse_iso_date(value: Optional[str]) -> Optional[date]:
-    if not value:
-        return None
-    try:
-        return date.fromisoformat(value)
-    except ValueError:
-        return None
+WBS_DATE_COLUMNS = ["start_date", "end_date", "actual_start_date", "actual_end_date"]
 
 
 def flatten_wbs_with_levels(wbs_items: List[Dict]) -> List[Dict]:
-    ordered: List[Dict] = []
-
-    def walk(parent: Optional[str], level: int):
-        children = [item for item in wbs_items if item.get("parent") == parent]
-        for child in children:
-            ordered.append({"item": child, "level": level})
-            walk(child["id"], level + 1)
-
-    walk(None, 0)
-    return ordered
+    tree = get_wbs_tree(wbs_items)
+    return [{"item": item, "level": level} for item, level in tree.iter_with_levels()]
 
 
 def build_ordered_wbs_label_map(wbs_items: List[Dict]) -> Dict[str, str]:
     """Return an ordered mapping of WBS ID -> インデント済みラベル."""
 
     ordered_labels: Dict[str, str] = {}
-    for entry in flatten_wbs_with_levels(wbs_items):
-        item = entry["item"]
+    for item, level in get_wbs_tree(wbs_items).iter_with_levels():
         wbs_id = item.get("id")
         if not wbs_id:
             continue
-        ordered_labels[wbs_id] = "　" * entry["level"] + item.get("name", "")
+        ordered_labels[wbs_id] = "　" * level + item.get("name", "")
     return ordered_labels
 
 
@@ -51,23 +41,14 @@ def build_wbs_selection_list(wbs_items: List[Dict]) -> List[Dict[str, str]]:
 
 
 def collect_descendants(wbs_items: List[Dict], root_id: str) -> Set[str]:
-    descendants: Set[str] = set()
-
-    def dfs(parent_id: str):
-        for item in wbs_items:
-            if item.get("parent") == parent_id:
-                child_id = item.get("id")
-                if child_id:
-                    descendants.add(child_id)
-                    dfs(child_id)
-
-    dfs(root_id)
-    return descendants
+    return get_wbs_tree(wbs_items).descendants(root_id)
 
 
 def normalize_date_value(value: Optional[object]) -> Optional[str]:
     """Convert mixed date inputs from data_editor rows to ISO strings."""
 
+    import pandas as pd
+
     if pd.isna(value):
         return None
 
@@ -86,23 +67,36 @@ def normalize_date_value(value: Optional[object]) -> Optional[str]:
     return None
 
 
-def build_wbs_dataframe(wbs_items: List[Dict]) -> pd.DataFrame:
-    ordered_items = flatten_wbs_with_levels(wbs_items)
-    rows = []
-    for entry in ordered_items:
-        item = entry["item"]
-        level = entry["level"]
-        rows.append(
-            {
-                "id": item["id"],
-                "display_name": "　" * level + item["name"],
-                "parent": item.get("parent"),
-                "start_date": parse_iso_date(item.get("start_date")),
-                "end_date": parse_iso_date(item.get("end_date")),
-                "actual_start_date": parse_iso_date(item.get("actual_start_date")),
-                "actual_end_date": parse_iso_date(item.get("actual_end_date")),
-                "delete": False,
-            }
-        )
-
-    return pd.DataFrame(rows)
+def build_wbs_dataframe(wbs_items: List[Dict]) -> "pd.DataFrame":
+    """Build the WBS table frame (hierarchy order, dates as ``date``) column by column."""
+
+    import numpy as np
+    import pandas as pd
+
+    tree = get_wbs_tree(wbs_items)
+    items = tree.order
+    # 0行でも float64 にならないよう object 配列で渡す(data_editor が日付列として扱えるように)
+    columns = {
+        "id": np.array([item["id"] for item in items], dtype=object),
+        "display_name": np.array(
+            ["　" * level + item["name"] for item, level in tree.iter_with_levels()], dtype=object
+        ),
+        "parent": np.array([item.get("parent") for item in items], dtype=object),
+    }
+    for column in WBS_DATE_COLUMNS:
+        columns[column] = np.array(parse_iso_dates(item.get(column) for item in items), dtype=object)
+    columns["delete"] = np.zeros(len(items), dtype=bool)
+    return pd.DataFrame(columns)
+
+
+_frame_cache = VersionedCache(maxsize=8)
+
+
+def get_wbs_dataframe(wbs_items: List[Dict]) -> "pd.DataFrame":
+    """Return the shared, per-version cached :func:`build_wbs_dataframe` result.
+
+    WBS一覧とガントチャートで同じフレームを共有するため、呼び出し側で変更する
+    場合は必ずコピーしてから行うこと。
+    """
+
+    return _frame_cache.get_or_build(wbs_items, None, lambda: build_wbs_dataframe(wbs_items))
@@ -0,0 +1,107 @@
+from typing import Dict, Iterator, List, Optional, Set
+
+from .data_version import VersionedCache
+
+
+class WBSTree:
+    """Preorder index of a WBS item list.
+
+    ``parent`` の隣接リストを一度だけ組み立て、行きがけ順の位置・階層・
+    部分木の範囲を保持する。部分木は ``order[pos:subtree_end[pos]]`` で表される。
+    ``parent`` が None か一覧に無い項目をルートとして扱うので、絞り込みで親が
+    外れた部分木も表示できる。ルートから辿れない(親が循環している)項目は順序へ含めない。
+    """
+
+    def __init__(self, wbs_items: List[Dict]):
+        self.children: Dict[Optional[str], List[Dict]] = {}
+        ids = set()
+        for item in wbs_items:
+            self.children.setdefault(item.get("parent"), []).append(item)
+            ids.add(item.get("id"))
+        roots = [item for item in wbs_items if item.get("parent") is None or item.get("parent") not in ids]
+
+        self.order: List[Dict] = []
+        self.levels: List[int] = []
+        self.subtree_end: List[int] = []
+        self.position: Dict[str, int] = {}
+
+        # 再帰を使わず、明示的なスタックで行きがけ順に走査する
+        stack = [(root, 0) for root in reversed(roots)]
+        open_nodes: List[int] = []
+        while stack:
+            item, level = stack.pop()
+            while open_nodes and self.levels[open_nodes[-1]] >= level:
+                self.subtree_end[open_nodes.pop()] = len(self.order)
+
+            pos = len(self.order)
+            item_id = item.get("id")
+            self.order.append(item)
+            self.levels.append(level)
+            self.subtree_end.append(pos + 1)
+            open_nodes.append(pos)
+
+            if item_id is None or item_id in self.position:
+                # IDが無い/循環している項目の子は辿らない
+                continue
+            self.position[item_id] = pos
+            for child in reversed(self.children.get(item_id, [])):
+                stack.append((child, level + 1))
+
+        for pos in open_nodes:
+            self.subtree_end[pos] = len(self.order)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def iter_with_levels(self) -> Iterator[tuple]:
+        return zip(self.order, self.levels)
+
+    def level_of(self, wbs_id: Optional[str]) -> Optional[int]:
+        pos = self.position.get(wbs_id)
+        return None if pos is None else self.levels[pos]
+
+    def subtree_items(self, wbs_id: str) -> List[Dict]:
+        """Return the item and all of its descendants in preorder."""
+
+        pos = self.position.get(wbs_id)
+        if pos is None:
+            return []
+        return self.order[pos:self.subtree_end[pos]]
+
+    def is_descendant(self, candidate_id: Optional[str], ancestor_id: Optional[str]) -> bool:
+        """Return True when ``candidate_id`` lies strictly below ``ancestor_id``."""
+
+        candidate = self.position.get(candidate_id)
+        ancestor = self.position.get(ancestor_id)
+        if candidate is None or ancestor is None:
+            return False
+        return ancestor < candidate < self.subtree_end[ancestor]
+
+    def descendants(self, root_id: str) -> Set[str]:
+        pos = self.position.get(root_id)
+        if pos is not None:
+            return {
+                item["id"]
+                for item in self.order[pos + 1:self.subtree_end[pos]]
+                if item.get("id")
+            }
+
+        # ルートから辿れない(循環した)部分木は隣接リストを直接たどる
+        descendants: Set[str] = set()
+        stack = [root_id]
+        while stack:
+            for child in self.children.get(stack.pop(), []):
+                child_id = child.get("id")
+                if child_id and child_id not in descendants:
+                    descendants.add(child_id)
+                    stack.append(child_id)
+        return descendants
+
+
+_tree_cache = VersionedCache(maxsize=8)
+
+
+def get_wbs_tree(wbs_items: List[Dict]) -> WBSTree:
+    """Return the cached :class:`WBSTree` for ``wbs_items`` at the current data version."""
+
+    return _tree_cache.get_or_build(wbs_items, None, lambda: WBSTree(wbs_items))
@@ -1,48 +1,86 @@
+import importlib
+import sys
+
 import streamlit as st
 
-from components.data_store import build_wbs_map, ensure_data_file_exists, load_data
-from components.filtering import apply_filters
+from components import backup  # noqa: F401  保存時の自動バックアップを登録する
+from components import perf
+from components.data_store import ensure_data_file_exists, get_shared_data
+from components.project_catalog import project_name
+from components.view_cache import get_filtered_view
 from views.filters_view import render_filters
+from views.project_selector_view import render_project_selector
 from views.wbs_creation_view import wbs_creation_form
 from views.task_form_view import render_task_form
-from views import gantt_view, kanban_view, presentation_view, wbs_task_list
+
+# 各ビューは初めて選ばれたときに読み込む(plotly や pandas を使わない画面の起動を軽くする)
+VIEW_MODULES = {
+    "WBS & Task List": "views.wbs_task_list",
+    "Gantt": "views.gantt_view",
+    "Kanban": "views.kanban_view",
+    "Presentation": "views.presentation_view",
+}
+# フィルター前の全データも受け取る(編集・依存関係・集約の計算に使う)ビュー
+FULL_DATA_VIEWS = {"WBS & Task List", "Gantt", "Presentation"}
+
+
+def load_view(tab: str):
+    """Import the view module for ``tab`` on first use and time the import."""
+
+    module_name = VIEW_MODULES[tab]
+    module = sys.modules.get(module_name)
+    if module is None:
+        with perf.stage(f"import:{module_name}"):
+            module = importlib.import_module(module_name)
+    return module
 
 
 def render_project():
     st.title("Project Dashboard")
     st.caption("統合されたWBS・タスク管理ダッシュボード")
 
-    ensure_data_file_exists()
-
-    if "data" not in st.session_state:
-        st.session_state["data"] = load_data()
+    perf.begin_rerun("project")
+    with st.sidebar:
+        project_id = render_project_selector()
+    ensure_data_file_exists(project_id)
 
-    data = st.session_state["data"]
+    # 選択中のプロジェクトだけを読み込む。全セッションで共有し、保存ファイルが変わったときだけ読み直す
+    with perf.stage("load_data") as timer:
+        data = get_shared_data(project_id)
+        timer.rows = len(data.get("tasks", []))
+    st.caption(f"プロジェクト: {project_name(project_id)}")
+    st.session_state["data"] = data
     filter_options = render_filters(data)
-    filtered_data = apply_filters(data, filter_options)
+    with perf.stage("filtered_view") as timer:
+        filtered_data, filtered_wbs_map = get_filtered_view(data, filter_options)
+        timer.rows = len(filtered_data.get("tasks", []))
     st.session_state["filtered_data"] = filtered_data
-    filtered_wbs_map = build_wbs_map(filtered_data.get("wbs", []))
 
-    with st.sidebar:    
+    with st.sidebar, perf.stage("sidebar_forms"):
         wbs_creation_form(data)
         render_task_form(data)
-
+    if st.session_state["data"] is not data:
+        # フォームで保存すると共有データが差し替わるので、同じ実行のビューにも反映する
+        data = st.session_state["data"]
+        filtered_data, filtered_wbs_map = get_filtered_view(data, filter_options)
+        st.session_state["filtered_data"] = filtered_data
 
     tab = st.radio(
         "表示するビューを選択",
-        ["WBS & Task List", "Gantt", "Kanban", "Presentation"],
+        list(VIEW_MODULES),
         horizontal=True
     )
 
 
-    if tab == "WBS & Task List":
-        wbs_task_list.render(data, filtered_data, filtered_wbs_map)
-    if tab == "Gantt":
-        gantt_view.render(filtered_data, filtered_wbs_map)
-    if tab == "Kanban":
-        kanban_view.render(filtered_data, filtered_wbs_map)
-    if tab == "Presentation":
-        presentation_view.render(filtered_data, filtered_wbs_map)
+    view = load_view(tab)
+    with perf.stage(f"render:{tab}"):
+        if tab in FULL_DATA_VIEWS:
+            view.render(data, filtered_data, filtered_wbs_map)
+        else:
+            view.render(filtered_data, filtered_wbs_map)
+
+    perf.finish_rerun()
+    perf.render_debug_panel()
 
 if __name__ == "__main__":
     render_project()
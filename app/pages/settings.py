@@ -1,17 +1,159 @@
+from pathlib import Path
+
+import pandas as pd
 import streamlit as st
 
+from components.data_store import BatchValidationError, ensure_data_file_exists, get_shared_data
+from components import backup
+from components.project_catalog import active_project_id, project_name
+from components.exporter import EXPORT_FORMATS, parquet_available, spool_export
+from components.importer import import_stream
+
+IMPORT_FORMATS = {"CSV": "csv", "JSON Lines": "jsonl"}
+
+
+def render_import_section():
+    st.subheader("インポート (CSV / JSON Lines)")
+    st.caption(
+        "1行に1件のWBSまたはタスクを記述します。kind 列 (wbs / task) が無い場合は "
+        "title・status・wbs_id 列の有無で判定します。親WBS (parent) とタスクの wbs_id は "
+        "既存データまたは同じファイル内の id を参照できます。"
+    )
+
+    format_label = st.radio("形式", list(IMPORT_FORMATS), horizontal=True, key="import_format")
+    file_format = IMPORT_FORMATS[format_label]
+    uploaded = st.file_uploader("ファイルを選択", type=["csv", "jsonl", "ndjson", "txt"], key="import_file")
+    # 大きなファイルはアップロードせずサーバー上のパスから直接ストリーミングで読み込む
+    server_path = st.text_input("またはサーバー上のファイルパス", key="import_path")
+
+    if not st.button("インポート", key="run_import"):
+        return
+    if uploaded is None and not server_path:
+        st.error("ファイルを選択するか、パスを入力してください")
+        return
+
+    project_id = active_project_id()
+    ensure_data_file_exists(project_id)
+    data = get_shared_data(project_id)
+    progress_bar = st.progress(0.0, text="読み込み中...")
+
+    def on_progress(report, fraction):
+        text = f"{report.rows_read:,}行を処理 (WBS {report.wbs_added:,}件 / タスク {report.tasks_added:,}件)"
+        progress_bar.progress(fraction if fraction is not None else 0.0, text=text)
+
+    try:
+        if uploaded is not None:
+            report = import_stream(data, uploaded, file_format, uploaded.size, on_progress)
+        else:
+            path = Path(server_path)
+            if not path.is_file():
+                st.error(f"ファイルが見つかりません: {server_path}")
+                return
+            with path.open("rb") as stream:
+                report = import_stream(data, stream, file_format, path.stat().st_size, on_progress)
+    except BatchValidationError as exc:
+        st.error("\n".join(["インポートを中止しました"] + exc.errors[:20]))
+        return
+
+    progress_bar.progress(1.0, text=f"{report.rows_read:,}行を処理しました")
+    st.success(f"WBS {report.wbs_added:,}件、タスク {report.tasks_added:,}件を取り込みました")
+    if report.error_count:
+        with st.expander(f"取り込めなかった行: {report.error_count:,}件"):
+            st.write("\n".join(f"- {message}" for message in report.errors))
+            if report.error_count > len(report.errors):
+                st.caption(f"ほか {report.error_count - len(report.errors):,}件")
+
+
+def render_export_section():
+    st.subheader("エクスポート")
+    st.caption(
+        "WBSの階層順に、各WBSの直後へそのタスクを並べて出力します。CSV / JSON Lines はそのままインポートできます。"
+        "出力ファイルはダウンロードが終わるまでサーバーのメモリに保持されます。"
+    )
+
+    format_labels = dict(IMPORT_FORMATS)
+    if parquet_available():
+        format_labels["Parquet"] = "parquet"
+    else:
+        st.caption("Parquet 形式で出力するには pyarrow をインストールしてください。")
+    format_label = st.radio("出力形式", list(format_labels), horizontal=True, key="export_format")
+    file_format = format_labels[format_label]
+    mime, extension = EXPORT_FORMATS[file_format]
+
+    project_id = active_project_id()
+    ensure_data_file_exists(project_id)
+    data = get_shared_data(project_id)
+    # クリックされたときだけ書き出す(毎回の再描画でファイルを作らない)
+    st.download_button(
+        "ダウンロード",
+        data=lambda: spool_export(data, file_format),
+        file_name=f"wbs_export.{extension}",
+        mime=mime,
+        key="export_download",
+    )
+
+
+BACKUP_REASON_LABELS = {"manual": "手動", "on_save": "保存時", "scheduled": "定期"}
+
+
+def render_backup_section():
+    project_id = active_project_id()
+    mode_labels = {"interval": f"{backup.BACKUP_INTERVAL_SECONDS // 60}分ごと(保存時)", "on_save": "保存のたび", "off": "手動のみ"}
+    st.caption(
+        f"自動バックアップ: {mode_labels.get(backup.BACKUP_MODE, backup.BACKUP_MODE)} / "
+        f"保持数: {backup.MAX_SNAPSHOTS}件。変更のないWBS・タスクは前回のバックアップと共有して保存します。"
+    )
+    if backup.last_error:
+        st.warning(f"直近の自動バックアップに失敗しました: {backup.last_error}")
+
+    if st.button("今すぐバックアップ", key="backup_now"):
+        ensure_data_file_exists(project_id)
+        entry = backup.create_snapshot(get_shared_data(project_id), "manual")
+        if entry is None:
+            st.info("前回のバックアップから変更はありません")
+        else:
+            st.success(f"バックアップを作成しました ({entry['created_at']}, 追加 {entry['new_bytes']:,} バイト)")
+
+    snapshots = backup.list_snapshots(project_id)
+    if not snapshots:
+        st.info("バックアップはまだありません。")
+        return
+
+    st.dataframe(
+        pd.DataFrame(
+            {
+                "日時": [entry["created_at"] for entry in snapshots],
+                "種別": [BACKUP_REASON_LABELS.get(entry["reason"], entry["reason"]) for entry in snapshots],
+                "WBS": [entry["wbs_count"] for entry in snapshots],
+                "タスク": [entry["task_count"] for entry in snapshots],
+                "追加サイズ(バイト)": [entry["new_bytes"] for entry in snapshots],
+            }
+        ),
+        hide_index=True,
+    )
+
+    labels = {entry["id"]: f"{entry['created_at']} (WBS {entry['wbs_count']}件 / タスク {entry['task_count']}件)" for entry in snapshots}
+    target = st.selectbox("復元するバックアップ", options=list(labels), format_func=labels.get, key="backup_restore_target")
+    confirmed = st.checkbox("現在のデータをこの時点の内容で置き換えることを確認しました", key="backup_restore_confirm")
+    if st.button("この時点に復元", key="backup_restore", disabled=not confirmed):
+        restored = backup.restore_snapshot(target, project_id)
+        st.success(f"復元しました (WBS {len(restored['wbs'])}件 / タスク {len(restored['tasks'])}件)")
+
 
 def render_settings():
     st.title("Settings / Data Management")
+    # プロジェクトの切り替えは Project ページで行う
+    st.caption(f"対象プロジェクト: {project_name(active_project_id())}")
 
     st.header("データ管理")
-    st.write("JSON / CSV 保存、インポート・エクスポートは今後実装予定です。")
+    render_import_section()
+    render_export_section()
 
     st.header("バックアップ")
-    st.write("バックアップ機能のプレースホルダー")
+    render_backup_section()
 
     st.header("ステータス名・色設定")
     st.write("ステータスの設定UIをここに追加予定です。")
 
 if __name__ == "__main__":
-    render_settings()
\ No newline at end of file
+    render_settings()
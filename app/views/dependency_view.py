@@ -0,0 +1,98 @@
+from typing import Dict, List
+
+import pandas as pd
+import streamlit as st
+
+from components.data_store import BatchValidationError, batch, set_predecessors
+from components.models import DEPENDENCY_TYPES, PREDECESSORS_FIELD, normalize_predecessors
+
+DEPENDENCY_EDITOR_KEY = "dependency_editor"
+
+
+def build_dependency_labels(wbs_items: List[Dict], tasks: List[Dict]) -> Dict[str, str]:
+    """Return ``{id: label}`` for WBS items and tasks (同名の項目はIDの先頭で区別する)."""
+
+    labels: Dict[str, str] = {}
+    used = set()
+    for prefix, records, field in (("WBS", wbs_items, "name"), ("タスク", tasks, "title")):
+        for record in records:
+            label = f"[{prefix}] {record.get(field) or ''}"
+            if label in used:
+                label = f"{label} ({record['id'][:8]})"
+            used.add(label)
+            labels[record["id"]] = label
+    return labels
+
+
+def render_dependency_editor(data: Dict[str, List[Dict]], filtered_data: Dict[str, List[Dict]]) -> None:
+    """Edit the predecessors of one WBS item or task chosen from the displayed records."""
+
+    with st.expander("依存関係の設定"):
+        labels = build_dependency_labels(filtered_data.get("wbs", []), filtered_data.get("tasks", []))
+        if not labels:
+            st.info("表示中のWBS・タスクがありません。")
+            return
+        target_id = st.selectbox(
+            "後続のWBS・タスク",
+            options=list(labels),
+            format_func=labels.get,
+            key="dependency_target",
+        )
+        target = next(
+            (record for kind in ("wbs", "tasks") for record in data.get(kind, []) if record.get("id") == target_id),
+            None,
+        )
+        if target is None:
+            return
+
+        # 表示中でない先行項目も選択肢に残す
+        all_labels = dict(labels)
+        current = normalize_predecessors(target.get(PREDECESSORS_FIELD))
+        missing = {entry["id"] for entry in current} - set(all_labels)
+        if missing:
+            all_labels.update(
+                (record_id, label)
+                for record_id, label in build_dependency_labels(
+                    [item for item in data.get("wbs", []) if item.get("id") in missing],
+                    [task for task in data.get("tasks", []) if task.get("id") in missing],
+                ).items()
+            )
+        label_to_id = {label: record_id for record_id, label in all_labels.items() if record_id != target_id}
+        frame = pd.DataFrame(
+            {
+                "predecessor": [all_labels.get(entry["id"], entry["id"]) for entry in current],
+                "type": [entry["type"] for entry in current],
+                "lag": [entry["lag"] for entry in current],
+            }
+        )
+        edited = st.data_editor(
+            frame,
+            hide_index=True,
+            num_rows="dynamic",
+            column_config={
+                "predecessor": st.column_config.SelectboxColumn("先行", options=list(label_to_id), required=True),
+                "type": st.column_config.SelectboxColumn(
+                    "種類", options=list(DEPENDENCY_TYPES), default="FS", required=True
+                ),
+                "lag": st.column_config.NumberColumn("ラグ(日)", default=0, step=1),
+            },
+            key=f"{DEPENDENCY_EDITOR_KEY}_{target_id}",
+        )
+        st.caption("FS: " + DEPENDENCY_TYPES["FS"] + " / SS: " + DEPENDENCY_TYPES["SS"])
+
+        if st.button("依存関係を保存", key="save_dependencies"):
+            predecessors = [
+                {"id": label_to_id[row["predecessor"]], "type": row["type"], "lag": 0 if pd.isna(row["lag"]) else int(row["lag"])}
+                for row in edited.to_dict("records")
+                if row.get("predecessor") in label_to_id
+            ]
+            try:
+                with batch(data, notify=False):
+                    changed = set_predecessors(data, target_id, predecessors)
+            except BatchValidationError as exc:
+                st.error("\n".join(exc.errors))
+                return
+            if changed:
+                st.session_state.pop(f"{DEPENDENCY_EDITOR_KEY}_{target_id}", None)
+                st.rerun()
+            st.info("変更はありませんでした")
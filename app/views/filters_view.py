@@ -4,9 +4,31 @@ from typing import Dict, Optional
 import streamlit as st
 
 from components.models import STATUSES
+from components.search_index import get_search_index, split_query
+
+SEARCH_RESULT_LIMIT = 10
+
+
+def render_search_results(data: Dict, query: str) -> None:
+    """Show the best matches for ``query`` (一致したレコードはフィルターにも反映される)."""
+
+    hits = get_search_index(data).search(query, SEARCH_RESULT_LIMIT)
+    if not hits:
+        st.caption("一致するタスク・WBSはありません")
+        return
+    with st.expander(f"検索結果 上位{len(hits)}件"):
+        for hit in hits:
+            st.write(f"{'タスク' if hit.kind == 'task' else 'WBS'}: {hit.label}")
 
 def render_filters(data: Dict) -> Dict[str, Optional[str]]:
     st.markdown("### Project Filters")
+    query = st.text_input(
+        "検索",
+        placeholder="タスク名・説明・WBS名 (スペース区切りで AND 検索)",
+        key="search_query",
+    )
+    if split_query(query):
+        render_search_results(data, query)
     enabled = st.toggle("フィルターを適用する", value=False)
 
     col1, col2, col3, col4 = st.columns(4)
@@ -22,6 +44,11 @@ def render_filters(data: Dict) -> Dict[str, Optional[str]]:
             disabled=not enabled,
         )
     with col4:
-        level = st.text_input("WBS階層", placeholder="例: 1-2 など", disabled=not enabled)
+        level = st.text_input(
+            "WBS階層",
+            placeholder="例: 1-2 など",
+            help="階層番号を入力するとそのWBSと配下をすべて表示します。番号以外はWBS名の部分一致で絞り込みます。",
+            disabled=not enabled,
+        )
 
-    return {"enabled": enabled, "start": start, "end": end, "status": status, "level": level}
+    return {"enabled": enabled, "start": start, "end": end, "status": status, "level": level, "query": query}
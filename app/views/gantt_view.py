@@ -1,81 +1,109 @@
 from datetime import date
-from typing import Optional
+from itertools import repeat
+from typing import Dict, Optional
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 
-from components.wbs_structure_table import build_wbs_dataframe
+from components import perf
+from components.data_store import BatchValidationError, batch, update_task, update_wbs_item
+from components.gantt_window import (
+    ChartIntervals,
+    collapse_levels,
+    get_chart_intervals,
+    overlaps_window,
+    page_bounds,
+)
+from components.scheduling import ScheduleIndex, get_schedule
+from components.wbs_rollup import WBSRollupIndex, get_rollup_index
+from components.wbs_structure_table import get_wbs_dataframe
+from components.wbs_tree import WBSTree, get_wbs_tree
+from views.dependency_view import render_dependency_editor
 
+PAGE_SIZE_OPTIONS = [25, 50, 100, 200]
 
-def render_period_chart(filtered_wbs_df: pd.DataFrame) -> None:
-    chart_df = filtered_wbs_df.copy()
-    """
-    ガントチャート描画用のメイン処理。
 
-    WBS の予定日（start_date/end_date）および実績日（actual_start_date/actual_end_date）を元に
-    表示範囲に含まれるデータだけを抽出し、Plotly で視覚化する。
+def _segment_arrays(starts: pd.Series, ends: pd.Series, labels: pd.Series, notes: Optional[pd.Series] = None):
+    """Build x/y/customdata for one trace drawing every bar as a None-separated segment.
+
+    ``notes`` を渡すと各バーの customdata の3番目に入る(ホバー表示用)。
     """
 
-    # --------------------------------------
-    # 1) 日付列の正規化（文字列→date型）
-    # --------------------------------------
+    x, y, customdata = [], [], []
+    for start, end, label, note in zip(starts, ends, labels, notes if notes is not None else repeat(None)):
+        point = [start, end] if notes is None else [start, end, note]
+        x.extend([start, end, None])
+        y.extend([label, label, None])
+        customdata.extend([point, point, [None] * len(point)])
+    return x, y, customdata
 
-    date_columns = ["start_date", "end_date", "actual_start_date", "actual_end_date"]
-    for column in date_columns:
-        # to_datetime で正規化、エラーは NaT として扱う
-        chart_df[column] = pd.to_datetime(chart_df[column], errors="coerce").dt.date
 
-    # --------------------------------------
-    # 2) 実績終了日が未入力の場合、"今日" を実績終了とみなして可視化
-    # --------------------------------------
+def _progress_text(rollup: Optional[Dict]) -> str:
+    if rollup is None or rollup["percent_done"] is None:
+        return "進捗: タスクなし"
+    done = rollup["counts"].get("DONE", 0)
+    active = rollup["total"] - rollup["counts"].get("IGNORE", 0)
+    return f"進捗: {rollup['percent_done']:.0f}% ({done}/{active}件)"
+
+
+def prepare_chart_frame(wbs_df: pd.DataFrame) -> pd.DataFrame:
+    """Copy the shared WBS frame and add ``actual_end_for_chart``.
+
+    実績開始のみ入力済みの行は "今日" を実績終了とみなす。
+    """
+
+    chart_df = wbs_df.copy()
     chart_df["actual_end_for_chart"] = chart_df["actual_end_date"]
     missing_actual_end = chart_df["actual_start_date"].notna() & chart_df["actual_end_date"].isna()
     chart_df.loc[missing_actual_end, "actual_end_for_chart"] = date.today()
+    return chart_df
 
-    # --------------------------------------
-    # 3) 予定/実績の有無チェック
-    # --------------------------------------
-    has_planned = chart_df["start_date"].notna() & chart_df["end_date"].notna()
-    has_actual = chart_df["actual_start_date"].notna()
 
-    # どちらも無い場合は描画できない
-    if not (has_planned.any() or has_actual.any()):
-        st.info("開始・終了予定日または実績日が設定されたWBSがありません。日付を入力してください。")
-        return
+def add_schedule_columns(chart_df: pd.DataFrame, schedule: ScheduleIndex) -> pd.DataFrame:
+    """Add ``critical`` / ``early_start`` / ``early_finish`` from the dependency schedule.
 
-    # 可視化対象（予定 or 実績のどちらかをもつ行）
-    relevant_rows = chart_df[has_planned | has_actual].copy()
+    依存関係で予定より後ろにずれる行だけ ``early_start`` / ``early_finish`` に日付が入る。
+    """
 
-    # --------------------------------------
-    # 4) ガントチャート全体のデフォルト期間を決定
-    # --------------------------------------
-    earliest_dates = []
-    latest_dates = []
+    critical = schedule.critical_ids()
+    early_start, early_finish = [], []
+    for wbs_id, start in zip(chart_df["id"], chart_df["start_date"]):
+        entry = schedule.get(wbs_id)
+        slipped = entry is not None and start is not None and entry["early_start"] > start
+        early_start.append(entry["early_start"] if slipped else None)
+        early_finish.append(entry["early_finish"] if slipped else None)
+    chart_df["critical"] = chart_df["id"].isin(critical)
+    chart_df["early_start"] = early_start
+    chart_df["early_finish"] = early_finish
+    return chart_df
 
-    # 予定日から最も早い/遅い日
-    if has_planned.any():
-        earliest_dates.append(chart_df.loc[has_planned, "start_date"].min())
-        latest_dates.append(chart_df.loc[has_planned, "end_date"].max())
 
-    # 実績日から最も早い/遅い日
-    if has_actual.any():
-        earliest_dates.append(chart_df.loc[has_actual, "actual_start_date"].min())
-        latest_dates.append(chart_df.loc[has_actual, "actual_end_for_chart"].max())
+def add_rollup_columns(chart_df: pd.DataFrame, rollups: WBSRollupIndex) -> pd.DataFrame:
+    """Add ``progress`` (配下を含むタスクの進捗のホバー表示) from the rollup index."""
 
-    if not earliest_dates or not latest_dates:
-        st.info("ガントチャートを描画するための日付情報が不足しています。")
-        return
+    chart_df["progress"] = [_progress_text(rollups.get(wbs_id)) for wbs_id in chart_df["id"]]
+    return chart_df
+
+
+def build_period_figure(
+    filtered_df: pd.DataFrame,
+    window_start: Optional[date],
+    window_end: Optional[date],
+) -> go.Figure:
+    """Build the planned/actual period figure for already windowed and paged rows.
 
-    default_start: Optional[date] = min(earliest_dates)
-    default_end: Optional[date] = max(latest_dates)
+    Streamlit のウィジェットに依存しないため、ベンチマークなどから単独で呼び出せる。
+    """
 
-    filtered_df = relevant_rows
     filtered_has_planned = (
         filtered_df["start_date"].notna() & filtered_df["end_date"].notna()
     )
 
     filtered_has_actual = filtered_df["actual_start_date"].notna()
+    # 集約索引の進捗があればホバーに添える
+    has_progress = "progress" in filtered_df
+    progress_line = "<br>%{customdata[2]}" if has_progress else ""
 
     # 表示順は WBS の構造順（インデント済みのラベルを使用）
     display_labels = filtered_df["display_name"]
@@ -106,69 +134,122 @@ def render_period_chart(filtered_wbs_df: pd.DataFrame) -> None:
     # 9) 予定バーの描画
     # --------------------------------------
     if filtered_has_planned.any():
-        planned_df = filtered_df[filtered_has_planned].copy()
+        planned_df = filtered_df[filtered_has_planned]
+        x, y, customdata = _segment_arrays(
+            planned_df["start_date"],
+            planned_df["end_date"],
+            planned_df["display_name"],
+            planned_df["progress"] if has_progress else None,
+        )
+
+        # 全WBSの予定バーを None 区切りの 1 トレースにまとめる
+        fig.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                mode="lines",
+                line=dict(color="rgba(76,120,168,0.5)", width=40),
+                name="予定",
+                showlegend=True,
+                customdata=customdata,
+                hovertemplate=(
+                    "<b>%{y}</b><br>"
+                    "開始予定: %{customdata[0]|%Y-%m-%d}<br>"
+                    "終了予定: %{customdata[1]|%Y-%m-%d}"
+                    + progress_line
+                    + "<extra></extra>"
+                ),
+            ),
+            row=1,
+            col=2,
+        )
 
-        # 凡例が重複するのを避けるためフラグを使う
-        first_planned = True
+    # --------------------------------------
+    # 10) 実績バーの描画
+    # --------------------------------------
+    if filtered_has_actual.any():
+        actual_df = filtered_df[filtered_has_actual]
+        x, y, customdata = _segment_arrays(
+            actual_df["actual_start_date"],
+            actual_df["actual_end_for_chart"],
+            actual_df["display_name"],
+            actual_df["progress"] if has_progress else None,
+        )
+
+        fig.add_trace(
+            go.Scatter(
+                x=x,
+                y=y,
+                mode="lines+markers",
+                line=dict(color="#f28e2c", width=4),
+                marker=dict(color="#f28e2c", size=8),
+                name="実績",
+                showlegend=True,
+                customdata=customdata,
+                hovertemplate=(
+                    "<b>%{y}</b><br>"
+                    "実績開始: %{customdata[0]|%Y-%m-%d}<br>"
+                    "実績終了: %{customdata[1]|%Y-%m-%d}"
+                    + progress_line
+                    + "<extra></extra>"
+                ),
+            ),
+            row=1,
+            col=2,
+        )
 
-        for _, row in planned_df.iterrows():
+    # --------------------------------------
+    # 10.5) 依存関係: クリティカルパス上の予定バーと、先行項目の遅れで後ろにずれる期間
+    # --------------------------------------
+    if "critical" in filtered_df:
+        critical_df = filtered_df[filtered_df["critical"] & filtered_has_planned]
+        if not critical_df.empty:
+            x, y, customdata = _segment_arrays(
+                critical_df["start_date"], critical_df["end_date"], critical_df["display_name"]
+            )
             fig.add_trace(
                 go.Scatter(
-                    x=[row["start_date"], row["end_date"]],
-                    y=[row["display_name"], row["display_name"]],
+                    x=x,
+                    y=y,
                     mode="lines",
-                    line=dict(color="rgba(76,120,168,0.5)", width=40),
-                    name="予定",
-                    showlegend=first_planned,
-                    customdata=[[row["start_date"], row["end_date"]]] * 2,
-                    hovertemplate=(
-                        "<b>%{y}</b><br>"
-                        "開始予定: %{customdata[0]|%Y-%m-%d}<br>"
-                        "終了予定: %{customdata[1]|%Y-%m-%d}"
-                        "<extra></extra>"
-                    ),
+                    line=dict(color="rgba(214,39,40,0.8)", width=12),
+                    name="クリティカルパス",
+                    showlegend=True,
+                    customdata=customdata,
+                    hovertemplate="<b>%{y}</b><br>クリティカルパス<extra></extra>",
                 ),
                 row=1,
                 col=2,
             )
-            first_planned = False
-
-    # --------------------------------------
-    # 10) 実績バーの描画
-    # --------------------------------------
-    if filtered_has_actual.any():
-        actual_df = filtered_df[filtered_has_actual].copy()
-        first_actual = True
-
-        for _, row in actual_df.iterrows():
+        shifted_df = filtered_df[filtered_df["early_start"].notna()]
+        if not shifted_df.empty:
+            x, y, customdata = _segment_arrays(
+                shifted_df["early_start"], shifted_df["early_finish"], shifted_df["display_name"]
+            )
             fig.add_trace(
                 go.Scatter(
-                    x=[row["actual_start_date"], row["actual_end_for_chart"]],
-                    y=[row["display_name"], row["display_name"]],
-                    mode="lines+markers",
-                    line=dict(color="#f28e2c", width=4),
-                    marker=dict(color="#f28e2c", size=8),
-                    name="実績",
-                    showlegend=first_actual,
-                    customdata=[[row["actual_start_date"], row["actual_end_for_chart"]]] * 2,
+                    x=x,
+                    y=y,
+                    mode="lines",
+                    line=dict(color="rgba(214,39,40,0.6)", width=4, dash="dot"),
+                    name="依存関係による予定",
+                    showlegend=True,
+                    customdata=customdata,
                     hovertemplate=(
                         "<b>%{y}</b><br>"
-                        "実績開始: %{customdata[0]|%Y-%m-%d}<br>"
-                        "実績終了: %{customdata[1]|%Y-%m-%d}"
+                        "最早開始: %{customdata[0]|%Y-%m-%d}<br>"
+                        "最早終了: %{customdata[1]|%Y-%m-%d}"
                         "<extra></extra>"
                     ),
                 ),
                 row=1,
                 col=2,
             )
-            first_actual = False
 
     # --------------------------------------
     # 11) 今日の縦線（基準線）
     # --------------------------------------
     today = date.today()
-    chart_start_dt = default_start
-    chart_end_dt = default_end
     fig.add_vline(
         x=today,
         line_color="rgba(214,39,40,0.5)",
@@ -221,23 +302,177 @@ def render_period_chart(filtered_wbs_df: pd.DataFrame) -> None:
 
     fig.update_xaxes(
         tickformat="%y/%m",
-        range=[chart_start_dt, chart_end_dt],
+        range=[window_start, window_end],
         title_text="期間",
         row=1,
         col=2,
     )
 
+    return fig
+
+
+def render_period_chart(
+    filtered_wbs_df: pd.DataFrame,
+    tree: Optional[WBSTree] = None,
+    schedule: Optional[ScheduleIndex] = None,
+    intervals: Optional[ChartIntervals] = None,
+    rollups: Optional[WBSRollupIndex] = None,
+) -> None:
+    """
+    ガントチャート描画用のメイン処理。
+
+    WBS の予定日（start_date/end_date）および実績日（actual_start_date/actual_end_date）を元に
+    表示範囲に含まれるデータだけを抽出し、Plotly で視覚化する。
+    日付列は build_wbs_dataframe で date 型に変換済み（不正値は None）で、実績終了日が
+    未入力の場合は "今日" を実績終了とみなす (prepare_chart_frame)。
+    """
+
+    chart_df = prepare_chart_frame(filtered_wbs_df)
+    if intervals is None:
+        intervals = ChartIntervals(chart_df)
+    if schedule is not None:
+        chart_df = add_schedule_columns(chart_df, schedule)
+    if rollups is not None:
+        # 集約バーの行も、その行の集約値が配下全体の進捗になる
+        chart_df = add_rollup_columns(chart_df, rollups)
+
+    # --------------------------------------
+    # 2.5) 表示階層より深い部分木を祖先行の集約バーにまとめる
+    # --------------------------------------
+    collapsed = False
+    if tree is not None and len(tree) == len(chart_df) and len(tree):
+        max_depth = max(tree.levels)
+        level_options = [None] + list(range(max_depth))
+        max_level = st.selectbox(
+            "表示階層",
+            options=level_options,
+            format_func=lambda x: "すべて" if x is None else f"レベル{x + 1}まで(以下は集約)",
+        )
+        if max_level is not None:
+            chart_df = collapse_levels(
+                chart_df,
+                tree.levels,
+                tree.subtree_end,
+                max_level,
+                min_columns=["start_date", "actual_start_date"],
+                max_columns=["end_date", "actual_end_date", "actual_end_for_chart"],
+            )
+            collapsed = True
+            folded = chart_df["collapsed_count"] > 0
+            chart_df.loc[folded, "display_name"] = (
+                chart_df.loc[folded, "display_name"]
+                + " (+"
+                + chart_df.loc[folded, "collapsed_count"].astype(str)
+                + ")"
+            )
+
+    # --------------------------------------
+    # 3) 予定/実績の有無チェック
+    # 4) ガントチャート全体のデフォルト期間を区間索引から決定
+    #    (集約バーは子孫の最小/最大日付なので、集約の前後で期間は変わらない)
+    # --------------------------------------
+    extent = intervals.extent()
+
+    # どちらも無い場合は描画できない
+    if extent is None:
+        st.info("開始・終了予定日または実績日が設定されたWBSがありません。日付を入力してください。")
+        return
+
+    default_start, default_end = extent
+
+    # --------------------------------------
+    # 5) 表示期間と行のページングで描画対象を絞り込む
+    # --------------------------------------
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        window = st.date_input("表示期間", value=(default_start, default_end))
+    window_start, window_end = (
+        window if isinstance(window, (list, tuple)) and len(window) == 2 else (default_start, default_end)
+    )
+
+    if collapsed:
+        # 集約バーの期間は索引に無いので列から判定する
+        has_planned = chart_df["start_date"].notna() & chart_df["end_date"].notna()
+        relevant_rows = chart_df[has_planned | chart_df["actual_start_date"].notna()]
+        in_window = overlaps_window(
+            relevant_rows["start_date"].where(has_planned),
+            relevant_rows["end_date"].where(has_planned),
+            window_start,
+            window_end,
+        ) | overlaps_window(
+            relevant_rows["actual_start_date"],
+            relevant_rows["actual_end_for_chart"],
+            window_start,
+            window_end,
+        )
+    else:
+        relevant_rows = chart_df
+        in_window = intervals.window_mask(window_start, window_end)
+    visible_rows = relevant_rows[in_window]
+    if visible_rows.empty:
+        st.info("表示期間内にバーのあるWBSがありません。")
+        return
+
+    with col2:
+        page_size = st.selectbox("1ページの行数", options=PAGE_SIZE_OPTIONS, index=1)
+    page_count = max(1, -(-len(visible_rows) // page_size))
+    with col3:
+        page = st.number_input("ページ", min_value=1, max_value=page_count, value=1, step=1)
+    rows = page_bounds(len(visible_rows), page_size, int(page))
+    st.caption(f"全{len(visible_rows)}行中 {rows.start + 1}〜{rows.stop} 行目を表示")
+
+    with perf.stage("gantt_figure", rows=rows.stop - rows.start):
+        fig = build_period_figure(visible_rows.iloc[rows], window_start, window_end)
+
     # --------------------------------------
     # 13) Streamlit に表示
     # --------------------------------------
     st.markdown("#### 期間グラフ")
-    st.plotly_chart(fig, use_container_width=True)
+    # 図のシリアライズと送信がここに含まれる
+    with perf.stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
 
 
-def render(data, wbs_map):
+def render_schedule_summary(data, schedule: ScheduleIndex) -> None:
+    """Critical path summary and a button that pushes slipped planned dates back."""
+
+    slipped = schedule.slipped()
+    critical_count = sum(1 for node_id in schedule.critical_ids() if schedule.nodes[node_id].kind == "wbs")
+    st.caption(
+        f"クリティカルパス上のWBS: {critical_count}件 / "
+        f"依存関係により予定日より遅れる項目: {len(slipped)}件"
+    )
+    if slipped and st.button(f"予定日を依存関係に合わせて更新 ({len(slipped)}件)", key="apply_schedule"):
+        try:
+            with batch(data):
+                for kind, record_id, fields in slipped:
+                    if kind == "wbs":
+                        update_wbs_item(data, record_id, fields)
+                    else:
+                        update_task(data, record_id, fields)
+        except BatchValidationError as exc:
+            st.error("\n".join(exc.errors))
+            return
+        st.rerun()
+
+
+def render(data, filtered_data, wbs_map):
 
     st.write("#### ガントチャート")
 
     # wbs データが存在する場合のみ描画
-    if data.get("wbs"):
-        render_period_chart(build_wbs_dataframe(data.get("wbs", [])))
+    if filtered_data.get("wbs"):
+        wbs_items = filtered_data.get("wbs", [])
+        with perf.stage("gantt_frame", rows=len(wbs_items)):
+            wbs_df = get_wbs_dataframe(wbs_items)
+            tree = get_wbs_tree(wbs_items)
+            intervals = get_chart_intervals(wbs_items, wbs_df)
+        # 依存関係はフィルター前の全データで計算する
+        with perf.stage("schedule"):
+            schedule = get_schedule(data)
+        with perf.stage("rollup"):
+            rollups = get_rollup_index(data)
+        render_schedule_summary(data, schedule)
+        render_period_chart(wbs_df, tree, schedule, intervals, rollups)
+
+    render_dependency_editor(data, filtered_data)
@@ -1,11 +1,19 @@
 import streamlit as st
 
-from components.kanban import format_wbs_label, group_tasks_by_status
+from components import perf
+from components.kanban import format_wbs_label, group_tasks_by_status, summarize_tasks_by_status
 from components.models import STATUSES
 
+# ステータスごとに最初に表示するカード数と「さらに表示」で増やす件数
+KANBAN_PAGE_SIZE = 20
+
+
+def _limit_key(status):
+    return f"kanban_limit_{status}"
+
 
 def render_task_card(task, wbs_map):
-    """Render a single task card with metadata and description."""
+    """Render a single task card with metadata and a collapsible description."""
     st.markdown(f"**{task.get('title', 'No Title')}**")
     st.caption(f"WBS: {format_wbs_label(wbs_map, task.get('wbs_id'))}")
 
@@ -15,28 +23,39 @@ def render_task_card(task, wbs_map):
     if meta:
         st.caption(" / ".join(meta))
 
-    if task.get("description"):
+    # 詳細は開いたときだけ描画する
+    if task.get("description") and st.toggle("詳細", key=f"kanban_desc_{task.get('id')}"):
         st.write(task["description"])
 
 
-def render_status_section(status, tasks, wbs_map):
-    """Render a vertical section for a single status."""
-    st.markdown(f"### {status}")
+def render_status_section(status, tasks, wbs_map, total):
+    """Render a vertical section for a single status, one page at a time."""
+    st.markdown(f"### {status} ({total})")
     if not tasks:
         st.caption("タスクなし")
         return
 
-    for task in tasks:
+    limit = st.session_state.get(_limit_key(status), KANBAN_PAGE_SIZE)
+    perf.count("kanban_cards", min(limit, len(tasks)))
+    for task in tasks[:limit]:
         with st.container(border=True):
             render_task_card(task, wbs_map)
 
+    remaining = len(tasks) - limit
+    if remaining > 0:
+        st.caption(f"{min(limit, len(tasks))} / {len(tasks)} 件を表示中")
+        if st.button(f"さらに表示 (残り{remaining}件)", key=f"kanban_more_{status}"):
+            st.session_state[_limit_key(status)] = limit + KANBAN_PAGE_SIZE
+            st.rerun()
+
 
 def render(data, wbs_map):
     st.subheader("かんばんボード")
 
     tasks = data.get("tasks", [])
+    counts = summarize_tasks_by_status(tasks)
     grouped_tasks = group_tasks_by_status(tasks)
 
     # 横並びではなく縦にステータスごとに表示する
     for status in STATUSES:
-        render_status_section(status, grouped_tasks.get(status, []), wbs_map)
+        render_status_section(status, grouped_tasks.get(status, []), wbs_map, counts.get(status, 0))
@@ -1,8 +1,50 @@
+import pandas as pd
 import streamlit as st
 
-from components.models import WBSItem
+from components.wbs_rollup import get_rollup_index
+from components.wbs_tree import get_wbs_tree
 
 
-def render(data, wbs_map):
+def build_rollup_rows(data, filtered_data):
+    """Return one row per filtered WBS in hierarchy order with its subtree rollup.
+
+    集約はフィルター前の全データで行う(保存のたびに差分更新される索引を使う)。
+    """
+    tree = get_wbs_tree(filtered_data.get("wbs", []))
+    rollups = get_rollup_index(data)
+    rows = []
+    for item, level in tree.iter_with_levels():
+        rollup = rollups.get(item.get("id"))
+        if rollup is None:
+            continue
+        percent = rollup["percent_done"]
+        rows.append(
+            {
+                "WBS": f"{'　' * level}{item.get('name', '')}",
+                **rollup["counts"],
+                "合計": rollup["total"],
+                "進捗(%)": round(percent, 1) if percent is not None else None,
+                "開始": rollup["start"],
+                "終了": rollup["end"],
+            }
+        )
+    return rows
+
+
+def render(data, filtered_data, wbs_map):
     st.subheader("Presentation View")
-    st.write("(整形されたWBSツリーをここに表示予定)")
+
+    if not filtered_data.get("wbs"):
+        st.info("WBSが登録されていません。")
+        return
+
+    # 各WBSの値は配下のすべてのWBS・タスクを集約したもの(フィルターは表示する行だけに効く)
+    st.caption("件数・進捗・期間は配下のWBSを含めた集計です(フィルターに関係なく全タスクを集計)。")
+    st.dataframe(
+        pd.DataFrame(build_rollup_rows(data, filtered_data)),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "進捗(%)": st.column_config.ProgressColumn("進捗(%)", min_value=0, max_value=100, format="%.1f"),
+        },
+    )
@@ -0,0 +1,33 @@
+import streamlit as st
+
+from components.project_catalog import ACTIVE_PROJECT_KEY, active_project_id, create_project, list_projects
+
+
+def render_project_selector() -> str:
+    """Sidebar project selector; returns the ID of the project to show."""
+
+    st.markdown("### プロジェクト")
+    projects = list_projects()
+    names = {entry["id"]: entry["name"] for entry in projects}
+    options = list(names)
+    active = active_project_id()
+    project_id = st.selectbox(
+        "表示するプロジェクト",
+        options=options,
+        index=options.index(active),
+        format_func=names.get,
+    )
+    st.session_state[ACTIVE_PROJECT_KEY] = project_id
+
+    with st.expander("プロジェクトを追加"):
+        with st.form("create_project"):
+            name = st.text_input("プロジェクト名")
+            if st.form_submit_button("追加"):
+                try:
+                    entry = create_project(name)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    st.session_state[ACTIVE_PROJECT_KEY] = entry["id"]
+                    st.rerun()
+    return project_id
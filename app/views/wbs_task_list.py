@@ -1,39 +1,94 @@
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from components import perf
+from components.data_version import VersionedCache
 from components.kanban import summarize_tasks_by_status
-from components.data_store import delete_tasks, delete_wbs_items, save_data
+from components.models import STATUSES
+from components.outline_index import get_outline_index
+from components.wbs_rollup import get_rollup_index
+from components.data_store import (
+    BatchValidationError,
+    batch,
+    delete_tasks,
+    delete_wbs_items,
+    update_task,
+    update_wbs_item,
+)
 from components.wbs_structure_table import (
-    build_wbs_dataframe,
     build_ordered_wbs_label_map,
-    collect_descendants,
+    get_wbs_dataframe,
     normalize_date_value,
-    parse_iso_date,
+    parse_iso_dates,
 )
+from components.wbs_tree import WBSTree, get_wbs_tree
 
 SAVE_FEEDBACK_KEY = "wbs_save_feedback"
 SAVE_ERROR_KEY = "wbs_save_errors"
 TASK_SAVE_FEEDBACK_KEY = "task_save_feedback"
 TASK_SAVE_ERROR_KEY = "task_save_errors"
+WBS_EDITOR_KEY = "wbs_structure_editor"
+TASK_EDITOR_KEY = "task_list_editor"
+WBS_DATE_COLUMNS = ["start_date", "end_date", "actual_start_date", "actual_end_date"]
+
+
+def edited_rows_by_id(editor_key: str, frame: pd.DataFrame) -> Dict[str, Dict]:
+    """Return the data_editor delta keyed by row id.
+
+    data_editor の ``edited_rows`` は表示位置 -> 変更された列のみを持つため、
+    保存時は触られた行だけを処理すればよい。
+    """
+
+    state = st.session_state.get(editor_key) or {}
+    edited: Dict[str, Dict] = {}
+    for position, changes in (state.get("edited_rows") or {}).items():
+        position = int(position)
+        if 0 <= position < len(frame) and changes:
+            edited[frame.index[position]] = changes
+    return edited
+
+
+def _creates_cycle(tree: WBSTree, wbs_id: str, new_parent: Optional[str]) -> bool:
+    if new_parent is None:
+        return False
+    if new_parent == wbs_id:
+        return True
+    if wbs_id in tree.position:
+        return tree.is_descendant(new_parent, wbs_id)
+    return new_parent in tree.descendants(wbs_id)
+
+
+def _categorical(values, options: List[str]) -> pd.Categorical:
+    # 同名のWBSがあっても選択肢(カテゴリ)は一意にする
+    return pd.Categorical(values, categories=list(dict.fromkeys(options)))
 
 
 def build_task_dataframe(tasks: List[Dict], wbs_display_map: Dict[Optional[str], str]) -> pd.DataFrame:
-    rows = []
-    for task in tasks:
-        rows.append(
-            {
-                "id": task.get("id"),
-                "title": task.get("title"),
-                "wbs_selection": wbs_display_map.get(task.get("wbs_id"), wbs_display_map[None]),
-                "status": task.get("status"),
-                "due": parse_iso_date(task.get("due")),
-                "description": task.get("description"),
-                "delete": False,
-            }
-        )
-    return pd.DataFrame(rows).set_index("id")
+    """Build the task table frame column by column with categorical selections."""
+
+    unassigned = wbs_display_map[None]
+    statuses = [task.get("status") for task in tasks]
+    frame = pd.DataFrame(
+        {
+            "title": np.array([task.get("title") for task in tasks], dtype=object),
+            "wbs_selection": _categorical(
+                [wbs_display_map.get(task.get("wbs_id"), unassigned) for task in tasks],
+                list(wbs_display_map.values()),
+            ),
+            "status": _categorical(statuses, STATUSES + [s for s in statuses if s not in STATUSES]),
+            "due": np.array(parse_iso_dates(task.get("due") for task in tasks), dtype=object),
+            "description": np.array([task.get("description") for task in tasks], dtype=object),
+            "delete": np.zeros(len(tasks), dtype=bool),
+        },
+        index=pd.Index([task.get("id") for task in tasks], name="id"),
+    )
+    return frame
+
+
+_task_frame_cache = VersionedCache(maxsize=8)
 
 
 def render_structure_and_period_table(
@@ -46,7 +101,8 @@ def render_structure_and_period_table(
         st.info("まだWBSがありません。下のフォームから追加してください。")
         return None
 
-    wbs_df = build_wbs_dataframe(wbs_items).set_index("id")
+    # キャッシュ済みのフレームを共有しているので set_index で得た別フレームに列を足す
+    wbs_df = get_wbs_dataframe(wbs_items).set_index("id")
 
     st.markdown("### WBS構造と期間")
 
@@ -55,15 +111,28 @@ def render_structure_and_period_table(
     parent_options = [parent_label_map[None]] + list(ordered_labels.values())
     parent_option_to_id = {label: wbs_id for wbs_id, label in parent_label_map.items()}
 
-    wbs_df["parent_selection"] = wbs_df["parent"].apply(
-        lambda value: parent_label_map.get(value, parent_label_map[None])
+    wbs_df["parent_selection"] = _categorical(
+        wbs_df["parent"].map(parent_label_map).fillna(parent_label_map[None]),
+        parent_options,
     )
     wbs_df = wbs_df.drop(columns=["parent"])
+    # 階層番号はフィルター前の全体のツリーで振ったもの(「WBS階層」フィルターに入力する値)
+    outline = get_outline_index(data)
+    wbs_df.insert(0, "outline", [outline.code_of(wbs_id) for wbs_id in wbs_df.index])
+    # 配下を含むタスク数と進捗は保存のたびに差分更新される集約索引から引く(フィルター前の全データ)
+    rollup_index = get_rollup_index(data)
+    rollups = [rollup_index.get(wbs_id) for wbs_id in wbs_df.index]
+    wbs_df.insert(wbs_df.columns.get_loc("delete"), "task_count", [r["total"] if r else 0 for r in rollups])
+    wbs_df.insert(
+        wbs_df.columns.get_loc("delete"), "percent_done", [r["percent_done"] if r else None for r in rollups]
+    )
 
+    perf.count("wbs_editor_rows", len(wbs_df))
     edited_df = st.data_editor(
         wbs_df,
         hide_index=True,
         column_config={
+            "outline": st.column_config.Column("番号", disabled=True),
             "display_name": st.column_config.Column("WBS名 "),
             "parent_selection": st.column_config.SelectboxColumn(
                 "親WBS",
@@ -74,9 +143,13 @@ def render_structure_and_period_table(
             "end_date": st.column_config.DateColumn("終了予定日"),
             "actual_start_date": st.column_config.DateColumn("実績開始日"),
             "actual_end_date": st.column_config.DateColumn("実績終了日"),
+            "task_count": st.column_config.NumberColumn("タスク数", disabled=True),
+            "percent_done": st.column_config.ProgressColumn(
+                "進捗(%)", min_value=0, max_value=100, format="%.1f"
+            ),
             "delete": st.column_config.CheckboxColumn("削除", default=False),
         },
-        key="wbs_structure_editor",
+        key=WBS_EDITOR_KEY,
     )
 
     if st.button("変更を保存", key="save_wbs_dates"):
@@ -86,60 +159,53 @@ def render_structure_and_period_table(
         success_message = ""
         errors = []
         id_to_item = {item.get("id"): item for item in data.get("wbs", [])}
-        descendants_map = {
-            item.get("id"): collect_descendants(data.get("wbs", []), item.get("id"))
-            for item in data.get("wbs", [])
-        }
-
-        delete_targets = set(
-            index for index, row in edited_df.iterrows() if bool(row.get("delete"))
-        )
+        tree = get_wbs_tree(data.get("wbs", []))
+        edited_rows = edited_rows_by_id(WBS_EDITOR_KEY, wbs_df)
 
+        delete_targets = {wbs_id for wbs_id, changes in edited_rows.items() if changes.get("delete")}
         for target_id in list(delete_targets):
-            delete_targets.update(descendants_map.get(target_id, set()))
-
-        for index, row in edited_df.iterrows():
-            target = id_to_item.get(index)
-            if not target or target.get("id") in delete_targets:
-                continue
-
-            new_start = normalize_date_value(row.get("start_date"))
-            new_end = normalize_date_value(row.get("end_date"))
-            new_actual_start = normalize_date_value(row.get("actual_start_date"))
-            new_actual_end = normalize_date_value(row.get("actual_end_date"))
-            if (
-                target.get("start_date") != new_start
-                or target.get("end_date") != new_end
-                or target.get("actual_start_date") != new_actual_start
-                or target.get("actual_end_date") != new_actual_end
-            ):
-                target["start_date"] = new_start
-                target["end_date"] = new_end
-                target["actual_start_date"] = new_actual_start
-                target["actual_end_date"] = new_actual_end
-                updates += 1
-
-            parent_selection = row.get("parent_selection")
-            new_parent = (
-                parent_option_to_id.get(parent_selection)
-                if not pd.isna(parent_selection)
-                else None
-            )
-            if new_parent in delete_targets:
-                errors.append(f"{target.get('name')} の親が削除対象になっています")
-                continue
-            if new_parent == target.get("id") or new_parent in descendants_map.get(target.get("id"), set()):
-                errors.append(f"{target.get('name')} は自身または子孫を親にできません")
-                continue
-            if target.get("parent") != new_parent:
-                target["parent"] = new_parent
-                parent_updates += 1
-
-        removed = delete_wbs_items(data, delete_targets) if delete_targets else 0
+            delete_targets.update(tree.descendants(target_id))
+
+        removed = 0
+        try:
+            with batch(data, notify=False):
+                for wbs_id, changes in edited_rows.items():
+                    target = id_to_item.get(wbs_id)
+                    if not target or wbs_id in delete_targets:
+                        continue
+
+                    date_fields = {
+                        column: normalize_date_value(changes[column])
+                        for column in WBS_DATE_COLUMNS
+                        if column in changes
+                    }
+                    if date_fields and update_wbs_item(data, wbs_id, date_fields):
+                        updates += 1
+
+                    if "parent_selection" not in changes:
+                        continue
+                    parent_selection = changes["parent_selection"]
+                    new_parent = (
+                        parent_option_to_id.get(parent_selection)
+                        if not pd.isna(parent_selection)
+                        else None
+                    )
+                    if new_parent in delete_targets:
+                        errors.append(f"{target.get('name')} の親が削除対象になっています")
+                        continue
+                    if _creates_cycle(tree, wbs_id, new_parent):
+                        errors.append(f"{target.get('name')} は自身または子孫を親にできません")
+                        continue
+                    if update_wbs_item(data, wbs_id, {"parent": new_parent}):
+                        parent_updates += 1
+
+                if delete_targets:
+                    removed = delete_wbs_items(data, delete_targets)
+        except BatchValidationError as exc:
+            errors.extend(exc.errors)
+            updates = parent_updates = removed = 0
 
         if updates or parent_updates or removed:
-            if not removed:
-                save_data(data)
             success_message = "、".join(
                 part
                 for part in [
@@ -160,6 +226,8 @@ def render_structure_and_period_table(
         if rerun_needed:
             if success_message:
                 st.session_state[SAVE_FEEDBACK_KEY] = success_message
+            # 保存済みの差分を残すと行の増減で位置がずれるため破棄する
+            st.session_state.pop(WBS_EDITOR_KEY, None)
             st.rerun()
         elif not errors:
             st.info("変更はありませんでした")
@@ -183,11 +251,14 @@ def render_task_table(data: Dict[str, List[Dict]], filtered_tasks: List[Dict]):
             continue
         wbs_display_map[wbs_id] = item.get("name")
 
-    task_df = build_task_dataframe(filtered_tasks, wbs_display_map)
+    task_df = _task_frame_cache.get_or_build(
+        filtered_tasks, None, lambda: build_task_dataframe(filtered_tasks, wbs_display_map)
+    )
     wbs_options = list(wbs_display_map.values())
     wbs_option_to_id = {name: wbs_id for wbs_id, name in wbs_display_map.items()}
 
-    edited_tasks = st.data_editor(
+    perf.count("task_editor_rows", len(task_df))
+    st.data_editor(
         task_df,
         hide_index=True,
         column_config={
@@ -202,49 +273,47 @@ def render_task_table(data: Dict[str, List[Dict]], filtered_tasks: List[Dict]):
             "description": st.column_config.Column("詳細", disabled=True),
             "delete": st.column_config.CheckboxColumn("削除", default=False),
         },
-        key="task_list_editor",
+        key=TASK_EDITOR_KEY,
     )
 
     if st.button("変更を保存", key="save_task_updates"):
         id_to_task = {task.get("id"): task for task in data.get("tasks", [])}
-        delete_targets = set(
-            index for index, row in edited_tasks.iterrows() if bool(row.get("delete"))
-        )
+        edited_rows = edited_rows_by_id(TASK_EDITOR_KEY, task_df)
+        delete_targets = {task_id for task_id, changes in edited_rows.items() if changes.get("delete")}
         updates = 0
         removed = 0
         errors = []
 
-        for index, row in edited_tasks.iterrows():
-            task = id_to_task.get(index)
-            if not task or index in delete_targets:
-                continue
-
-            new_title = (row.get("title") or "").strip()
-            if not new_title:
-                errors.append("タイトルは空欄にできません")
-                continue
-
-            selection = row.get("wbs_selection")
-            new_wbs = (
-                wbs_option_to_id.get(selection) if not pd.isna(selection) else None
-            )
-            new_due = normalize_date_value(row.get("due"))
-
-            if (
-                task.get("title") != new_title
-                or task.get("wbs_id") != new_wbs
-                or task.get("due") != new_due
-            ):
-                task["title"] = new_title
-                task["wbs_id"] = new_wbs
-                task["due"] = new_due
-                updates += 1
-
-        if delete_targets:
-            removed = delete_tasks(data, delete_targets)
-
-        if updates and not removed:
-            save_data(data)
+        try:
+            with batch(data, notify=False):
+                for task_id, changes in edited_rows.items():
+                    task = id_to_task.get(task_id)
+                    if not task or task_id in delete_targets:
+                        continue
+
+                    fields = {}
+                    if "title" in changes:
+                        new_title = (changes["title"] or "").strip()
+                        if not new_title:
+                            errors.append("タイトルは空欄にできません")
+                            continue
+                        fields["title"] = new_title
+                    if "wbs_selection" in changes:
+                        selection = changes["wbs_selection"]
+                        fields["wbs_id"] = (
+                            wbs_option_to_id.get(selection) if not pd.isna(selection) else None
+                        )
+                    if "due" in changes:
+                        fields["due"] = normalize_date_value(changes["due"])
+
+                    if fields and update_task(data, task_id, fields):
+                        updates += 1
+
+                if delete_targets:
+                    removed = delete_tasks(data, delete_targets)
+        except BatchValidationError as exc:
+            errors.extend(exc.errors)
+            updates = removed = 0
 
         if updates or removed:
             success_message = "、".join(
@@ -259,6 +328,7 @@ def render_task_table(data: Dict[str, List[Dict]], filtered_tasks: List[Dict]):
                 st.session_state[TASK_SAVE_ERROR_KEY] = errors
             if success_message:
                 st.session_state[TASK_SAVE_FEEDBACK_KEY] = success_message
+            st.session_state.pop(TASK_EDITOR_KEY, None)
             st.rerun()
 
         if errors and not (updates or removed):
@@ -0,0 +1,109 @@
+"""Deterministic dataset generator for the benchmarks.
+
+同じ引数からは常に同じデータセットを生成する(乱数は seed 固定、UUID も乱数から作る)。
+"""
+
+import random
+import sys
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+from components.models import STATUSES  # noqa: E402
+
+# STATUSES と同じ順の出現比率
+STATUS_WEIGHTS = [40, 25, 30, 5]
+SHAPES = ("wide", "deep")
+BASE_DATE = date(2024, 1, 1)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _date(rng: random.Random, offset_days: int) -> str:
+    # 1% は不正な日付文字列を混ぜ、パース失敗の経路も計測対象にする
+    if rng.random() < 0.01:
+        return "2024-13-40"
+    return (BASE_DATE + timedelta(days=offset_days)).isoformat()
+
+
+def _pick_parent(rng: random.Random, shape: str, ids: List[str]) -> Optional[str]:
+    if not ids:
+        return None
+    if shape == "deep":
+        # 直前のノードにぶら下げることが多く、長い鎖が何本もできる
+        if rng.random() < 0.8:
+            return ids[-1]
+        return rng.choice(ids)
+    # wide: 先頭付近の少数のノードに子が集中し、浅く幅の広い木になる
+    if rng.random() < 0.05:
+        return None
+    fanout_pool = max(1, int(len(ids) ** 0.5))
+    return ids[rng.randrange(fanout_pool)]
+
+
+def generate_wbs(count: int, shape: str, rng: random.Random) -> List[Dict]:
+    items: List[Dict] = []
+    ids: List[str] = []
+    for index in range(count):
+        start = rng.randrange(0, 365)
+        duration = rng.randrange(1, 90)
+        has_planned = rng.random() < 0.7
+        has_actual = rng.random() < 0.5
+        item = {
+            "id": _uuid(rng),
+            "name": f"WBS {index + 1}",
+            "parent": _pick_parent(rng, shape, ids),
+            "start_date": _date(rng, start) if has_planned else None,
+            "end_date": _date(rng, start + duration) if has_planned else None,
+            "actual_start_date": _date(rng, start + rng.randrange(-5, 10)) if has_actual else None,
+            "actual_end_date": (
+                _date(rng, start + duration + rng.randrange(-5, 20))
+                if has_actual and rng.random() < 0.5
+                else None
+            ),
+        }
+        items.append(item)
+        ids.append(item["id"])
+    return items
+
+
+def generate_tasks(count: int, wbs_items: List[Dict], rng: random.Random) -> List[Dict]:
+    wbs_ids = [item["id"] for item in wbs_items]
+    tasks = []
+    for index in range(count):
+        tasks.append(
+            {
+                "id": _uuid(rng),
+                "title": f"Task {index + 1}",
+                "status": rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0],
+                "wbs_id": rng.choice(wbs_ids) if wbs_ids and rng.random() < 0.95 else None,
+                "due": _date(rng, rng.randrange(0, 400)) if rng.random() < 0.7 else None,
+                "description": "" if rng.random() < 0.6 else f"Description for task {index + 1}",
+            }
+        )
+    return tasks
+
+
+def generate_dataset(
+    task_count: int,
+    shape: str = "wide",
+    seed: int = 0,
+    wbs_count: Optional[int] = None,
+) -> Dict[str, List[Dict]]:
+    """Return ``{"wbs": [...], "tasks": [...]}`` in the app's JSON schema.
+
+    WBS の件数は指定が無ければタスク 20 件につき 1 件 (最低 10 件)。
+    """
+
+    if shape not in SHAPES:
+        raise ValueError(f"unknown shape: {shape}")
+    rng = random.Random(f"{seed}:{shape}:{task_count}:{wbs_count}")
+    wbs_items = generate_wbs(wbs_count or max(10, task_count // 20), shape, rng)
+    return {"wbs": wbs_items, "tasks": generate_tasks(task_count, wbs_items, rng)}
@@ -0,0 +1,299 @@
+"""Run the benchmark suite and write the timings as JSON.
+
+使い方 (リポジトリのルートで実行)::
+
+    python benchmarks/run.py                                  # 既定のサイズ・形で計測
+    python benchmarks/run.py --sizes 1000,200000 --shapes deep --repeat 5 --output before.json
+    python benchmarks/run.py --compare before.json after.json # 2つの結果を比較
+
+各計測の前にデータのバージョンを進め、バージョン単位のキャッシュが効かない
+(初回描画と同じ)状態で計測する。
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+import streamlit.logger  # noqa: E402
+
+# 素の Python から data_store を呼ぶと出る ScriptRunContext の警告を抑える
+streamlit.logger.set_log_level("error")
+
+from components import data_store  # noqa: E402
+from components.data_version import bump_version  # noqa: E402
+from components.filtering import apply_filters  # noqa: E402
+from components.gantt_window import ChartIntervals  # noqa: E402
+from components.kanban import group_tasks_by_status  # noqa: E402
+from components.outline_index import OutlineIndex, resolve_outline_filter  # noqa: E402
+from components.scheduling import ScheduleIndex  # noqa: E402
+from components.search_index import SearchIndex  # noqa: E402
+from components.wbs_structure_table import (  # noqa: E402
+    build_wbs_dataframe,
+    collect_descendants,
+    flatten_wbs_with_levels,
+    get_wbs_dataframe,
+)
+from views.gantt_view import build_period_figure, prepare_chart_frame  # noqa: E402
+
+from datasets import SHAPES, generate_dataset  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 50000, 200000]
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results" / "latest.json"
+GANTT_PAGE_ROWS = 50
+SEARCH_QUERY = "task 1234"
+# ガントチャートの表示期間(区間索引の重なり判定)
+GANTT_WINDOW = (date(2024, 3, 1), date(2024, 3, 31))
+# 起動時間の計測対象 (それぞれ新しいプロセスで読み込み時間を測る)
+IMPORT_MODULES = [
+    "pages.project",
+    "views.wbs_task_list",
+    "views.gantt_view",
+    "views.kanban_view",
+    "views.presentation_view",
+]
+FILTERS = {
+    "enabled": True,
+    "start": date(2024, 3, 1),
+    "end": date(2024, 9, 30),
+    "status": "TODO",
+    "level": "1",
+}
+# 階層番号による絞り込み(番号付けの索引の構築を含む)
+OUTLINE_FILTERS = {**FILTERS, "level": "1-1"}
+
+
+def _gantt_figure(data: Dict, rows: int = 0):
+    chart_df = prepare_chart_frame(get_wbs_dataframe(data["wbs"]))
+    has_bar = chart_df["start_date"].notna() & chart_df["end_date"].notna()
+    has_bar |= chart_df["actual_start_date"].notna()
+    visible = chart_df[has_bar]
+    if rows:
+        visible = visible.iloc[:rows]
+    return build_period_figure(visible, date(2024, 1, 1), date(2025, 3, 31))
+
+
+_search_indexes: Dict[int, Tuple[Dict, SearchIndex]] = {}
+
+
+def _search(data: Dict, query: str):
+    # 索引の構築は search_index_build で測るので、ここでは検索だけを測る
+    entry = _search_indexes.get(id(data))
+    if entry is None or entry[0] is not data:
+        entry = _search_indexes[id(data)] = (data, SearchIndex(data))
+    return entry[1].search(query)
+
+
+_chart_intervals: Dict[int, Tuple[Dict, ChartIntervals]] = {}
+
+
+def _gantt_window(data: Dict):
+    # 索引の構築は chart_intervals_build で測るので、ここでは期間と重なり判定だけを測る
+    entry = _chart_intervals.get(id(data))
+    if entry is None or entry[0] is not data:
+        frame = prepare_chart_frame(get_wbs_dataframe(data["wbs"]))
+        entry = _chart_intervals[id(data)] = (data, ChartIntervals(frame))
+    intervals = entry[1]
+    return intervals.extent(), intervals.window_mask(*GANTT_WINDOW)
+
+
+def _with_dependencies(data: Dict) -> Dict:
+    """Copy of ``data`` where most WBS items finish-to-start follow the previous item.
+
+    データセット自体(乱数の並び)は変えずに、4件ずつの鎖になる依存関係を付け足す。
+    """
+
+    wbs = [
+        {**item, "predecessors": [{"id": data["wbs"][index - 1]["id"], "type": "FS", "lag": 0}]}
+        if index % 4
+        else item
+        for index, item in enumerate(data["wbs"])
+    ]
+    return {"wbs": wbs, "tasks": data["tasks"]}
+
+
+def _root_id(data: Dict) -> str:
+    return next(item["id"] for item in data["wbs"] if item["parent"] is None)
+
+
+def benchmarks(data: Dict) -> List[Tuple[str, Callable[[], object]]]:
+    root_id = _root_id(data)
+    scheduled = _with_dependencies(data)
+    return [
+        ("load_data", data_store.load_data),
+        ("save_data", lambda: data_store.save_data(data)),
+        ("apply_filters", lambda: apply_filters(data, FILTERS)),
+        ("apply_filters_outline", lambda: apply_filters(data, resolve_outline_filter(data, OUTLINE_FILTERS))),
+        ("outline_index_build", lambda: OutlineIndex(data)),
+        ("flatten_wbs_with_levels", lambda: flatten_wbs_with_levels(data["wbs"])),
+        ("collect_descendants", lambda: collect_descendants(data["wbs"], root_id)),
+        ("build_wbs_dataframe", lambda: build_wbs_dataframe(data["wbs"])),
+        ("group_tasks_by_status", lambda: group_tasks_by_status(data["tasks"])),
+        (f"gantt_figure_page{GANTT_PAGE_ROWS}", lambda: _gantt_figure(data, GANTT_PAGE_ROWS)),
+        ("gantt_figure_all", lambda: _gantt_figure(data)),
+        ("chart_intervals_build", lambda: ChartIntervals(get_wbs_dataframe(data["wbs"]))),
+        ("gantt_window", lambda: _gantt_window(data)),
+        ("search_index_build", lambda: SearchIndex(data)),
+        ("search", lambda: _search(data, SEARCH_QUERY)),
+        ("schedule_build", lambda: ScheduleIndex(scheduled)),
+    ]
+
+
+def time_call(func: Callable[[], object], repeat: int) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        # キャッシュを無効にしてから計測する
+        bump_version()
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+def time_import(module: str, repeat: int) -> List[float]:
+    """Time a cold ``import module`` in fresh interpreters (streamlit is preloaded, as in the app)."""
+
+    code = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); import streamlit; "
+        "started = time.perf_counter(); __import__(sys.argv[2]); print(time.perf_counter() - started)"
+    )
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", code, str(ROOT / "app"), module],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(float(completed.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(sizes: List[int], shapes: List[str], repeat: int, only: List[str]) -> Dict:
+    results = []
+    for module in IMPORT_MODULES:
+        name = f"import:{module}"
+        if only and name not in only:
+            continue
+        runs = time_import(module, repeat)
+        results.append(
+            {"benchmark": name, "shape": "-", "tasks": 0, "wbs": 0, "min_s": min(runs), "median_s": statistics.median(runs), "runs": runs}
+        )
+        print(f"{'-':5} {0:>7} {name:28} min {min(runs) * 1000:10.2f} ms", flush=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 計測中の保存先は一時ディレクトリに向ける
+        data_store.DATA_DIR = Path(tmp)
+        data_store.DATA_FILE = data_store.DATA_DIR / "wbs_data.json"
+        data_store.JOURNAL_FILE = data_store.DATA_DIR / "wbs_journal.jsonl"
+        data_store.SQLITE_FILE = data_store.DATA_DIR / "wbs_data.sqlite3"
+
+        for shape in shapes:
+            for size in sizes:
+                data = generate_dataset(size, shape)
+                data_store.save_data(data)
+                for name, func in benchmarks(data):
+                    if only and name not in only:
+                        continue
+                    runs = time_call(func, repeat)
+                    result = {
+                        "benchmark": name,
+                        "shape": shape,
+                        "tasks": size,
+                        "wbs": len(data["wbs"]),
+                        "min_s": min(runs),
+                        "median_s": statistics.median(runs),
+                        "runs": runs,
+                    }
+                    results.append(result)
+                    print(f"{shape:5} {size:>7} {name:28} min {result['min_s'] * 1000:10.2f} ms", flush=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage_mode": data_store.STORAGE_MODE,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(old_path: Path, new_path: Path, threshold: float) -> int:
+    """Print new/old ratios of ``min_s``; returns 1 when any ratio exceeds ``threshold``."""
+
+    def load(path: Path) -> Dict[Tuple, Dict]:
+        with path.open("r", encoding="utf-8") as f:
+            report = json.load(f)
+        return {(r["benchmark"], r["shape"], r["tasks"]): r for r in report["results"]}
+
+    old, new = load(old_path), load(new_path)
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]["min_s"] / old[key]["min_s"] if old[key]["min_s"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- regression"
+            regressions += 1
+        name, shape, tasks = key
+        print(
+            f"{shape:5} {tasks:>7} {name:28} "
+            f"{old[key]['min_s'] * 1000:10.2f} ms -> {new[key]['min_s'] * 1000:10.2f} ms  x{ratio:5.2f}{flag}"
+        )
+    return 1 if regressions else 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="タスク件数 (カンマ区切り)")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="WBSの形 wide / deep (カンマ区切り)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="", help="実行するベンチマーク名 (カンマ区切り)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=1.2, help="回帰とみなす倍率")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.threshold)
+
+    report = run_suite(
+        [int(size) for size in args.sizes.split(",") if size],
+        [shape for shape in args.shapes.split(",") if shape],
+        args.repeat,
+        [name for name in args.only.split(",") if name],
+    )
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
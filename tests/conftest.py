@@ -0,0 +1,36 @@
+import logging
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# streamlit をスクリプト実行なしで読み込んだときの警告を抑える
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+from components import data_store  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Point the data store at an empty temporary directory (JSON mode)."""
+
+    monkeypatch.setattr(data_store, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(data_store, "DATA_FILE", tmp_path / "wbs_data.json")
+    monkeypatch.setattr(data_store, "JOURNAL_FILE", tmp_path / "wbs_journal.jsonl")
+    monkeypatch.setattr(data_store, "SQLITE_FILE", tmp_path / "wbs_data.sqlite3")
+    monkeypatch.setattr(data_store, "STORAGE_MODE", "json")
+    monkeypatch.setattr(data_store, "_resident", OrderedDict())
+    monkeypatch.setattr(data_store, "_sqlite_stores", {})
+    return data_store
+
+
+def seed(store, data):
+    """Save ``data`` as the default project and return the shared snapshot."""
+
+    store.save_data(store.ProjectData(store.DEFAULT_PROJECT_ID, data))
+    return store.get_shared_data()
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+from conftest import seed
+from datasets import generate_dataset
+
+from components import backup
+
+
+def _content(data):
+    return [dict(item) for item in data["wbs"]], [dict(task) for task in data["tasks"]]
+
+
+@pytest.fixture
+def data(store, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_MODE", "off")
+    return seed(store, generate_dataset(3000, "wide", seed=21))
+
+
+def _objects(root):
+    return {path for path in (root / "objects").rglob("*") if path.is_file()}
+
+
+def test_unchanged_chunks_are_shared_between_snapshots(store, data):
+    first = backup.create_snapshot(data)
+    assert first["new_objects"] > 10
+    assert backup.create_snapshot(data) is None
+
+    task = data["tasks"][1500]
+    store.update_task(data, task["id"], {"status": "DONE" if task["status"] != "DONE" else "TODO"})
+    second = backup.create_snapshot(store.get_shared_data())
+
+    # 変わったタスクを含むチャンクだけが新しく書かれる
+    assert second["new_objects"] == 1
+    assert [entry["id"] for entry in backup.list_snapshots()] == [second["id"], first["id"]]
+    assert _content(backup.load_snapshot(first["id"])) == _content(data)
+
+
+def test_restore_saves_the_snapshot_as_the_current_data(store, data):
+    entry = backup.create_snapshot(data)
+    store.delete_tasks(data, {task["id"] for task in data["tasks"][:100]})
+    store.add_wbs_item(store.get_shared_data(), "Added later", None, None, None)
+
+    backup.restore_snapshot(entry["id"])
+
+    assert _content(store.get_shared_data()) == _content(data)
+    assert _content(store.load_data()) == _content(data)
+
+
+def test_pruned_snapshots_drop_only_unreferenced_chunks(store, data, monkeypatch):
+    monkeypatch.setattr(backup, "MAX_SNAPSHOTS", 2)
+    root = backup.backup_dir()
+    entries = [backup.create_snapshot(data)]
+    for i in range(3):
+        store.update_task(data, data["tasks"][i * 1000]["id"], {"title": f"Renamed {i}"})
+        data = store.get_shared_data()
+        entries.append(backup.create_snapshot(data))
+
+    assert [entry["id"] for entry in backup.list_snapshots()] == [entries[3]["id"], entries[2]["id"]]
+    assert not (root / "snapshots" / f"{entries[0]['id']}.json").exists()
+    assert _content(backup.load_snapshot(entries[2]["id"]))[1][1000]["title"] == "Renamed 1"
+    # 残った2世代が参照するチャンクは1世代分+変更されたチャンクだけ
+    assert len(_objects(root)) == entries[0]["new_objects"] + entries[3]["new_objects"]
+
+
+def test_on_save_mode_backs_up_every_write(store, data, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_MODE", "on_save")
+
+    store.add_wbs_item(data, "W", None, None, None)
+    backup.wait_for_backups(10)
+
+    entries = backup.list_snapshots()
+    assert len(entries) == 1 and entries[0]["reason"] == "on_save"
+    assert entries[0]["wbs_count"] == len(data["wbs"]) + 1
+
+
+def test_saves_return_before_the_backup_is_written(store, data, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_MODE", "on_save")
+    release = threading.Event()
+    taken = []
+    create_snapshot = backup.create_snapshot
+
+    def slow_snapshot(snapshot, reason):
+        release.wait(10)
+        taken.append(len(snapshot["wbs"]))
+        return create_snapshot(snapshot, reason)
+
+    monkeypatch.setattr(backup, "create_snapshot", slow_snapshot)
+    for name in ("W1", "W2", "W3"):
+        store.add_wbs_item(store.get_shared_data(), name, None, None, None)
+
+    # 保存はバックアップを待たずに戻り、他の保存もブロックしない
+    assert backup.list_snapshots() == [] and taken == []
+    release.set()
+    backup.wait_for_backups(10)
+
+    # 待っている間の保存は最新の1件にまとめて取得する
+    assert taken[-1] == len(data["wbs"]) + 3 and len(taken) <= 2
+    assert backup.list_snapshots()[0]["wbs_count"] == len(data["wbs"]) + 3
@@ -0,0 +1,96 @@
+import copy
+from datetime import date
+
+import pytest
+from conftest import seed
+
+
+def _data():
+    return {
+        "wbs": [{"id": "a", "name": "A", "parent": None, "start_date": "2024-01-01", "end_date": "2024-01-10"}],
+        "tasks": [{"id": "t1", "title": "T1", "status": "TODO", "wbs_id": "a", "due": None, "description": ""}],
+    }
+
+
+def _rows(data):
+    """Compare stored content without depending on how each storage mode fills empty columns."""
+
+    return (
+        sorted((item["id"], item["name"], item.get("parent"), item.get("end_date")) for item in data["wbs"]),
+        sorted((task["id"], task["title"], task["status"], task.get("wbs_id")) for task in data["tasks"]),
+    )
+
+
+def test_batch_leaves_the_shared_snapshot_untouched_until_saved(store):
+    data = seed(store, _data())
+    before = copy.deepcopy(dict(data))
+
+    with store.batch(data, notify=False):
+        store.update_task(data, "t1", {"status": "DONE"})
+        store.add_task(data, "T2", "a", date(2024, 1, 5), "TODO", "")
+        store.delete_wbs_items(data, {"a"})
+        # 保存前の変更は他のセッションから見えない
+        assert dict(data) == before
+        assert store.get_shared_data() is data
+
+    assert dict(data) == before
+    saved = store.get_shared_data()
+    assert saved is not data
+    assert saved["wbs"] == []
+    assert [(task["title"], task["status"], task["wbs_id"]) for task in saved["tasks"]] == [
+        ("T1", "DONE", None),
+        ("T2", "TODO", None),
+    ]
+    assert _rows(store.load_data()) == _rows(saved)
+
+
+def test_failed_batch_keeps_the_snapshot_and_the_file(store):
+    data = seed(store, _data())
+    before = copy.deepcopy(dict(data))
+
+    with pytest.raises(store.BatchValidationError):
+        with store.batch(data, notify=False):
+            store.update_task(data, "t1", {"status": "DONE"})
+            store.update_task(data, "t1", {"wbs_id": "missing"})
+
+    assert store.get_shared_data() is data
+    assert dict(data) == before
+    assert _rows(store.load_data()) == _rows(before)
+
+
+def test_writes_from_a_stale_snapshot_are_applied_on_top_of_the_latest(store):
+    stale = seed(store, _data())
+    store.update_task(stale, "t1", {"status": "DOING"})
+    store.add_wbs_item(stale, "B", None, None, None)
+
+    latest = store.get_shared_data()
+    assert latest["tasks"][0]["status"] == "DOING"
+    assert [item["name"] for item in latest["wbs"]] == ["A", "B"]
+    assert _rows(store.load_data()) == _rows(latest)
+
+
+def test_a_write_to_another_project_keeps_the_cached_indexes(store):
+    from components.view_cache import get_filtered_view
+    from components.wbs_rollup import get_rollup_index
+    from components.wbs_tree import get_wbs_tree
+
+    data = seed(store, _data())
+    store.ensure_data_file_exists("other")
+    filters = {"enabled": False, "query": None}
+    tree, rollups = get_wbs_tree(data["wbs"]), get_rollup_index(data)
+    filtered, _ = get_filtered_view(data, filters)
+    filtered_tree = get_wbs_tree(filtered["wbs"])
+
+    store.add_wbs_item(store.get_shared_data("other"), "B", None, None, None)
+
+    assert store.get_shared_data() is data
+    assert get_wbs_tree(data["wbs"]) is tree
+    assert get_rollup_index(data) is rollups
+    assert get_filtered_view(data, filters)[0] is filtered
+    assert get_wbs_tree(filtered["wbs"]) is filtered_tree
+
+    # 同じプロジェクトへの保存では作り直す(差し替え後のスナップショットが対象になる)
+    store.add_wbs_item(data, "C", None, None, None)
+    updated = store.get_shared_data()
+    assert get_wbs_tree(updated["wbs"]) is not tree
+    assert [item.get("name") for item in updated["wbs"]] == ["A", "C"]
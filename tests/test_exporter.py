@@ -0,0 +1,74 @@
+import io
+
+import pytest
+from conftest import seed
+from datasets import generate_dataset
+
+from components.exporter import iter_export, parquet_available, spool_export
+from components.importer import import_rows, import_stream
+
+WBS_FIELDS = ("id", "name", "parent", "start_date", "end_date", "actual_start_date", "actual_end_date")
+TASK_FIELDS = ("id", "title", "status", "wbs_id", "due", "description")
+
+
+def _content(data):
+    return (
+        sorted(tuple(item.get(name) for name in WBS_FIELDS) for item in data["wbs"]),
+        sorted(tuple(task.get(name) for name in TASK_FIELDS) for task in data["tasks"]),
+    )
+
+
+@pytest.fixture
+def dataset():
+    data = generate_dataset(300, "deep", seed=12, wbs_count=40)
+    # 生成データに混ぜてある不正な日付はインポートで弾かれるので空にしておく
+    for record in data["wbs"] + data["tasks"]:
+        for name, value in record.items():
+            if value == "2024-13-40":
+                record[name] = None
+    return data
+
+
+@pytest.mark.parametrize("file_format", ["csv", "jsonl"])
+def test_export_reimports_to_the_same_content(store, dataset, file_format):
+    exported = b"".join(iter_export(dataset, file_format, chunk_rows=50))
+    data = seed(store, {"wbs": [], "tasks": []})
+
+    report = import_stream(data, io.BytesIO(exported), file_format, chunk_size=64)
+
+    assert report.error_count == 0
+    assert _content(store.get_shared_data()) == _content(dataset)
+
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow is not installed")
+def test_parquet_export_reads_back_as_the_same_rows(store, dataset):
+    import pyarrow.parquet as pq
+
+    exported = b"".join(iter_export(dataset, "parquet", chunk_rows=50))
+    table = pq.read_table(io.BytesIO(exported))
+    assert table.num_rows == len(dataset["wbs"]) + len(dataset["tasks"])
+    data = seed(store, {"wbs": [], "tasks": []})
+
+    report = import_rows(data, iter(table.to_pylist()))
+
+    assert report.error_count == 0
+    assert _content(store.get_shared_data()) == _content(dataset)
+
+
+def test_wbs_rows_come_in_tree_order_with_their_tasks(dataset):
+    rows = b"".join(iter_export(dataset, "csv")).decode("utf-8-sig").splitlines()[1:]
+    kinds = [row.split(",", 1)[0] for row in rows]
+    assert kinds.count("wbs") == len(dataset["wbs"]) and kinds.count("task") == len(dataset["tasks"])
+
+    seen = set()
+    for row in rows:
+        kind, record_id, _, _, _, parent = row.split(",")[:6]
+        if kind == "wbs":
+            # 親は必ず子より先に出力される
+            assert not parent or parent in seen
+            seen.add(record_id)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "jsonl"])
+def test_spooled_export_returns_the_whole_file(dataset, file_format):
+    assert spool_export(dataset, file_format) == b"".join(iter_export(dataset, file_format))
@@ -0,0 +1,64 @@
+import io
+
+from conftest import seed
+
+from components.importer import import_rows, import_stream
+
+CSV = """kind,id,name,parent,start_date,end_date,title,status,wbs_id,due
+task,t1,,,,,Child task,TODO,w2,2024-02-01
+wbs,w2,Child,w1,2024-01-05,2024-01-20,,,,
+wbs,w1,Root,,2024-01-01,2024-01-31,,,,
+wbs,w3,,,,,,,,
+wbs,w4,Bad date,,2024-02-30,,,,,
+task,t2,,,,,Unknown status,WIP,,
+task,t1,,,,,Duplicate,TODO,,
+wbs,w5,Orphan,missing,,,,,,
+other,x1,,,,,,,,
+"""
+
+
+def test_csv_rows_are_validated_and_forward_references_resolved(store):
+    data = seed(store, {"wbs": [], "tasks": []})
+
+    report = import_stream(data, io.BytesIO(CSV.encode("utf-8-sig")), "csv")
+
+    assert (report.rows_read, report.wbs_added, report.tasks_added) == (9, 2, 1)
+    assert report.error_count == 6
+    assert any("4行目: WBS名が空です" in error for error in report.errors)
+    assert any("2024-02-30" in error for error in report.errors)
+    assert any("WIP" in error for error in report.errors)
+    assert any("IDが重複しています (t1)" in error for error in report.errors)
+    assert any("Orphan" in error and "missing" in error for error in report.errors)
+    assert any("other" in error for error in report.errors)
+
+    saved = store.get_shared_data()
+    # 親は子より先に並べ直して保存される
+    assert [(item["id"], item["parent"]) for item in saved["wbs"]] == [("w1", None), ("w2", "w1")]
+    assert [(task["id"], task["wbs_id"], task["due"]) for task in saved["tasks"]] == [("t1", "w2", "2024-02-01")]
+
+
+def test_chunked_import_reports_progress_and_saves_once(store):
+    data = seed(store, {"wbs": [{"id": "root", "name": "Root", "parent": None}], "tasks": []})
+    rows = [{"kind": "task", "id": f"t{i}", "title": f"T{i}", "wbs_id": f"w{i % 3}"} for i in range(7)]
+    rows += [{"kind": "wbs", "id": f"w{i}", "name": f"W{i}", "parent": "root"} for i in range(3)]
+    progress = []
+
+    report = import_rows(data, iter(rows), lambda r: progress.append((r.rows_read, r.wbs_added)), chunk_size=3)
+
+    assert report.error_count == 0
+    assert (report.wbs_added, report.tasks_added) == (3, 7)
+    assert progress == [(3, 0), (6, 0), (9, 2), (10, 3)]
+    # batch の中で保存されるので、取り込み中の共有スナップショットは元のまま
+    assert data["wbs"] == [{"id": "root", "name": "Root", "parent": None}]
+    saved = store.get_shared_data()
+    assert len(saved["wbs"]) == 4 and len(saved["tasks"]) == 7
+
+
+def test_broken_jsonl_lines_are_reported(store):
+    data = seed(store, {"wbs": [], "tasks": []})
+    stream = io.BytesIO(b'{"kind": "wbs", "id": "w1", "name": "W1"}\n{"kind": \n[1, 2]\n\n')
+
+    report = import_stream(data, stream, "jsonl")
+
+    assert (report.rows_read, report.wbs_added, report.error_count) == (3, 1, 2)
+    assert report.errors == ["2行目: JSONとして読み込めません", "3行目: オブジェクトではありません"]
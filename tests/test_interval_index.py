@@ -0,0 +1,98 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from components.interval_index import IntervalIndex
+
+BASE = date(2024, 1, 1)
+TODAY = date(2024, 6, 15)
+
+
+def _random_rows(rng, count):
+    starts, ends = [], []
+    for _ in range(count):
+        start = BASE + timedelta(days=rng.randrange(365))
+        # 長さは 0 日から数百日まで幅を持たせ、いくつもの組に分かれるようにする
+        end = start + timedelta(days=int(rng.expovariate(1 / 20)) if rng.random() < 0.9 else rng.randrange(400))
+        if rng.random() < 0.05:
+            start, end = end, start
+        kind = rng.random()
+        if kind < 0.1:
+            start = None
+        elif kind < 0.25:
+            end = None
+        elif kind < 0.3:
+            start = end = None
+        starts.append(start)
+        ends.append(end)
+    return starts, ends
+
+
+def _intervals(starts, ends, open_ended):
+    """Brute-force ``[lo, hi]`` per row (None when the row is not indexed)."""
+
+    result = []
+    for start, end in zip(starts, ends):
+        if start is None and end is None:
+            result.append(None)
+        elif open_ended and end is None:
+            result.append((start, TODAY))
+        else:
+            lo, hi = start or end, end or start
+            result.append((min(lo, hi), max(lo, hi)))
+    return result
+
+
+def _array(values):
+    return np.array([np.datetime64(value, "D") if value else np.datetime64("NaT") for value in values])
+
+
+def _windows(rng):
+    yield None, None
+    for _ in range(40):
+        a = BASE + timedelta(days=rng.randrange(-30, 420))
+        b = a + timedelta(days=rng.randrange(0, 60))
+        yield a, b
+        yield a, None
+        yield None, b
+
+
+@pytest.mark.parametrize("open_ended", [False, True])
+def test_overlapping_matches_a_brute_force_scan(open_ended):
+    rng = random.Random(24)
+    starts, ends = _random_rows(rng, 3000)
+    index = IntervalIndex(_array(starts), _array(ends), open_ended=open_ended)
+    intervals = _intervals(starts, ends, open_ended)
+    assert len(index) == sum(interval is not None for interval in intervals)
+
+    for window_start, window_end in _windows(rng):
+        expected = [
+            row
+            for row, interval in enumerate(intervals)
+            if interval is not None
+            and (window_end is None or interval[0] <= window_end)
+            and (window_start is None or interval[1] >= window_start)
+        ]
+        assert index.overlapping(window_start, window_end, TODAY).tolist() == expected
+        assert np.flatnonzero(index.mask(window_start, window_end, TODAY)).tolist() == expected
+
+
+@pytest.mark.parametrize("open_ended", [False, True])
+def test_extent_covers_every_interval(open_ended):
+    rng = random.Random(7)
+    starts, ends = _random_rows(rng, 500)
+    index = IntervalIndex(_array(starts), _array(ends), open_ended=open_ended)
+    intervals = [interval for interval in _intervals(starts, ends, open_ended) if interval is not None]
+
+    assert index.extent(TODAY) == (min(lo for lo, _ in intervals), max(hi for _, hi in intervals))
+
+
+def test_an_index_without_dates_is_empty():
+    index = IntervalIndex(_array([None, None]), _array([None, None]), open_ended=True)
+
+    assert len(index) == 0
+    assert index.extent(TODAY) is None
+    assert index.overlapping(BASE, TODAY, TODAY).tolist() == []
+    assert index.mask(None, None, TODAY).tolist() == [False, False]
@@ -0,0 +1,89 @@
+import json
+
+from components import journal
+
+
+def _snapshot():
+    return {
+        "wbs": [{"id": "a", "name": "A", "parent": None}, {"id": "b", "name": "B", "parent": "a"}],
+        "tasks": [
+            {"id": "t1", "title": "T1", "status": "TODO", "wbs_id": "a"},
+            {"id": "t2", "title": "T2", "status": "TODO", "wbs_id": "b"},
+        ],
+    }
+
+
+RECORDS = [
+    {"op": "add_task", "task": {"id": "t3", "title": "T3", "status": "TODO", "wbs_id": "b"}},
+    {"op": "update_task", "id": "t1", "fields": {"status": "DONE"}},
+    {"op": "delete_wbs", "ids": ["b"]},
+    {"op": "delete_tasks", "ids": ["t2"]},
+    {"op": "update_wbs", "id": "a", "fields": {"name": "A2"}},
+]
+
+
+def _expected():
+    return {
+        "wbs": [{"id": "a", "name": "A2", "parent": None}],
+        "tasks": [
+            {"id": "t1", "title": "T1", "status": "DONE", "wbs_id": "a"},
+            {"id": "t3", "title": "T3", "status": "TODO", "wbs_id": None},
+        ],
+    }
+
+
+def test_replay_applies_the_appended_records_in_order(tmp_path):
+    journal_file = tmp_path / "journal.jsonl"
+    journal.append_records(journal_file, RECORDS[:2])
+    journal.append_records(journal_file, RECORDS[2:])
+
+    assert journal.replay(_snapshot(), journal_file) == _expected()
+
+
+def test_replaying_twice_gives_the_same_result(tmp_path):
+    # スナップショットを書いた後、ジャーナルを切り詰める前に落ちた場合
+    journal_file = tmp_path / "journal.jsonl"
+    journal.append_records(journal_file, RECORDS)
+
+    once = journal.replay(_snapshot(), journal_file)
+    assert journal.replay(json.loads(json.dumps(once)), journal_file) == _expected()
+
+
+def test_a_torn_last_line_is_skipped_and_the_next_append_starts_a_new_line(tmp_path):
+    journal_file = tmp_path / "journal.jsonl"
+    journal.append_records(journal_file, RECORDS[:1])
+    with journal_file.open("ab") as f:
+        f.write(b'{"op": "update_task", "id": "t1", "fie')
+    journal.append_records(journal_file, RECORDS[1:])
+
+    assert journal.replay(_snapshot(), journal_file) == _expected()
+
+
+def test_compact_folds_the_journal_into_the_snapshot(tmp_path):
+    data_file = tmp_path / "data.json"
+    journal_file = tmp_path / "journal.jsonl"
+    journal.write_snapshot(data_file, _snapshot())
+    journal.append_records(journal_file, RECORDS)
+    data = journal.replay(json.loads(data_file.read_text(encoding="utf-8")), journal_file)
+
+    journal.compact(data_file, journal_file, data)
+
+    assert journal.journal_size(journal_file) == 0
+    assert json.loads(data_file.read_text(encoding="utf-8")) == _expected()
+    assert journal.replay(json.loads(data_file.read_text(encoding="utf-8")), journal_file) == _expected()
+
+
+def test_journal_mode_store_round_trips_through_compaction(store, monkeypatch):
+    monkeypatch.setattr(store, "STORAGE_MODE", "journal")
+    monkeypatch.setattr(store, "JOURNAL_COMPACT_BYTES", 400)
+    data = store.get_shared_data()
+
+    for i in range(10):
+        store.add_wbs_item(data, f"W{i}", None, None, None)
+        data = store.get_shared_data()
+    # しきい値を超えた時点でスナップショットへ畳み込まれている
+    assert journal.journal_size(store.JOURNAL_FILE) < 400
+    assert json.loads(store.DATA_FILE.read_text(encoding="utf-8"))["wbs"]
+
+    names = [item["name"] for item in store.load_data()["wbs"]]
+    assert names == [f"W{i}" for i in range(10)]
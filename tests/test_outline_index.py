@@ -0,0 +1,60 @@
+import random
+
+from conftest import seed
+from datasets import generate_dataset
+
+from components.outline_index import OutlineIndex, get_outline_index, resolve_outline_filter
+from components.wbs_structure_table import build_wbs_dataframe, get_wbs_dataframe
+from components.wbs_tree import get_wbs_tree
+
+
+def _filters(level):
+    return {"enabled": True, "start": None, "end": None, "status": None, "level": level}
+
+
+def test_a_nested_code_keeps_its_subtree_visible(store):
+    data = seed(store, generate_dataset(400, "deep", seed=2, wbs_count=60))
+    index = get_outline_index(data)
+    resolved = resolve_outline_filter(data, _filters("1-1"))
+
+    filtered = store.filter_data(data, resolved)
+    ids = [item["id"] for item in filtered["wbs"]]
+    assert len(ids) > 1 and set(ids) == resolved["wbs_ids"]
+
+    # 部分木の根の親は絞り込みで外れているが、ツリーと表には全件が出る
+    tree = get_wbs_tree(filtered["wbs"])
+    assert [item["id"] for item in tree.order] == index.subtree_ids((1, 1))
+    frame = get_wbs_dataframe(filtered["wbs"])
+    assert len(frame) == len(ids)
+    assert frame["id"].iloc[0] == index.subtree_ids((1, 1))[0]
+    assert not frame["display_name"].iloc[0].startswith("　")
+
+
+def test_an_empty_frame_keeps_object_columns():
+    frame = build_wbs_dataframe([])
+    assert frame.drop(columns=["delete"]).dtypes.eq(object).all()
+    assert frame["delete"].dtype == bool
+
+
+def test_incremental_updates_match_a_rebuild(store):
+    data = seed(store, generate_dataset(100, "deep", seed=4, wbs_count=40))
+    index = get_outline_index(data)
+    rng = random.Random(5)
+
+    for step in range(60):
+        ids = [item["id"] for item in data["wbs"]]
+        op = rng.randrange(3)
+        if op == 0 or len(ids) < 5:
+            store.add_wbs_item(data, f"N{step}", rng.choice(ids + [None]), None, None)
+        elif op == 1:
+            wbs_id = rng.choice(ids)
+            tree = get_wbs_tree(data["wbs"])
+            parents = [p for p in ids if p != wbs_id and not tree.is_descendant(p, wbs_id)]
+            store.update_wbs_item(data, wbs_id, {"parent": rng.choice(parents + [None])})
+        else:
+            store.delete_wbs_items(data, {rng.choice(ids)})
+        data = store.get_shared_data()
+
+    # 差し替え後のスナップショットでも同じ索引を差分更新して使い続けている
+    assert get_outline_index(data) is index
+    assert index.codes == OutlineIndex(data).codes
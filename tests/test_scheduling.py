@@ -0,0 +1,76 @@
+import random
+from datetime import date, timedelta
+
+from conftest import seed
+from datasets import generate_dataset
+
+from components.scheduling import ScheduleIndex, get_schedule
+
+
+def _state(index):
+    return {node_id: (node.es, node.ls) for node_id, node in index.nodes.items()}, index.finish
+
+
+def _wbs(item_id, start, end, **fields):
+    return {"id": item_id, "name": item_id, "parent": None, "start_date": start, "end_date": end, **fields}
+
+
+def test_shortening_the_finishing_item_moves_the_project_finish(store):
+    data = seed(store, {"wbs": [_wbs("a", "2024-01-01", "2024-01-31"), _wbs("b", "2024-01-01", "2024-01-10")], "tasks": []})
+    assert get_schedule(data).critical_ids() == {"a"}
+
+    store.update_wbs_item(data, "a", {"end_date": "2024-01-05"})
+    data = store.get_shared_data()
+
+    schedule = get_schedule(data)
+    assert schedule.critical_ids() == ScheduleIndex(data).critical_ids() == {"b"}
+    assert schedule.get("b")["slack"] == 0
+
+
+def test_incremental_updates_match_a_rebuild(store):
+    data = seed(store, generate_dataset(150, "wide", wbs_count=60))
+    rng = random.Random(7)
+    with store.batch(data, notify=False):
+        for i in range(1, len(data["wbs"])):
+            if rng.random() < 0.6:
+                predecessor = data["wbs"][rng.randrange(i)]["id"]
+                store.set_predecessors(
+                    data,
+                    data["wbs"][i]["id"],
+                    [{"id": predecessor, "type": rng.choice(["FS", "SS"]), "lag": rng.randrange(-2, 5)}],
+                )
+    data = store.get_shared_data()
+    assert _state(get_schedule(data)) == _state(ScheduleIndex(data))
+
+    for _ in range(300):
+        ids = [item["id"] for item in data["wbs"]] + [task["id"] for task in data["tasks"]]
+        op = rng.randrange(7)
+        try:
+            if op == 0:
+                start = date(2024, 1, 1) + timedelta(days=rng.randrange(300))
+                end = start + timedelta(days=rng.randrange(30))
+                store.update_wbs_item(
+                    data, rng.choice(data["wbs"])["id"], {"start_date": start.isoformat(), "end_date": end.isoformat()}
+                )
+            elif op == 1:
+                due = date(2024, 1, 1) + timedelta(days=rng.randrange(400))
+                store.update_task(data, rng.choice(data["tasks"])["id"], {"due": due.isoformat()})
+            elif op == 2:
+                predecessors = [
+                    {"id": rng.choice(ids), "type": rng.choice(["FS", "SS"]), "lag": rng.randrange(0, 3)}
+                    for _ in range(rng.randrange(0, 3))
+                ]
+                with store.batch(data, notify=False):
+                    store.set_predecessors(data, rng.choice(ids), predecessors)
+            elif op == 3 and data["tasks"]:
+                store.delete_tasks(data, {rng.choice(data["tasks"])["id"]})
+            elif op == 4:
+                store.add_task(data, "new", None, date(2024, 5, 1), "TODO", "")
+            elif op == 5:
+                store.add_wbs_item(data, "new", None, date(2024, 2, 1), date(2024, 2, 10))
+            elif op == 6 and rng.random() < 0.3:
+                store.delete_wbs_items(data, {rng.choice(data["wbs"])["id"]})
+        except store.BatchValidationError:
+            pass
+        data = store.get_shared_data()
+        assert _state(get_schedule(data)) == _state(ScheduleIndex(data))
@@ -0,0 +1,49 @@
+import random
+
+from conftest import seed
+from datasets import generate_dataset
+
+from components.search_index import SearchIndex, get_search_index, search_filter
+from components.wbs_tree import get_wbs_tree
+
+QUERIES = ["Task 1", "task 2", "WBS 1", "description", "7", "ノート"]
+
+
+def test_every_kept_wbs_is_a_tree_row(store):
+    data = seed(store, generate_dataset(1000, "deep", seed=6))
+    filtered = search_filter(data, data, "Task 1")
+
+    assert filtered["tasks"] and len(filtered["wbs"]) < len(data["wbs"])
+    # 祖先が一致しなかったWBSも、表示用のツリーでは根として残る
+    tree = get_wbs_tree(filtered["wbs"])
+    assert len(tree) == len(filtered["wbs"])
+    kept = {item["id"] for item in filtered["wbs"]}
+    assert all(task["wbs_id"] in kept for task in filtered["tasks"] if task["wbs_id"])
+
+
+def test_incremental_updates_match_a_rebuild(store):
+    data = seed(store, generate_dataset(300, "wide", seed=8, wbs_count=30))
+    index = get_search_index(data)
+    rng = random.Random(9)
+
+    for step in range(80):
+        wbs_ids = [item["id"] for item in data["wbs"]]
+        task_ids = [task["id"] for task in data["tasks"]]
+        op = rng.randrange(5)
+        if op == 0:
+            store.add_task(data, f"ノート {step}", rng.choice(wbs_ids), None, "TODO", "")
+        elif op == 1:
+            store.update_task(data, rng.choice(task_ids), {"title": f"Renamed {step}", "description": "ノート"})
+        elif op == 2:
+            store.update_wbs_item(data, rng.choice(wbs_ids), {"name": f"WBS 7{step}"})
+        elif op == 3:
+            store.delete_tasks(data, {rng.choice(task_ids)})
+        else:
+            store.add_wbs_item(data, f"WBS {100 + step}", rng.choice(wbs_ids), None, None)
+        data = store.get_shared_data()
+
+    assert get_search_index(data) is index
+    rebuilt = SearchIndex(data)
+    for query in QUERIES:
+        assert index.matching_ids(query) == rebuilt.matching_ids(query)
+        assert index.search(query) == rebuilt.search(query)
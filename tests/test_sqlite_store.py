@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+from datasets import generate_dataset
+
+from components.filtering import apply_filters
+from components.sqlite_store import SQLiteStore
+
+TODAY = date.today()
+
+FILTERS = [
+    {"start": date(2024, 3, 1), "end": date(2024, 9, 30)},
+    {"start": date(2024, 3, 1), "end": None},
+    {"start": None, "end": date(2024, 2, 15)},
+    {"start": TODAY - timedelta(days=10), "end": TODAY + timedelta(days=10)},
+    {"start": TODAY + timedelta(days=30), "end": None},
+    {"start": date(2024, 3, 1), "end": date(2024, 9, 30), "status": "TODO"},
+    {"start": None, "end": None, "status": "DONE", "level": "1"},
+    {"start": date(2024, 6, 1), "end": date(2024, 6, 30), "level": "WBS 2"},
+]
+
+
+def _ids(result):
+    return [item["id"] for item in result["wbs"]], [task["id"] for task in result["tasks"]]
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    data = generate_dataset(2000, "wide", seed=3)
+    # 期限の前後関係が逆のWBSと、今日をまたいで進行中のWBSも含める
+    data["wbs"][0].update(start_date="2024-05-10", end_date="2024-05-01")
+    data["wbs"][1].update(actual_start_date=(TODAY - timedelta(days=3)).isoformat(), actual_end_date=None)
+    data["wbs"][2].update(actual_start_date=(TODAY + timedelta(days=60)).isoformat(), actual_end_date=None)
+    return data
+
+
+@pytest.fixture
+def sqlite_store(tmp_path, dataset):
+    store = SQLiteStore(tmp_path / "wbs.sqlite3")
+    store.replace_all(dataset)
+    return store
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_sql_filters_match_the_numpy_filters(sqlite_store, dataset, filters):
+    filters = {"enabled": True, "status": None, "level": None, **filters}
+    assert _ids(sqlite_store.apply_filters(filters)) == _ids(apply_filters(dataset, filters))
+
+
+def test_outline_subtree_filter_matches(sqlite_store, dataset):
+    wbs_ids = {item["id"] for item in dataset["wbs"][::7]}
+    filters = {"enabled": True, "start": date(2024, 3, 1), "end": None, "status": None, "level": None, "wbs_ids": wbs_ids}
+    assert _ids(sqlite_store.apply_filters(filters)) == _ids(apply_filters(dataset, filters))
+
+
+def test_invalid_dates_are_kept_but_not_compared(tmp_path):
+    store = SQLiteStore(tmp_path / "wbs.sqlite3")
+    item = {"id": "a", "name": "A", "parent": None, "start_date": "2024-13-40", "end_date": "2024-02-01"}
+    store.replace_all({"wbs": [item], "tasks": []})
+
+    assert store.load()["wbs"][0]["start_date"] == "2024-13-40"
+    conn = sqlite3.connect(str(tmp_path / "wbs.sqlite3"))
+    assert conn.execute("SELECT start_date, end_date FROM wbs").fetchone() == (None, "2024-02-01")
+
+    store.apply([{"op": "update_wbs", "id": "a", "fields": {"start_date": "2024-01-15"}}])
+    loaded = store.load()["wbs"][0]
+    assert (loaded["start_date"], loaded["end_date"]) == ("2024-01-15", "2024-02-01")
+    assert conn.execute("SELECT extra FROM wbs").fetchone() == (None,)
+
+
+def test_date_filters_use_the_indexes(sqlite_store):
+    conn = sqlite_store._connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        sqlite_store.apply_filters(
+            {"enabled": True, "start": date(2024, 3, 1), "end": date(2024, 3, 31), "status": None, "level": None}
+        )
+    finally:
+        conn.set_trace_callback(None)
+
+    wbs_sql, task_sql = [sql for sql in statements if sql.startswith("SELECT * FROM")]
+    wbs_plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + wbs_sql))
+    task_plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + task_sql))
+    assert "idx_wbs_planned" in wbs_plan and "idx_wbs_actual" in wbs_plan
+    assert "idx_tasks_due" in task_plan
+
+
+def test_opening_an_older_database_normalizes_its_dates(tmp_path):
+    path = tmp_path / "wbs.sqlite3"
+    SQLiteStore(path)
+    conn = sqlite3.connect(str(path))
+    with conn:
+        conn.execute(
+            "INSERT INTO tasks (id, position, title, status, due) VALUES ('t1', 0, 'T1', 'TODO', '20240105')"
+        )
+        conn.execute("PRAGMA user_version = 0")
+
+    store = SQLiteStore(path)
+
+    assert conn.execute("SELECT due FROM tasks").fetchone() == ("2024-01-05",)
+    assert store.load()["tasks"][0]["due"] == "20240105"
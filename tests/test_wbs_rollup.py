@@ -0,0 +1,66 @@
+import random
+from datetime import date, timedelta
+
+from conftest import seed
+from datasets import generate_dataset
+
+from components.models import STATUSES
+from components.wbs_rollup import WBSRollupIndex, get_rollup_index
+
+
+def _state(index, data):
+    return {item["id"]: index.get(item["id"]) for item in data["wbs"]}
+
+
+def test_applying_an_added_task_twice_counts_it_once(store):
+    data = seed(store, {"wbs": [{"id": "a", "name": "A", "parent": None}], "tasks": []})
+    index = get_rollup_index(data)
+    record = {"op": "add_task", "task": {"id": "t1", "title": "T1", "status": "TODO", "wbs_id": "a"}}
+    index.apply(record)
+    index.apply(record)
+    assert index.get("a")["counts"]["TODO"] == 1
+
+
+def test_index_built_during_a_batch_matches_a_rebuild(store):
+    data = seed(store, {"wbs": [{"id": "a", "name": "A", "parent": None}], "tasks": []})
+    with store.batch(data, notify=False):
+        store.add_task(data, "T1", "a", None, "TODO", "")
+        get_rollup_index(data)
+    data = store.get_shared_data()
+    assert get_rollup_index(data).get("a")["counts"]["TODO"] == 1
+    assert _state(get_rollup_index(data), data) == _state(WBSRollupIndex(data), data)
+
+
+def test_incremental_updates_match_a_rebuild(store):
+    data = seed(store, generate_dataset(200, "deep", wbs_count=50))
+    rng = random.Random(11)
+    get_rollup_index(data)
+
+    for _ in range(300):
+        op = rng.randrange(6)
+        try:
+            if op == 0:
+                task = rng.choice(data["tasks"])
+                store.update_task(
+                    data, task["id"], {"status": rng.choice(STATUSES), "wbs_id": rng.choice(data["wbs"])["id"]}
+                )
+            elif op == 1:
+                start = date(2024, 1, 1) + timedelta(days=rng.randrange(300))
+                store.update_wbs_item(
+                    data,
+                    rng.choice(data["wbs"])["id"],
+                    {"start_date": start.isoformat(), "actual_end_date": (start + timedelta(days=9)).isoformat()},
+                )
+            elif op == 2:
+                with store.batch(data, notify=False):
+                    store.update_wbs_item(data, rng.choice(data["wbs"])["id"], {"parent": rng.choice(data["wbs"])["id"]})
+            elif op == 3 and data["tasks"]:
+                store.delete_tasks(data, {rng.choice(data["tasks"])["id"]})
+            elif op == 4:
+                store.add_task(data, "new", rng.choice(data["wbs"])["id"], None, rng.choice(STATUSES), "")
+            elif op == 5:
+                store.add_wbs_item(data, "new", rng.choice(data["wbs"])["id"], date(2024, 2, 1), None)
+        except store.BatchValidationError:
+            pass
+        data = store.get_shared_data()
+        assert _state(get_rollup_index(data), data) == _state(WBSRollupIndex(data), data)